@@ -0,0 +1,169 @@
+"""
+对比 Bigtable 行转换（读取解码、写入编码）的逐 cell 类型推断路径与预编译编解码计划的耗时。
+
+运行方式：python -m favie_data_common.benchmark.bigtable_codec_benchmark --rows 10000
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional
+
+from google.cloud.bigtable.row_data import Cell, PartialRowData
+from pydantic import BaseModel
+
+from favie_data_common.common.pydantic_utils import PydanticUtils
+from favie_data_common.database.bigtable.bigtable_model_codec import BigtableModelCodec
+from favie_data_common.database.bigtable.bigtable_utils import BigtableUtils
+
+
+class BenchmarkImage(BaseModel):
+    url: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+class BenchmarkVariant(BaseModel):
+    sku_id: Optional[str] = None
+    color: Optional[str] = None
+    size: Optional[str] = None
+    price: Optional[float] = None
+    in_stock: Optional[bool] = None
+
+
+class BenchmarkProduct(BaseModel):
+    f_sku_id: Optional[str] = None
+    title: Optional[str] = None
+    brand: Optional[str] = None
+    site: Optional[str] = None
+    url: Optional[str] = None
+    price: Optional[float] = None
+    original_price: Optional[float] = None
+    rating: Optional[float] = None
+    review_count: Optional[int] = None
+    in_stock: Optional[bool] = None
+    categories: Optional[List[str]] = None
+    images: Optional[List[BenchmarkImage]] = None
+    variants: Optional[List[BenchmarkVariant]] = None
+    attributes: Optional[Dict[str, str]] = None
+    main_image: Optional[BenchmarkImage] = None
+
+
+def build_product(index: int) -> BenchmarkProduct:
+    return BenchmarkProduct(
+        f_sku_id=f"sku{index}-example.com",
+        title=f"Product title {index}",
+        brand="brand",
+        site="example.com",
+        url=f"https://www.example.com/p/{index}",
+        price=19.99 + index,
+        original_price=29.99 + index,
+        rating=4.5,
+        review_count=index,
+        in_stock=index % 2 == 0,
+        categories=["clothing", "women", "dresses"],
+        images=[
+            BenchmarkImage(url=f"https://img.example.com/{index}/{i}.jpg", width=800, height=600) for i in range(5)
+        ],
+        variants=[
+            BenchmarkVariant(sku_id=f"{index}-{i}", color="red", size=str(i), price=19.99, in_stock=True)
+            for i in range(4)
+        ],
+        attributes={"material": "cotton", "fit": "regular"},
+        main_image=BenchmarkImage(url=f"https://img.example.com/{index}/main.jpg", width=800, height=600),
+    )
+
+
+def build_row(product: BenchmarkProduct, column_family: str = "main_cf") -> PartialRowData:
+    row = PartialRowData(product.f_sku_id.encode())
+    row._cells = {
+        column_family: {
+            field_name.encode(): [Cell(BigtableUtils.pydantic_field_convert_str(field_value).encode(), 0)]
+            for field_name, field_value in product.__dict__.items()
+            if field_value is not None
+        }
+    }
+    return row
+
+
+def convert_row_legacy(row: PartialRowData, model_class, charset: str = "utf-8"):
+    # 预编译之前的转换路径：每个 cell 解码列名、查询字段类型、逐层判断类型
+    model_dict = {}
+    for column_family in row.cells:
+        for column_qualifier, cell_list in row.cells[column_family].items():
+            if len(cell_list) > 0:
+                field_value = cell_list[0].value.decode(charset)
+                field_name = column_qualifier.decode(charset)
+                field_type = PydanticUtils.get_native_field_type(model_class, field_name)
+                if field_type is not None:
+                    model_dict[field_name] = BigtableUtils.str_convert_pydantic_field(field_value, field_type)
+    return model_class(**model_dict)
+
+
+def convert_row_compiled(row: PartialRowData, codec: BigtableModelCodec):
+    model_dict, _ = codec.convert_row_to_dict(row)
+    return codec.model_class(**model_dict)
+
+
+def convert_model_legacy(
+    model: BaseModel, default_cf: str, cf_config: dict = None, exclude_fields: list = None, charset: str = "utf-8"
+):
+    # 预编译之前的写入路径：每个字段判断排除、查询列族、递归序列化
+    cells = []
+    for field_name, field_value in model.__dict__.items():
+        if exclude_fields and field_name in exclude_fields:
+            continue
+        if field_value is None:
+            continue
+        column_family = cf_config.get(field_name, default_cf) if cf_config is not None else default_cf
+        column_value = BigtableUtils.pydantic_field_convert_str(field_value).encode(charset)
+        cells.append((column_family, field_name.encode(charset), column_value))
+    return cells
+
+
+def convert_model_compiled(model: BaseModel, codec: BigtableModelCodec, exclude_fields: list = None):
+    return codec.convert_model_to_cells(model, exclude_fields=exclude_fields)
+
+
+def measure(name: str, func, items: list, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<16} best of {repeat}: {best:.4f}s, {len(items) / best:,.0f} rows/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bigtable row conversion benchmark")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    products = [build_product(i) for i in range(args.rows)]
+    rows = [build_row(product) for product in products]
+    codec = BigtableModelCodec(model_class=BenchmarkProduct, default_cf="main_cf")
+    assert convert_row_legacy(rows[0], BenchmarkProduct) == convert_row_compiled(rows[0], codec)
+    assert convert_model_legacy(products[0], "main_cf") == convert_model_compiled(products[0], codec)
+
+    legacy = measure("decode legacy", lambda row: convert_row_legacy(row, BenchmarkProduct), rows, args.repeat)
+    compiled = measure("decode compiled", lambda row: convert_row_compiled(row, codec), rows, args.repeat)
+    print(f"decode speedup: {legacy / compiled:.2f}x")
+
+    exclude_fields = ["rating"]
+    legacy = measure(
+        "encode legacy",
+        lambda model: convert_model_legacy(model, "main_cf", None, exclude_fields),
+        products,
+        args.repeat,
+    )
+    compiled = measure(
+        "encode compiled", lambda model: convert_model_compiled(model, codec, exclude_fields), products, args.repeat
+    )
+    print(f"encode speedup: {legacy / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+仓库读写、字段序列化、规则引擎等热点路径的基准测试，结果保存为 JSON，用于不同版本之间对比性能回退。
+
+运行方式：
+python -m favie_data_common.benchmark.hot_path_benchmark --rows 2000 --output benchmark.json
+python -m favie_data_common.benchmark.hot_path_benchmark --output new.json --compare benchmark.json
+"""
+
+import argparse
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Callable, Optional
+
+from business_rules.actions import BaseActions, rule_action
+from business_rules.engine import run_all
+from business_rules.fields import FIELD_TEXT
+from pydantic import BaseModel
+
+from favie_data_common.benchmark.bigtable_codec_benchmark import BenchmarkProduct, build_product, build_row
+from favie_data_common.common.application_utils import ApplicationUtils
+from favie_data_common.common.common_utils import CommonUtils
+from favie_data_common.common.pydantic_utils import PydanticUtils
+from favie_data_common.database.bigtable.bigtable_memory_table import InMemoryBigtableTable
+from favie_data_common.database.bigtable.bigtable_repository import BigtableRepository
+from favie_data_common.database.bigtable.bigtable_utils import BigtableUtils
+from favie_data_common.rule_engine.variables_factory import VariablesFactory
+
+BENCHMARK_URLS = [
+    "https://www.example.com/p/{index}",
+    "https://shop.example.co.uk/products/{index}?color=red",
+    "http://m.store.example.com.au/item/{index}",
+    "https://example.net/collections/dresses/products/{index}",
+]
+
+BENCHMARK_RULES = [
+    {
+        "conditions": {"all": [{"name": "price", "operator": "greater_than", "value": 100}]},
+        "actions": [{"name": "mark", "params": {"message": "expensive"}}],
+    },
+    {
+        "conditions": {
+            "all": [
+                {"name": "in_stock", "operator": "is_true", "value": True},
+                {"name": "title", "operator": "contains", "value": "1"},
+            ]
+        },
+        "actions": [{"name": "mark", "params": {"message": "in stock"}}],
+    },
+    {
+        "conditions": {"any": [{"name": "main_image_width", "operator": "greater_than_or_equal_to", "value": 800}]},
+        "actions": [{"name": "mark", "params": {"message": "large image"}}],
+    },
+    {
+        "conditions": {"all": [{"name": "variants_color", "operator": "contains", "value": "red"}]},
+        "actions": [{"name": "mark", "params": {"message": "red variant"}}],
+    },
+]
+
+
+class BenchmarkResult(BaseModel):
+    name: str
+    # 每轮处理的条目数
+    items: int
+    repeat: int
+    best_seconds: float
+    mean_seconds: float
+    # 按最好一轮计算的吞吐
+    items_per_second: float
+
+
+class BenchmarkReport(BaseModel):
+    package_version: str
+    python_version: str
+    platform: str
+    created_at: datetime
+    rows: int
+    results: list[BenchmarkResult]
+
+
+class BenchmarkActions(BaseActions):
+    def __init__(self):
+        self.messages = []
+
+    @rule_action(params={"message": FIELD_TEXT})
+    def mark(self, message: str):
+        self.messages.append(message)
+
+
+def measure(name: str, func: Callable[[], None], items: int, repeat: int, warmup: int = 1) -> BenchmarkResult:
+    """
+    func : 处理一轮 items 个条目的函数
+    warmup : 预热轮数，不计入结果（填充类型缓存、编解码计划等）
+    """
+    for _ in range(warmup):
+        func()
+    elapsed_list = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed_list.append(time.perf_counter() - start)
+    best = min(elapsed_list)
+    result = BenchmarkResult(
+        name=name,
+        items=items,
+        repeat=repeat,
+        best_seconds=best,
+        mean_seconds=statistics.mean(elapsed_list),
+        items_per_second=items / best if best > 0 else 0.0,
+    )
+    print(f"{name:<28} best of {repeat}: {best:.4f}s, {result.items_per_second:,.0f} items/s")
+    return result
+
+
+def bench_field_serialization(products: list[BenchmarkProduct], repeat: int) -> list[BenchmarkResult]:
+    fields = [(field_name, field_value) for product in products for field_name, field_value in product]
+    fields = [(field_name, field_value) for field_name, field_value in fields if field_value is not None]
+    field_types = {
+        field_name: PydanticUtils.get_native_field_type(BenchmarkProduct, field_name)
+        for field_name in BenchmarkProduct.model_fields
+    }
+    encoded = [
+        (BigtableUtils.pydantic_field_convert_str(field_value), field_types[field_name])
+        for field_name, field_value in fields
+    ]
+
+    def encode():
+        for _, field_value in fields:
+            BigtableUtils.pydantic_field_convert_str(field_value)
+
+    def decode():
+        for field_value, field_type in encoded:
+            BigtableUtils.str_convert_pydantic_field(field_value, field_type)
+
+    return [
+        measure("pydantic_field_convert_str", encode, len(fields), repeat),
+        measure("str_convert_pydantic_field", decode, len(encoded), repeat),
+    ]
+
+
+def bench_repository(products: list[BenchmarkProduct], repeat: int, batch_size: int) -> list[BenchmarkResult]:
+    # 使用内存表，只测量行与模型之间的转换及仓库自身的开销，不包含网络
+    repository = BigtableRepository(
+        bigtable_project_id="benchmark",
+        bigtable_instance_id="benchmark",
+        bigtable_table_id="benchmark_product",
+        model_class=BenchmarkProduct,
+        gen_rowkey=lambda product: product.f_sku_id,
+        default_cf="main_cf",
+        table=InMemoryBigtableTable("benchmark_product", column_families=["main_cf"]),
+    )
+    row_keys = [product.f_sku_id for product in products]
+    batches = [row_keys[i : i + batch_size] for i in range(0, len(row_keys), batch_size)]
+    rows = [build_row(product) for product in products]
+    codec = repository.model_codec
+
+    def save():
+        repository.save_models(models=products)
+
+    def read():
+        for batch in batches:
+            repository.read_models(row_keys=batch)
+
+    def convert_rows():
+        for row in rows:
+            codec.model_class(**codec.convert_row_to_dict(row)[0])
+
+    def convert_models():
+        for product in products:
+            codec.convert_model_to_cells(product)
+
+    try:
+        return [
+            measure("convert_model_to_row", convert_models, len(products), repeat),
+            measure("convert_row_to_model", convert_rows, len(rows), repeat),
+            measure("repository_save_models", save, len(products), repeat),
+            measure("repository_read_models", read, len(row_keys), repeat),
+        ]
+    finally:
+        repository.close()
+
+
+def bench_rule_engine(products: list[BenchmarkProduct], repeat: int) -> list[BenchmarkResult]:
+    build_count = 20
+
+    def build():
+        for _ in range(build_count):
+            VariablesFactory.build_variables(BenchmarkProduct)
+
+    variables_class = VariablesFactory.build_variables(BenchmarkProduct)
+
+    def run():
+        for product in products:
+            run_all(BENCHMARK_RULES, variables_class(new_obj=product), BenchmarkActions())
+
+    return [
+        measure("build_variables", build, build_count, repeat),
+        measure("run_all", run, len(products), repeat),
+    ]
+
+
+def bench_url_utils(rows: int, repeat: int) -> list[BenchmarkResult]:
+    urls = [BENCHMARK_URLS[i % len(BENCHMARK_URLS)].format(index=i) for i in range(rows)]
+
+    def full_subdomain():
+        for url in urls:
+            CommonUtils.get_full_subdomain(url)
+
+    def product_detail_rowkey():
+        for index, url in enumerate(urls):
+            ApplicationUtils.get_product_detail_rowkey(url, str(index))
+
+    return [
+        measure("get_full_subdomain", full_subdomain, len(urls), repeat),
+        measure("get_product_detail_rowkey", product_detail_rowkey, len(urls), repeat),
+    ]
+
+
+def run_benchmarks(rows: int, repeat: int, batch_size: int = 100) -> BenchmarkReport:
+    products = [build_product(i) for i in range(rows)]
+    results = [
+        *bench_field_serialization(products, repeat),
+        *bench_repository(products, repeat, batch_size),
+        *bench_rule_engine(products, repeat),
+        *bench_url_utils(rows, repeat),
+    ]
+    return BenchmarkReport(
+        package_version=get_package_version(),
+        python_version=platform.python_version(),
+        platform=platform.platform(),
+        created_at=datetime.now(timezone.utc),
+        rows=rows,
+        results=results,
+    )
+
+
+def compare_reports(baseline: BenchmarkReport, current: BenchmarkReport, threshold: float) -> list[str]:
+    """
+    按每个条目的最好耗时对比，返回变慢超过 threshold（如 0.1 表示 10%）的基准名称
+    """
+    baseline_results = {result.name: result for result in baseline.results}
+    regressions = []
+    print(f"\ncompare with {baseline.package_version} ({baseline.created_at:%Y-%m-%d %H:%M:%S}):")
+    for result in current.results:
+        base = baseline_results.get(result.name)
+        if base is None or base.items_per_second <= 0:
+            continue
+        ratio = base.items_per_second / result.items_per_second if result.items_per_second > 0 else float("inf")
+        regressed = ratio > 1 + threshold
+        if regressed:
+            regressions.append(result.name)
+        print(f"{result.name:<28} {ratio:.2f}x time{' REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def get_package_version() -> str:
+    try:
+        return metadata.version("favie-data-common")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Hot path benchmarks")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--output", help="保存结果的 JSON 文件")
+    parser.add_argument("--compare", help="作为基线的 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定为性能回退的变慢比例")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.rows, args.repeat, args.batch_size)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report.model_dump_json(indent=2))
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = BenchmarkReport.model_validate_json(file.read())
+        if compare_reports(baseline, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from datetime import datetime
 
+from google.cloud.bigtable.table import Table
+
 from favie_data_common.config_service.favie_config_service import FavieConfig, FavieConfigService
 from favie_data_common.database.bigtable.bigtable_repository import BigtableRepository
 
@@ -7,7 +9,10 @@ from favie_data_common.database.bigtable.bigtable_repository import BigtableRepo
 class BigtableFavieConfigService(FavieConfigService):
     default_cf = "config_cf"
 
-    def __init__(self, *, project_id, instance_id, config_table_id, timeout_sec=60):
+    def __init__(self, *, project_id, instance_id, config_table_id, timeout_sec=60, table: Table = None):
+        """
+        table: 配置表的存储后端，如 InMemoryBigtableTable，为空时连接 Bigtable
+        """
         super().__init__(timeout_sec)
         self.config_table_repository: BigtableRepository = BigtableRepository(
             bigtable_project_id=project_id,
@@ -16,6 +21,7 @@ class BigtableFavieConfigService(FavieConfigService):
             model_class=FavieConfig,
             default_cf=self.default_cf,
             gen_rowkey=self.config_key_generator,
+            table=table,
         )
 
     def config_key_generator(self, config_item: FavieConfig = None):
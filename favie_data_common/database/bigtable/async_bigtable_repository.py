@@ -0,0 +1,800 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, List, Optional, Set, Type, Union
+
+from google.cloud.bigtable.data import (
+    BigtableDataClientAsync,
+    DeleteAllFromRow,
+    DeleteRangeFromColumn,
+    ReadRowsQuery,
+    RowMutationEntry,
+    RowRange,
+    SetCell,
+    TableAsync,
+)
+from google.cloud.bigtable.data.row import Row
+from pydantic import BaseModel
+
+from favie_data_common.common.common_utils import CommonUtils
+from favie_data_common.database.bigtable.bigtable_filter import BigtableFilterCompiler
+from favie_data_common.database.bigtable.bigtable_model_codec import BigtableModelCodec
+from favie_data_common.database.bigtable.bigtable_repository import (
+    BigtableIndex,
+    BigtableModelHistory,
+    BigtableModelPage,
+    FieldDeserializer,
+)
+from favie_data_common.database.bigtable.bigtable_utils import BigtableUtils
+
+
+class AsyncBigtableRepository:
+    """
+    基于 Bigtable 异步 data client 的仓库，模型、列族、列族迁移及二级索引的语义与 BigtableRepository 一致，
+    所有读写方法均为协程，高并发下不占用线程。
+    """
+
+    NULL_CF = BigtableModelCodec.NULL_CF
+
+    def __init__(
+        self,
+        *,
+        bigtable_project_id: str,
+        bigtable_instance_id: str,
+        bigtable_table_id: str,
+        model_class: Type[BaseModel],
+        gen_rowkey: Callable[[BaseModel], str] = None,
+        default_cf: str = None,
+        cf_config: dict[str, str] = None,
+        bigtable_index: "AsyncBigtableIndexRepository" = None,
+        cf_migration: dict[str, (str, str)] = None,
+        derializer_config: dict[str, FieldDeserializer] = None,
+        model_define_deserializer: bool = False,
+        charset: str = "utf-8",
+        client: BigtableDataClientAsync = None,
+        table: TableAsync = None,
+    ):
+        """
+        bigtable_project_id: BigTable 项目 ID
+        bigtable_instance_id: BigTable 实例 ID
+        bigtable_table_id: BigTable 表 ID
+        model_class: BigTable表对应的Pydantic模型类
+        gen_row_key: 根据Pydantic模型生成row_key的函数
+        cf_config: 字段对应的列族，只需要配置不对应default_cf的即可，如果为无配置则使用default_cf
+        default_cf: 默认列族，如果cf_config中没有配置则使用default_cf
+        bigtable_index:bigtable二级索引
+        cf_migration:列族迁移配置，key为列名，value为（旧列簇,新列簇）元组
+        derializer_config:字段反序列化配置，key为列名，value为FieldDeserializer对象
+        client: 可选，多个仓库共享同一个 BigtableDataClientAsync；为空时在第一次调用时创建
+        table: 可选，直接使用传入的表（如 InMemoryBigtableTableAsync），设置后不再创建 client
+        """
+        self.bigtable_project_id = bigtable_project_id
+        self.bigtable_instance_id = bigtable_instance_id
+        self.bigtable_table_id = bigtable_table_id
+        self.client = client
+        self.table: Optional[TableAsync] = table
+        self.model_class = model_class
+        self.gen_row_key = gen_rowkey
+        self.cf_config = cf_config
+        self.default_cf = default_cf
+        self.bigtable_index = bigtable_index
+        self.cf_migration = cf_migration
+        self.derializer_config = derializer_config
+        self.model_define_deserializer = model_define_deserializer
+        self.charset = charset
+        self.logger = logging.getLogger(__name__)
+        self.__own_client = client is None
+        # 持有后台任务（列族迁移清理）的引用，避免任务被垃圾回收
+        self.__background_tasks: set[asyncio.Task] = set()
+        self.__init_cf_list()
+        self.model_codec = BigtableModelCodec(
+            model_class=self.model_class,
+            charset=self.charset,
+            default_cf=self.default_cf,
+            cf_config=self.cf_config,
+            cf_migration=self.cf_migration,
+            derializer_config=self.derializer_config,
+            model_define_deserializer=self.model_define_deserializer,
+        )
+        self.filter_compiler = BigtableFilterCompiler(model_codec=self.model_codec, async_api=True)
+
+    def __init_cf_list(self):
+        cf_set = set([self.default_cf]) if self.default_cf else set()
+        if self.cf_config:
+            cf_set.update(list(self.cf_config.values()))
+        self.cf_list = list(cf_set)
+
+    def __get_table(self) -> TableAsync:
+        # BigtableDataClientAsync 需要在事件循环中创建，因此延迟到第一次调用时初始化
+        if self.table is None:
+            if self.client is None:
+                self.client = BigtableDataClientAsync(project=self.bigtable_project_id)
+            self.table = self.client.get_table(self.bigtable_instance_id, self.bigtable_table_id)
+        return self.table
+
+    async def save_model(
+        self,
+        *,
+        model: BaseModel,
+        save_cfs: Optional[Set[str]] = None,
+        version: int = None,
+        exclude_fields: list[str] = None,
+        ignore_index: bool = False,
+    ):
+        """
+        数据写入成功后才写入索引，写入失败时抛出异常，不写入索引
+
+        model : pydantic object need to be saved
+        save_cfs : list of column families need to be saved
+        version : version number of saved data
+        """
+        if not model:
+            return
+        entry = self.__convert_model_to_entry(model, save_cfs=save_cfs, version=version, exclude_fields=exclude_fields)
+        if entry:
+            await self.__get_table().mutate_row(entry.row_key, entry.mutations)
+        if self.bigtable_index and not ignore_index:
+            await self.bigtable_index.save_index(model=model, version=version)
+
+    async def delete_model(self, *, model: BaseModel):
+        """
+        数据删除成功后才删除索引行，与写入时的顺序一致
+        """
+        if not model:
+            return None
+        await self.__get_table().mutate_row(self.gen_row_key(model).encode(self.charset), DeleteAllFromRow())
+        if self.bigtable_index:
+            await self.bigtable_index.delete_index(model=model)
+
+    async def save_models(
+        self,
+        *,
+        models: List[BaseModel],
+        save_cfs: Optional[Set[str]] = None,
+        version: int = None,
+        exclude_fields: list[str] = None,
+        ignore_indexes: list[str] = None,
+    ):
+        """
+        models : list of pydantic objects need to be saved
+        save_cfs : list of column families need to be saved
+        version : version number of saved data
+        """
+        if not models:
+            return
+        entries = [
+            self.__convert_model_to_entry(model, save_cfs=save_cfs, version=version, exclude_fields=exclude_fields)
+            for model in models
+        ]
+        entries = [entry for entry in entries if entry]
+        if entries:
+            await self.__get_table().bulk_mutate_rows(entries)
+        if self.bigtable_index:
+            if ignore_indexes:
+                await self.bigtable_index.save_indexes(
+                    models=[model for model in models if self.gen_row_key(model) not in ignore_indexes], version=version
+                )
+            else:
+                await self.bigtable_index.save_indexes(models=models, version=version)
+
+    async def delete_models(self, *, models: List[BaseModel]):
+        if not models:
+            return None
+        entries = [
+            RowMutationEntry(self.gen_row_key(model).encode(self.charset), DeleteAllFromRow()) for model in models
+        ]
+        await self.__get_table().bulk_mutate_rows(entries)
+        if self.bigtable_index:
+            await self.bigtable_index.delete_indexes(models=models)
+
+    async def delete_fields(self, *, model: BaseModel, deleted_fields: list[(str, str)]):
+        await self.__delete_fields(self.gen_row_key(model), deleted_fields)
+
+    async def read_model(self, *, row_key: str, version: int = None, fields: list[str] = None) -> Optional[BaseModel]:
+        """
+        row_key : rowkey for data to be read
+        version : version number for reading data
+        fields : list of columns to read from data
+        """
+        combined_filter = self.__gen_filters(version=version, fields=fields)
+        row: Optional[Row] = await self.__get_table().read_row(row_key.encode(self.charset), row_filter=combined_filter)
+        if row is None:
+            self.logger.debug(f"Can't find model: row_key = {row_key}, version = {version} , fields = {fields}")
+            return None
+        return self.__convert_row_to_model(row=row, row_key=row_key)
+
+    async def read_by_model(
+        self, *, model: BaseModel, version: int = None, fields: list[str] = None
+    ) -> Optional[BaseModel]:
+        """
+        model : pydantic object need to be read
+        version : version number for reading data
+        fields : list of columns to read from data
+        """
+        return await self.read_model(row_key=self.gen_row_key(model), version=version, fields=fields)
+
+    async def read_model_history(
+        self,
+        *,
+        row_key: str,
+        versions: int = None,
+        start_version: int = None,
+        end_version: int = None,
+        fields: list[str] = None,
+        filters: list = None,
+    ) -> Optional[BigtableModelHistory]:
+        """
+        一次请求读取一行的多个版本，按时间正序组装为各版本的模型与每个字段的时间线
+
+        row_key : rowkey for data to be read
+        versions : 每个字段最多读取最近的版本数，为空时不限制
+        start_version : 时间窗口起点（秒级版本号，包含），为空时不限制
+        end_version : 时间窗口终点（秒级版本号，不包含），为空时不限制
+        fields : list of columns to read from data
+        filters : BigtableFilters 生成的过滤条件或原始过滤器
+        """
+        row_filter = self.__gen_history_filter(versions, start_version, end_version, fields, filters)
+        row: Optional[Row] = await self.__get_table().read_row(row_key.encode(self.charset), row_filter=row_filter)
+        if row is None:
+            return None
+        return BigtableModelHistory.build(row_key, self.model_class, self.model_codec.convert_row_to_versions(row))
+
+    async def read_models_history(
+        self,
+        *,
+        row_keys: list[str],
+        versions: int = None,
+        start_version: int = None,
+        end_version: int = None,
+        fields: list[str] = None,
+        filters: list = None,
+        chunk_size: int = None,
+        max_workers: int = None,
+    ) -> dict[str, BigtableModelHistory]:
+        """
+        批量读取多行的多个版本，参数同 read_model_history
+
+        chunk_size : 每次请求的 rowkey 数量，设置后分批并发读取
+        max_workers : 同时进行的分批请求数量，默认为 4
+        return : {rowkey: 历史}，不存在的 rowkey 不在结果中
+        """
+        if CommonUtils.list_len(row_keys) == 0:
+            return {}
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive: {chunk_size}")
+        row_filter = self.__gen_history_filter(versions, start_version, end_version, fields, filters)
+        unique_row_keys = list(dict.fromkeys(row_keys))
+        chunk_size = chunk_size or len(unique_row_keys)
+        semaphore = asyncio.Semaphore(max_workers or 4)
+
+        async def read_chunk(chunk_row_keys: list[str]) -> dict[str, BigtableModelHistory]:
+            query = ReadRowsQuery(
+                row_keys=[row_key.encode(self.charset) for row_key in chunk_row_keys], row_filter=row_filter
+            )
+            async with semaphore:
+                rows = await self.__get_table().read_rows(query)
+            histories = {}
+            for row in rows:
+                row_key = row.row_key.decode(self.charset)
+                histories[row_key] = BigtableModelHistory.build(
+                    row_key, self.model_class, self.model_codec.convert_row_to_versions(row)
+                )
+            return histories
+
+        histories = {}
+        for chunk_histories in await asyncio.gather(
+            *[read_chunk(unique_row_keys[i : i + chunk_size]) for i in range(0, len(unique_row_keys), chunk_size)]
+        ):
+            histories.update(chunk_histories)
+        return histories
+
+    async def read_models(
+        self,
+        *,
+        row_keys: list[str],
+        version: int = None,
+        fields: list[str] = None,
+        chunk_size: int = None,
+        max_workers: int = None,
+        aligned: bool = False,
+    ):
+        """
+        row_keys : list of rowkeys for data to be read
+        version : version number for reading data
+        fields : list of columns to read from data
+        chunk_size : 每次请求的 rowkey 数量，设置后分批并发读取
+        max_workers : 同时进行的分批请求数量，默认为 4
+        aligned : 为 True 时返回与 row_keys 一一对应的列表，不存在的 rowkey 对应 None
+        """
+        if CommonUtils.list_len(row_keys) == 0:
+            return None
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive: {chunk_size}")
+
+        if chunk_size is None and not aligned:
+            query = ReadRowsQuery(
+                row_keys=[row_key.encode(self.charset) for row_key in row_keys],
+                row_filter=self.__gen_filters(version=version, fields=fields),
+            )
+            rows = await self.__get_table().read_rows(query)
+            results = [self.__convert_row_to_model(row) for row in rows]
+            return results if CommonUtils.list_len(results) > 0 else None
+
+        models = await self.__read_models_by_key(
+            row_keys=row_keys, version=version, fields=fields, chunk_size=chunk_size, max_workers=max_workers
+        )
+        if aligned:
+            return [models.get(row_key) for row_key in row_keys]
+        results = [models[row_key] for row_key in dict.fromkeys(row_keys) if row_key in models]
+        return results if CommonUtils.list_len(results) > 0 else None
+
+    async def read_models_map(
+        self,
+        *,
+        row_keys: list[str],
+        version: int = None,
+        fields: list[str] = None,
+        chunk_size: int = None,
+        max_workers: int = None,
+    ) -> dict[str, BaseModel]:
+        """
+        按 rowkey 批量读取，返回 {rowkey: 模型}，rowkey 取自读取到的行，调用方无需再用 gen_row_key 关联结果；
+        不存在的 rowkey 不在结果中
+
+        row_keys : list of rowkeys for data to be read
+        version : version number for reading data
+        fields : list of columns to read from data
+        chunk_size : 每次请求的 rowkey 数量，设置后分批并发读取
+        max_workers : 分批读取的并发数，默认为 4
+        """
+        if CommonUtils.list_len(row_keys) == 0:
+            return {}
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive: {chunk_size}")
+        return await self.__read_models_by_key(
+            row_keys=row_keys, version=version, fields=fields, chunk_size=chunk_size, max_workers=max_workers
+        )
+
+    async def query_models(
+        self, *, index_key: str, version: int = None, fields: list[str] = None, limit: int = None, filters: list = None
+    ):
+        """
+        Query Bigtable by index key.
+
+        Args:
+        index_key : query by index key
+        version : version number for reading data
+        fields : list of columns to read from data
+        """
+        if not self.bigtable_index:
+            self.logger.error("Bigtable index is not configured")
+            return None
+        indexes: list[BigtableIndex] = await self.bigtable_index.scan_index(
+            index_key=index_key, version=version, limit=limit, filters=filters
+        )
+        if CommonUtils.list_len(indexes) == 0:
+            return None
+        row_keys = [index.rowkey for index in indexes]
+        return await self.read_models(row_keys=row_keys, version=version, fields=fields)
+
+    async def query_models_page(
+        self,
+        *,
+        index_key: str,
+        page_size: int,
+        continuation_token: str = None,
+        version: int = None,
+        fields: list[str] = None,
+        filters: list = None,
+    ) -> BigtableModelPage:
+        """
+        按索引分页查询，从 continuation_token 指向的索引行之后继续扫描
+
+        page_size : 每页的索引数量
+        continuation_token : 上一页返回的 continuation_token，为空时从第一页开始
+        """
+        if not self.bigtable_index:
+            self.logger.error("Bigtable index is not configured")
+            return BigtableModelPage()
+        index_page = await self.bigtable_index.scan_index_page(
+            index_key=index_key,
+            page_size=page_size,
+            continuation_token=continuation_token,
+            version=version,
+            filters=filters,
+        )
+        row_keys = [index.rowkey for index in index_page.models]
+        models_map = await self.read_models_map(row_keys=row_keys, version=version, fields=fields) if row_keys else {}
+        return BigtableModelPage(
+            models=[models_map[row_key] for row_key in row_keys if row_key in models_map],
+            continuation_token=index_page.continuation_token,
+        )
+
+    async def scan_models(
+        self,
+        *,
+        rowkey_prefix: str,
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+    ):
+        """
+        Scan Bigtable rowkeys based on a given prefix.
+
+        Args:
+        rowkey_prefix : the prefix to scan for in rowkeys
+        version : version number for reading data
+        fields : list of columns to read from data
+        filters : google.cloud.bigtable.data.row_filters 中的过滤器
+        """
+        if not rowkey_prefix:
+            return None
+
+        start_key, end_key = self.__gen_prefix_range(rowkey_prefix)
+        row_range = self.__gen_row_range(start_key, end_key)
+        query = ReadRowsQuery(
+            row_ranges=row_range,
+            limit=limit,
+            row_filter=self.__gen_filters(version=version, fields=fields, other_filters=filters),
+        )
+        rows = await self.__get_table().read_rows(query)
+        results = [self.__convert_row_to_model(row) for row in rows]
+        return results if CommonUtils.list_len(results) > 0 else None
+
+    async def scan_range(
+        self,
+        *,
+        start_key: str = None,
+        end_key: str = None,
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+    ):
+        """
+        Scan Bigtable rows in the key range [start_key, end_key).
+
+        Args:
+        start_key : 起始 rowkey（含），为空时从表头开始
+        end_key : 结束 rowkey（不含），为空时扫描到表尾
+        filters : google.cloud.bigtable.data.row_filters 中的过滤器
+        """
+        row_range = self.__gen_row_range(
+            start_key.encode(self.charset) if start_key else None, end_key.encode(self.charset) if end_key else None
+        )
+        if row_range is None:
+            return None
+        query = ReadRowsQuery(
+            row_ranges=row_range,
+            limit=limit,
+            row_filter=self.__gen_filters(version=version, fields=fields, other_filters=filters),
+        )
+        rows = await self.__get_table().read_rows(query)
+        results = [self.__convert_row_to_model(row) for row in rows]
+        return results if CommonUtils.list_len(results) > 0 else None
+
+    async def scan_page(
+        self,
+        *,
+        rowkey_prefix: str,
+        page_size: int,
+        continuation_token: str = None,
+        version: int = None,
+        fields: list[str] = None,
+        filters: list = None,
+    ) -> BigtableModelPage:
+        """
+        分页扫描前缀，每次请求只读取 page_size + 1 行（多读的一行用于判断是否还有下一页）
+
+        rowkey_prefix : 为空时返回空页，与 scan_models 一致
+        continuation_token : 上一页返回的 continuation_token（最后一行的 rowkey），为空时从第一页开始
+        return : 本页的模型及 continuation_token，最后一页的 continuation_token 为空
+        """
+        if page_size <= 0:
+            raise ValueError(f"page_size must be positive: {page_size}")
+        if not rowkey_prefix:
+            return BigtableModelPage()
+        start_key, end_key = self.__gen_prefix_range(rowkey_prefix)
+        row_range = self.__gen_row_range(start_key, end_key, start_after=continuation_token)
+        if row_range is None:
+            return BigtableModelPage()
+        query = ReadRowsQuery(
+            row_ranges=row_range,
+            limit=page_size + 1,
+            row_filter=self.__gen_filters(version=version, fields=fields, other_filters=filters),
+        )
+        rows = await self.__get_table().read_rows(query)
+        if len(rows) <= page_size:
+            return BigtableModelPage(models=[self.__convert_row_to_model(row) for row in rows])
+        rows = rows[:page_size]
+        return BigtableModelPage(
+            models=[self.__convert_row_to_model(row) for row in rows],
+            continuation_token=rows[-1].row_key.decode(self.charset),
+        )
+
+    async def iter_read_models(
+        self, *, row_keys: list[str], version: int = None, fields: list[str] = None
+    ) -> AsyncIterator[BaseModel]:
+        """
+        与 read_models 相同，但随着数据流返回逐个产出模型，不在内存中保留全部结果
+        """
+        if CommonUtils.list_len(row_keys) == 0:
+            return
+        query = ReadRowsQuery(
+            row_keys=[row_key.encode(self.charset) for row_key in row_keys],
+            row_filter=self.__gen_filters(version=version, fields=fields),
+        )
+        async for row in await self.__get_table().read_rows_stream(query):
+            yield self.__convert_row_to_model(row)
+
+    async def iter_scan_models(
+        self,
+        *,
+        rowkey_prefix: str,
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+        continuation_token: str = None,
+    ) -> AsyncIterator[BaseModel]:
+        """
+        与 scan_models 相同，但随着数据流返回逐个产出模型，不在内存中保留全部结果
+
+        continuation_token : 从该 rowkey 之后（不含）开始扫描，用于断点续扫
+        """
+        if not rowkey_prefix:
+            return
+        start_key, end_key = self.__gen_prefix_range(rowkey_prefix)
+        row_range = self.__gen_row_range(start_key, end_key, start_after=continuation_token)
+        if row_range is None:
+            return
+        query = ReadRowsQuery(
+            row_ranges=row_range,
+            limit=limit,
+            row_filter=self.__gen_filters(version=version, fields=fields, other_filters=filters),
+        )
+        async for row in await self.__get_table().read_rows_stream(query):
+            yield self.__convert_row_to_model(row)
+
+    async def close(self):
+        if self.__background_tasks:
+            await asyncio.gather(*self.__background_tasks, return_exceptions=True)
+        if self.table is not None:
+            await self.table.close()
+        if self.__own_client and self.client is not None:
+            await self.client.close()
+
+    def __convert_model_to_entry(
+        self,
+        model: BaseModel,
+        save_cfs: Optional[Set[str]] = None,
+        version: int = None,
+        exclude_fields: list[str] = None,
+    ) -> Optional[RowMutationEntry]:
+        # version 为空时由客户端生成毫秒级时间戳，保证写入可重试
+        timestamp_micros = int(version * 1000 * 1000) if version is not None else None
+        mutations = [
+            SetCell(column_family, column_qualifier, column_value, timestamp_micros=timestamp_micros)
+            for column_family, column_qualifier, column_value in self.model_codec.convert_model_to_cells(
+                model, save_cfs=save_cfs, exclude_fields=exclude_fields
+            )
+        ]
+        if not mutations:
+            return None
+        return RowMutationEntry(self.gen_row_key(model).encode(self.charset), mutations)
+
+    # convert bigtable row to pydantic object
+    async def __read_models_by_key(
+        self,
+        *,
+        row_keys: list[str],
+        version: int = None,
+        fields: list[str] = None,
+        chunk_size: int = None,
+        max_workers: int = None,
+    ) -> dict[str, BaseModel]:
+        """
+        读取 row_keys 对应的模型，rowkey 直接取自 row.row_key，返回 {rowkey: 模型}，不存在的 rowkey 不在结果中
+        """
+        row_filter = self.__gen_filters(version=version, fields=fields)
+        unique_row_keys = list(dict.fromkeys(row_keys))
+        chunk_size = chunk_size or len(unique_row_keys)
+        semaphore = asyncio.Semaphore(max_workers or 4)
+
+        async def read_chunk(chunk_row_keys: list[str]) -> dict[str, BaseModel]:
+            query = ReadRowsQuery(
+                row_keys=[row_key.encode(self.charset) for row_key in chunk_row_keys], row_filter=row_filter
+            )
+            async with semaphore:
+                rows = await self.__get_table().read_rows(query)
+            return {row.row_key.decode(self.charset): self.__convert_row_to_model(row) for row in rows}
+
+        models = {}
+        for chunk_models in await asyncio.gather(
+            *[read_chunk(unique_row_keys[i : i + chunk_size]) for i in range(0, len(unique_row_keys), chunk_size)]
+        ):
+            models.update(chunk_models)
+        return models
+
+    def __gen_prefix_range(self, rowkey_prefix: str) -> tuple[bytes, Optional[bytes]]:
+        start_key = rowkey_prefix.encode(self.charset)
+        return start_key, BigtableUtils.gen_prefix_end_key(start_key)
+
+    def __gen_row_range(
+        self, start_key: Optional[bytes], end_key: Optional[bytes], start_after: Union[str, bytes] = None
+    ) -> Optional[RowRange]:
+        """
+        生成 [start_key, end_key) 的 RowRange，start_after 不为空时从该 rowkey 之后（不含）开始；
+        范围为空时返回 None
+        """
+        start_is_inclusive = True
+        if start_after:
+            start_after_key = start_after if isinstance(start_after, bytes) else start_after.encode(self.charset)
+            if start_key is None or start_after_key >= start_key:
+                start_key = start_after_key
+                start_is_inclusive = False
+        if start_key is not None and end_key is not None and start_key >= end_key:
+            return None
+        return RowRange(
+            start_key=start_key,
+            end_key=end_key,
+            start_is_inclusive=start_is_inclusive if start_key is not None else None,
+            end_is_inclusive=False if end_key is not None else None,
+        )
+
+    def __convert_row_to_model(self, row: Row, row_key: str = None):
+        model_dict, migration_status = self.model_codec.convert_row_to_dict(row)
+        if migration_status and row_key:
+            task = asyncio.create_task(self.__delete_migeration_fields(row_key, migration_status))
+            self.__background_tasks.add(task)
+            task.add_done_callback(self.__background_tasks.discard)
+        return self.model_class(**model_dict)
+
+    async def __delete_migeration_fields(self, row_key: str, fields: set[str]):
+        try:
+            if self.cf_migration and fields:
+                delete_fields = []
+                for field in fields:
+                    if field in self.cf_migration.keys():
+                        old_cf, _ = self.cf_migration[field]
+                        delete_fields.append((old_cf, field))
+                await self.__delete_fields(row_key, delete_fields)
+        except Exception as e:
+            self.logger.error(f"delete migration fields failed,row_key:{row_key},fields:{fields},error:{e}")
+
+    async def __delete_fields(self, row_key: str, fields: list[(str, str)]):
+        try:
+            if fields:
+                mutations = [DeleteRangeFromColumn(cf, field.encode(self.charset)) for cf, field in fields]
+                await self.__get_table().mutate_row(row_key.encode(self.charset), mutations)
+        except Exception as e:
+            self.logger.error(f"delete fields failed,row_key:{row_key},fields:{fields},error:{e}")
+
+    # generate filters for querying bigtable based on parameters
+    def __gen_filters(self, *, version: Optional[int], fields: Optional[list[str]], other_filters: list = None):
+        return self.filter_compiler.build_row_filter(version=version, fields=fields, other_filters=other_filters)
+
+    def __gen_history_filter(
+        self,
+        versions: Optional[int],
+        start_version: Optional[int],
+        end_version: Optional[int],
+        fields: Optional[list[str]],
+        filters: Optional[list],
+    ):
+        if versions is not None and versions <= 0:
+            raise ValueError(f"versions must be positive: {versions}")
+        if start_version is not None and end_version is not None and start_version >= end_version:
+            raise ValueError(f"start_version must be less than end_version: {start_version}, {end_version}")
+        return self.filter_compiler.build_history_filter(
+            versions=versions,
+            start_version=start_version,
+            end_version=end_version,
+            fields=fields,
+            other_filters=filters,
+        )
+
+
+class AsyncBigtableIndexRepository:
+    def __init__(
+        self,
+        *,
+        bigtable_project_id,
+        bigtable_instance_id,
+        bigtable_index_table_id,
+        index_class: Type[BigtableIndex] = None,
+        index_cf: str = None,
+        gen_index: Callable[[BaseModel], BigtableIndex] = None,
+        client: BigtableDataClientAsync = None,
+        table: TableAsync = None,
+    ):
+        """
+        client : 可选，与数据表仓库共享的 BigtableDataClientAsync
+        table : 可选，直接使用传入的索引表（如 InMemoryBigtableTableAsync）
+        """
+        self.gen_index = gen_index
+        self.index_table = AsyncBigtableRepository(
+            bigtable_project_id=bigtable_project_id,
+            bigtable_instance_id=bigtable_instance_id,
+            bigtable_table_id=bigtable_index_table_id,
+            model_class=index_class if index_class else BigtableIndex,
+            default_cf=index_cf,
+            gen_rowkey=self._gen_rowkey,
+            client=client,
+            table=table,
+        )
+
+    async def save_index(self, *, model: BaseModel, version: int = None):
+        index = self.gen_index(model)
+        await self.index_table.save_model(model=index, exclude_fields=["index_key"])
+
+    async def delete_index(self, *, model: BaseModel):
+        index = self.gen_index(model)
+        await self.index_table.delete_model(model=index)
+
+    async def save_indexes(self, *, models: List[BaseModel], version: int = None):
+        indexes = [self.gen_index(model) for model in models]
+        await self.index_table.save_models(models=indexes, exclude_fields=["index_key"])
+
+    async def delete_indexes(self, *, models: List[BaseModel]):
+        indexes = [self.gen_index(model) for model in models]
+        await self.index_table.delete_models(models=indexes)
+
+    async def scan_index(
+        self, *, index_key: str, version: int = None, filters: list = None, limit: int = None
+    ) -> list[BaseModel]:
+        # 前缀扫描转换为 rowkey 范围 [index_key, index_key 的后继)，只访问索引所在的 tablet
+        return await self.index_table.scan_models(rowkey_prefix=index_key, limit=limit, filters=filters)
+
+    async def scan_index_page(
+        self,
+        *,
+        index_key: str,
+        page_size: int,
+        continuation_token: str = None,
+        version: int = None,
+        filters: list = None,
+    ) -> BigtableModelPage:
+        return await self.index_table.scan_page(
+            rowkey_prefix=index_key, page_size=page_size, continuation_token=continuation_token, filters=filters
+        )
+
+    async def close(self):
+        if self.index_table:
+            await self.index_table.close()
+
+    def _gen_rowkey(self, model: BigtableIndex):
+        return f"{model.index_key}#{model.rowkey}"
+
+
+class AsyncBigtableSingleMapIndexRepository(AsyncBigtableIndexRepository):
+    async def scan_index(
+        self, *, index_key: str, version: int = None, filters: list = None, limit: int = None
+    ) -> list[BaseModel]:
+        index = await self.index_table.read_model(row_key=index_key)
+        return [index] if index else None
+
+    async def scan_index_page(
+        self,
+        *,
+        index_key: str,
+        page_size: int,
+        continuation_token: str = None,
+        version: int = None,
+        filters: list = None,
+    ) -> BigtableModelPage:
+        """
+        单映射索引每个 index_key 只有一行，第一页即全部结果
+        """
+        if page_size <= 0:
+            raise ValueError(f"page_size must be positive: {page_size}")
+        if continuation_token:
+            return BigtableModelPage()
+        index = await self.index_table.read_model(row_key=index_key)
+        return BigtableModelPage(models=[index] if index else [])
+
+    async def read_indexes(self, *, index_keys: List[str], version: int = None, filters: list = None):
+        return await self.index_table.read_models(row_keys=index_keys, version=version, fields=None)
+
+    def _gen_rowkey(self, model):
+        return model.index_key
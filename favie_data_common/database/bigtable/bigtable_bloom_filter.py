@@ -0,0 +1,152 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+
+from pydantic import BaseModel
+
+# 文件头：魔数、位数组长度（bit）、哈希函数个数、已加入的 key 数
+_FILE_HEADER = struct.Struct("<4sQIQ")
+_FILE_MAGIC = b"BTBF"
+
+
+class BigtableBloomFilterStats(BaseModel):
+    items: int = 0
+    size_bits: int = 0
+    hash_count: int = 0
+    # 配置的误判率
+    false_positive_rate: float = 0.0
+    # 按当前置位比例估算的误判率
+    estimated_false_positive_rate: float = 0.0
+    lookups: int = 0
+    # 判定不存在、直接在本地返回的查询数
+    negatives: int = 0
+    # 判定可能存在、但 Bigtable 中没有结果的查询数（误判或已删除的 key）
+    false_positives: int = 0
+
+    @property
+    def observed_false_positive_rate(self) -> float:
+        """
+        实际误判率：可能存在但没有结果的查询占所有不存在查询的比例
+        """
+        absent = self.negatives + self.false_positives
+        return self.false_positives / absent if absent else 0.0
+
+
+class BigtableBloomFilter:
+    """
+    index_key 的布隆过滤器：判定不存在的 key 一定不存在，可以在本地直接返回空结果，不必请求 Bigtable；
+    判定可能存在的 key 以 false_positive_rate 的概率误判，仍需请求 Bigtable。
+
+    布隆过滤器不支持删除，删除的 key 会一直判定为可能存在，需要定期重建以清除。
+    可以保存到文件，并在加载时通过 mmap 映射文件，多个进程共享同一份只读页缓存。
+    """
+
+    def __init__(self, *, expected_items: int = 1000000, false_positive_rate: float = 0.01):
+        """
+        expected_items : 预计的 key 数量，超过后实际误判率会高于 false_positive_rate
+        false_positive_rate : 期望的误判率，取值 (0, 1)
+        """
+        if expected_items <= 0:
+            raise ValueError(f"expected_items must be positive: {expected_items}")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(f"false_positive_rate must be in (0, 1): {false_positive_rate}")
+        self.false_positive_rate = false_positive_rate
+        # m = -n * ln(p) / ln(2)^2，k = m / n * ln(2)
+        self.size_bits = max(8, math.ceil(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size_bits / expected_items * math.log(2)))
+        self.items = 0
+        self.__bits = bytearray((self.size_bits + 7) // 8)
+        self.__lock = threading.Lock()
+        self.__lookups = 0
+        self.__negatives = 0
+        self.__false_positives = 0
+
+    def add(self, key: str):
+        positions = self.__positions(key)
+        with self.__lock:
+            for position in positions:
+                self.__bits[position >> 3] |= 1 << (position & 7)
+            self.items += 1
+
+    def add_all(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def might_contain(self, key: str) -> bool:
+        """
+        return : False 表示 key 一定不存在，True 表示 key 可能存在
+        """
+        bits = self.__bits
+        contained = all(bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(key))
+        with self.__lock:
+            self.__lookups += 1
+            if not contained:
+                self.__negatives += 1
+        return contained
+
+    def record_false_positive(self):
+        """
+        判定可能存在的 key 在 Bigtable 中没有结果时调用，用于统计实际误判率
+        """
+        with self.__lock:
+            self.__false_positives += 1
+
+    def stats(self) -> BigtableBloomFilterStats:
+        with self.__lock:
+            set_bits = int.from_bytes(self.__bits, "little").bit_count()
+            return BigtableBloomFilterStats(
+                items=self.items,
+                size_bits=self.size_bits,
+                hash_count=self.hash_count,
+                false_positive_rate=self.false_positive_rate,
+                estimated_false_positive_rate=(set_bits / self.size_bits) ** self.hash_count,
+                lookups=self.__lookups,
+                negatives=self.__negatives,
+                false_positives=self.__false_positives,
+            )
+
+    def save(self, path: str):
+        """
+        保存到文件，先写临时文件再替换，避免读取方映射到写了一半的文件
+        """
+        tmp_path = f"{path}.tmp"
+        with self.__lock:
+            with open(tmp_path, "wb") as file:
+                file.write(_FILE_HEADER.pack(_FILE_MAGIC, self.size_bits, self.hash_count, self.items))
+                file.write(self.__bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, *, false_positive_rate: float = 0.01, use_mmap: bool = True) -> "BigtableBloomFilter":
+        """
+        从 save 保存的文件加载
+
+        false_positive_rate : 文件中不保存误判率，只用于统计展示
+        use_mmap : True 时通过 mmap 映射文件（写时复制，add 不会修改文件），False 时读入内存
+        """
+        with open(path, "rb") as file:
+            magic, size_bits, hash_count, items = _FILE_HEADER.unpack(file.read(_FILE_HEADER.size))
+            if magic != _FILE_MAGIC:
+                raise ValueError(f"invalid bloom filter file: {path}")
+            if use_mmap:
+                bits = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY))[_FILE_HEADER.size :]
+            else:
+                bits = bytearray(file.read())
+        if len(bits) * 8 < size_bits:
+            raise ValueError(f"truncated bloom filter file: {path}")
+        bloom_filter = cls(expected_items=1, false_positive_rate=false_positive_rate)
+        bloom_filter.size_bits = size_bits
+        bloom_filter.hash_count = hash_count
+        bloom_filter.items = items
+        bloom_filter.__bits = bits
+        return bloom_filter
+
+    def __positions(self, key: str) -> list[int]:
+        # 双重哈希：由一次 blake2b 的两段生成 k 个位置
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hash_count)]
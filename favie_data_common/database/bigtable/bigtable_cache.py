@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from pydantic import BaseModel
+
+
+class BigtableCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    size: int = 0
+
+
+class BigtableCache:
+    """
+    BigtableRepository 的读缓存接口，缓存 key 为 (row_key, fields, version)，
+    可替换为外部缓存（如 Redis）的实现
+    """
+
+    def get(self, key: tuple[str, Optional[tuple], Optional[int]]) -> tuple[bool, Any]:
+        """
+        key : (row_key, fields, version)
+        return : (是否命中, 缓存的模型)，模型不存在时缓存值为 None
+        """
+        return False, None
+
+    def put(self, key: tuple[str, Optional[tuple], Optional[int]], value: Any):
+        pass
+
+    def invalidate(self, row_key: str):
+        """
+        删除 row_key 对应的所有缓存（不同 fields、version 的组合）
+        """
+
+    def clear(self):
+        pass
+
+    def stats(self) -> BigtableCacheStats:
+        return BigtableCacheStats()
+
+
+class LruTtlBigtableCache(BigtableCache):
+    """
+    进程内线程安全的 LRU 缓存，超过 max_size 时淘汰最久未访问的条目，每个条目在 ttl_seconds 后过期。
+    缓存返回的是同一个模型对象，调用方不应修改。
+    """
+
+    def __init__(self, *, max_size: int = 10000, ttl_seconds: float = 60):
+        """
+        max_size : 最多缓存的条目数
+        ttl_seconds : 条目的有效期（秒）
+        """
+        if max_size <= 0:
+            raise ValueError(f"max_size must be positive: {max_size}")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # key 为 (row_key, fields, version)，value 为 (过期时间, 模型)
+        self.__entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # row_key 对应的所有缓存 key，用于按 row_key 失效
+        self.__row_keys: dict[str, set[Hashable]] = {}
+        self.__lock = threading.Lock()
+        self.__stats = BigtableCacheStats()
+
+    def get(self, key: tuple[str, Optional[tuple], Optional[int]]) -> tuple[bool, Any]:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__stats.misses += 1
+                return False, None
+            expire_at, value = entry
+            if expire_at <= time.monotonic():
+                self.__remove(key)
+                self.__stats.expirations += 1
+                self.__stats.misses += 1
+                return False, None
+            self.__entries.move_to_end(key)
+            self.__stats.hits += 1
+            return True, value
+
+    def put(self, key: tuple[str, Optional[tuple], Optional[int]], value: Any):
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+            self.__entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.__row_keys.setdefault(key[0], set()).add(key)
+            while len(self.__entries) > self.max_size:
+                oldest_key = next(iter(self.__entries))
+                self.__remove(oldest_key)
+                self.__stats.evictions += 1
+
+    def invalidate(self, row_key: str):
+        with self.__lock:
+            keys = self.__row_keys.pop(row_key, None)
+            if not keys:
+                return
+            for key in keys:
+                self.__entries.pop(key, None)
+            self.__stats.invalidations += len(keys)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__row_keys.clear()
+
+    def stats(self) -> BigtableCacheStats:
+        with self.__lock:
+            return self.__stats.model_copy(update={"size": len(self.__entries)})
+
+    def __remove(self, key: Hashable):
+        self.__entries.pop(key, None)
+        keys = self.__row_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.__row_keys[key[0]]
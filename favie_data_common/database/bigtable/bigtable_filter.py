@@ -0,0 +1,330 @@
+import re
+from datetime import datetime, timezone
+from typing import Any, Callable, Literal, Optional, Union
+
+from google.cloud.bigtable import row_filters
+from google.cloud.bigtable.data import row_filters as data_row_filters
+from pydantic import BaseModel, ConfigDict
+
+from favie_data_common.common.pydantic_utils import PydanticUtils
+from favie_data_common.database.bigtable.bigtable_model_codec import BigtableModelCodec
+
+
+class BigtableFieldFilter(BaseModel):
+    """
+    按模型字段过滤行：只返回该字段最新的值满足条件的行，返回的列不受影响
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    field: str
+    op: Literal["equals", "regex", "range", "present", "absent"]
+    value: Any = None
+    # range 的上下界，为空表示不限制
+    start: Any = None
+    end: Any = None
+    start_inclusive: bool = True
+    end_inclusive: bool = False
+
+
+class BigtableTimestampFilter(BaseModel):
+    """
+    按 cell 时间戳过滤 cell，[start, end)
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+
+BigtableFilterSpec = Union[BigtableFieldFilter, BigtableTimestampFilter]
+
+
+class BigtableFilters:
+    """
+    构造 scan_models / query_models 等方法的 filters 参数，编译为服务端执行的 Bigtable 过滤器，
+    可以与原始的 google-cloud-bigtable 过滤器混合使用
+    """
+
+    @staticmethod
+    def equals(field: str, value: Any) -> BigtableFieldFilter:
+        if value is None:
+            raise ValueError(f"equals value is None, use absent instead: {field}")
+        return BigtableFieldFilter(field=field, op="equals", value=value)
+
+    @staticmethod
+    def regex(field: str, pattern: str) -> BigtableFieldFilter:
+        """
+        pattern : RE2 正则，需要完整匹配字段序列化后的字符串
+        """
+        return BigtableFieldFilter(field=field, op="regex", value=pattern)
+
+    @staticmethod
+    def range(
+        field: str, start: Any = None, end: Any = None, start_inclusive: bool = True, end_inclusive: bool = False
+    ) -> BigtableFieldFilter:
+        """
+        按字段序列化后的字节序比较，只支持字符串类型的字段（数值以十进制文本保存，字节序与数值大小不一致）
+        """
+        return BigtableFieldFilter(
+            field=field,
+            op="range",
+            start=start,
+            end=end,
+            start_inclusive=start_inclusive,
+            end_inclusive=end_inclusive,
+        )
+
+    @staticmethod
+    def present(field: str) -> BigtableFieldFilter:
+        return BigtableFieldFilter(field=field, op="present")
+
+    @staticmethod
+    def absent(field: str) -> BigtableFieldFilter:
+        return BigtableFieldFilter(field=field, op="absent")
+
+    @staticmethod
+    def timestamp_range(start: datetime = None, end: datetime = None) -> BigtableTimestampFilter:
+        return BigtableTimestampFilter(start=start, end=end)
+
+
+class BigtableFilterCompiler:
+    """
+    将 BigtableFilters 生成的过滤条件编译为 Bigtable 过滤器。
+    每个字段的列谓词（列族、列名正则及序列化函数）只编译一次，过滤值在每次调用时绑定，
+    缓存大小只与字段数有关，不随过滤值增长。
+
+    字段条件编译为 ConditionalRowFilter：谓词读取该字段最新的 cell，满足时整行通过，否则整行丢弃；
+    多个字段条件按顺序串联，即 AND 关系。
+    """
+
+    def __init__(self, *, model_codec: BigtableModelCodec, async_api: bool = False):
+        """
+        model_codec : 仓库的编解码器，用于获取字段所在的列族与序列化方式
+        async_api : True 时生成 google.cloud.bigtable.data 的过滤器，供 AsyncBigtableRepository 使用
+        """
+        self.model_codec = model_codec
+        self.async_api = async_api
+        self.__filters = data_row_filters if async_api else row_filters
+        # key 为字段名，value 为 (列族, 列名字节, 序列化函数)
+        self.__columns = {
+            field_name: (column_family, column_qualifier, encode)
+            for field_name, column_family, column_qualifier, encode in model_codec.get_encode_plan()
+        }
+        # key 为字段名，value 为 (列谓词过滤器列表, 序列化函数, 是否数值字段)
+        self.__column_predicates: dict[str, tuple[list, Callable, bool]] = {}
+        # 未指定字段时读取的列族
+        self.__families = sorted({model_codec.default_cf, *(model_codec.cf_config or {}).values()} - {None})
+        # key 为字段元组，value 为编译后的列投影过滤器
+        self.__projections: dict[tuple, object] = {}
+
+    def build_row_filter(self, *, version: Optional[int], fields: Optional[list[str]], other_filters: list = None):
+        """
+        生成读取使用的完整过滤器：过滤条件、版本过滤、列投影依次串联
+
+        version : 只读取该版本（秒级时间戳）的 cell，为空时读取每列最新的 cell
+        fields : 只读取这些字段所在的列，为空时读取全部列族
+        other_filters : BigtableFilters 生成的过滤条件或原始过滤器
+        return : 过滤器，没有任何过滤条件时为 None
+        """
+        filters = self.__filters
+        # 过滤条件编译后放在最前，返回新的列表，不修改调用方传入的 filters
+        row_filters_list = self.compile(other_filters)
+        if version is not None:
+            row_filters_list.append(
+                self.__compile_timestamp_filter(
+                    BigtableTimestampFilter(
+                        start=datetime.fromtimestamp(version, tz=timezone.utc),
+                        end=datetime.fromtimestamp(version + 1, tz=timezone.utc),
+                    )
+                )
+            )
+        else:
+            row_filters_list.append(filters.CellsColumnLimitFilter(1))
+        projection = self.compile_projection(fields)
+        if projection is not None:
+            row_filters_list.append(projection)
+        if len(row_filters_list) > 1:
+            return filters.RowFilterChain(filters=row_filters_list)
+        return row_filters_list[0] if row_filters_list else None
+
+    def build_history_filter(
+        self,
+        *,
+        versions: Optional[int],
+        start_version: Optional[int],
+        end_version: Optional[int],
+        fields: Optional[list[str]],
+        other_filters: list = None,
+    ):
+        """
+        生成读取多个版本使用的过滤器：过滤条件、时间窗口、每列版本数、列投影依次串联
+
+        versions : 每列最多读取的版本数（时间倒序），为空时不限制
+        start_version : 时间窗口起点（秒级时间戳，包含），为空时不限制
+        end_version : 时间窗口终点（秒级时间戳，不包含），为空时不限制
+        """
+        filters = self.__filters
+        row_filters_list = self.compile(other_filters)
+        if start_version is not None or end_version is not None:
+            row_filters_list.append(
+                self.__compile_timestamp_filter(
+                    BigtableTimestampFilter(
+                        start=datetime.fromtimestamp(start_version, tz=timezone.utc)
+                        if start_version is not None
+                        else None,
+                        end=datetime.fromtimestamp(end_version, tz=timezone.utc) if end_version is not None else None,
+                    )
+                )
+            )
+        if versions is not None:
+            row_filters_list.append(filters.CellsColumnLimitFilter(versions))
+        projection = self.compile_projection(fields)
+        if projection is not None:
+            row_filters_list.append(projection)
+        if len(row_filters_list) > 1:
+            return filters.RowFilterChain(filters=row_filters_list)
+        return row_filters_list[0] if row_filters_list else None
+
+    def compile_projection(self, fields: Optional[list[str]]):
+        """
+        编译列投影过滤器，同一组字段只编译一次。
+
+        每个列族生成 列族完全匹配 + 列名完全匹配 的过滤器，多个列族之间为 OR 关系，
+        只返回请求的字段所在的列，不会因为列名前缀相同（如 price 与 price_history）读取多余的列。
+        列族迁移期间的字段同时读取旧列族。
+
+        fields : 需要读取的字段，为空时只按列族过滤
+        return : 过滤器，没有可用的列族时为 None
+        """
+        key = tuple(fields) if fields else ()
+        projection = self.__projections.get(key)
+        if projection is None and key not in self.__projections:
+            projection = self.__compile_projection(key)
+            self.__projections[key] = projection
+        return projection
+
+    def __compile_projection(self, fields: tuple):
+        filters = self.__filters
+        if not fields:
+            family_filters = [filters.FamilyNameRegexFilter(self.anchored_regex(family)) for family in self.__families]
+            return self.__union(family_filters)
+        # key 为列族，value 为该列族中需要读取的列名，保持字段顺序
+        family_fields: dict[str, list[str]] = {}
+        cf_config = self.model_codec.cf_config or {}
+        cf_migration = self.model_codec.cf_migration or {}
+        for field in fields:
+            families = [cf_config.get(field, self.model_codec.default_cf)]
+            if field in cf_migration:
+                families.insert(0, cf_migration[field][0])
+            for family in families:
+                family_qualifiers = family_fields.setdefault(family, [])
+                if field not in family_qualifiers:
+                    family_qualifiers.append(field)
+        family_filters = [
+            filters.RowFilterChain(
+                filters=[
+                    filters.FamilyNameRegexFilter(self.anchored_regex(family)),
+                    filters.ColumnQualifierRegexFilter(
+                        self.anchored_regex(*qualifiers).encode(self.model_codec.charset)
+                    ),
+                ]
+            )
+            for family, qualifiers in family_fields.items()
+        ]
+        return self.__union(family_filters)
+
+    def __union(self, family_filters: list):
+        if len(family_filters) > 1:
+            return self.__filters.RowFilterUnion(filters=family_filters)
+        return family_filters[0] if family_filters else None
+
+    @staticmethod
+    def anchored_regex(*names: str) -> str:
+        """
+        转义后完全匹配的正则，多个名称合并为一个正则；列族、列名过滤器都应使用，避免元字符或前缀相同的列误匹配
+        """
+        if len(names) == 1:
+            return f"^{re.escape(names[0])}$"
+        return f"^(?:{'|'.join(re.escape(name) for name in names)})$"
+
+    def compile(self, filters: Optional[list]) -> list:
+        """
+        编译 filters 中的 BigtableFieldFilter / BigtableTimestampFilter，其他过滤器原样保留；
+        不修改传入的列表
+
+        return : 可直接放入 RowFilterChain 的过滤器列表
+        """
+        if not filters:
+            return []
+        specs = [item for item in filters if isinstance(item, (BigtableFieldFilter, BigtableTimestampFilter))]
+        if not specs:
+            return list(filters)
+        field_filters = [self.__compile_field_filter(spec) for spec in specs if isinstance(spec, BigtableFieldFilter)]
+        timestamp_filters = [
+            self.__compile_timestamp_filter(spec) for spec in specs if isinstance(spec, BigtableTimestampFilter)
+        ]
+        # 行条件在前，保证谓词看到的是完整的行
+        return [
+            *field_filters,
+            *timestamp_filters,
+            *(item for item in filters if not isinstance(item, (BigtableFieldFilter, BigtableTimestampFilter))),
+        ]
+
+    def __get_column_predicate(self, field: str) -> tuple[list, Callable, bool]:
+        """
+        return : (读取该字段最新 cell 的过滤器列表, 序列化函数, 是否数值字段)，同一字段只编译一次
+        """
+        column_predicate = self.__column_predicates.get(field)
+        if column_predicate is not None:
+            return column_predicate
+        filters = self.__filters
+        column = self.__columns.get(field)
+        if column is None:
+            raise ValueError(f"filter field not found in {self.model_codec.model_class.__name__}: {field}")
+        column_family, _, encode = column
+        families = [column_family]
+        migration = self.model_codec.cf_migration.get(field) if self.model_codec.cf_migration else None
+        if migration:
+            # 列族迁移期间字段可能仍在旧列族中
+            families.insert(0, migration[0])
+        predicate = [
+            filters.FamilyNameRegexFilter(self.anchored_regex(*families)),
+            filters.ColumnQualifierRegexFilter(self.anchored_regex(field).encode(self.model_codec.charset)),
+            filters.CellsColumnLimitFilter(1),
+        ]
+        numeric = PydanticUtils.get_native_field_type(self.model_codec.model_class, field) in (int, float)
+        column_predicate = (predicate, encode, numeric)
+        self.__column_predicates[field] = column_predicate
+        return column_predicate
+
+    def __compile_field_filter(self, spec: BigtableFieldFilter):
+        filters = self.__filters
+        column_predicate, encode, numeric = self.__get_column_predicate(spec.field)
+        predicate = list(column_predicate)
+        if spec.op == "equals":
+            value = encode(spec.value)
+            predicate.append(filters.ValueRangeFilter(value, value, inclusive_start=True, inclusive_end=True))
+        elif spec.op == "regex":
+            predicate.append(filters.ValueRegexFilter(spec.value.encode(self.model_codec.charset)))
+        elif spec.op == "range":
+            if numeric:
+                raise ValueError(f"range filter is not supported on numeric field: {spec.field}")
+            predicate.append(
+                filters.ValueRangeFilter(
+                    encode(spec.start) if spec.start is not None else None,
+                    encode(spec.end) if spec.end is not None else None,
+                    inclusive_start=spec.start_inclusive if spec.start is not None else None,
+                    inclusive_end=spec.end_inclusive if spec.end is not None else None,
+                )
+            )
+        matched, unmatched = filters.PassAllFilter(True), filters.BlockAllFilter(True)
+        if spec.op == "absent":
+            matched, unmatched = unmatched, matched
+        return filters.ConditionalRowFilter(filters.RowFilterChain(filters=predicate), matched, unmatched)
+
+    def __compile_timestamp_filter(self, spec: BigtableTimestampFilter):
+        if self.async_api:
+            return data_row_filters.TimestampRangeFilter(start=spec.start, end=spec.end)
+        return row_filters.TimestampRangeFilter(row_filters.TimestampRange(start=spec.start, end=spec.end))
@@ -0,0 +1,466 @@
+import bisect
+import re
+import threading
+import time
+from typing import Iterable, Optional
+
+from google.cloud.bigtable.batcher import MutationsBatcher
+from google.cloud.bigtable.data import ReadRowsQuery, RowMutationEntry
+from google.cloud.bigtable.data.row import Cell as DataCell
+from google.cloud.bigtable.data.row import Row as DataRow
+from google.cloud.bigtable.row import ConditionalRow, DirectRow
+from google.cloud.bigtable.row_data import Cell, PartialRowData
+from google.cloud.bigtable.row_filters import RowFilter
+from google.cloud.bigtable.row_set import RowSet
+from google.rpc.status_pb2 import Status
+from pydantic import BaseModel
+
+# google.rpc.Code.NOT_FOUND
+_NOT_FOUND = 5
+
+
+def _raw_pb(message):
+    """
+    proto-plus 消息转换为底层 protobuf 消息，以便使用 WhichOneof
+    """
+    message_type = type(message)
+    return message_type.pb(message) if hasattr(message_type, "pb") else message
+
+
+class InMemorySampleRowKey(BaseModel):
+    row_key: bytes
+    offset_bytes: int
+
+
+class InMemoryConditionalRow(ConditionalRow):
+    """
+    ConditionalRow 的 commit 直接调用 gRPC 客户端，这里改为在内存表上执行 check_and_mutate_row
+    """
+
+    def commit(self):
+        true_mutations = self._get_mutations(state=True)
+        false_mutations = self._get_mutations(state=False)
+        if not true_mutations and not false_mutations:
+            return None
+        predicate_matched = self._table.check_and_mutate_row(
+            self._row_key, self._filter, true_mutations=true_mutations, false_mutations=false_mutations
+        )
+        self.clear()
+        return predicate_matched
+
+
+class InMemoryBigtableTable:
+    """
+    进程内的 Bigtable 表，实现 BigtableRepository 使用的 google.cloud.bigtable.table.Table 接口：
+    read_row、read_rows、row、direct_row、conditional_row、mutate_rows、mutations_batcher、sample_row_keys。
+
+    按 Bigtable 的语义保存 cell：行按 rowkey 字节序排列，每列的多个版本按时间戳倒序排列，
+    未指定时间戳的写入使用当前时间（毫秒精度）；过滤器按 RowFilter 的 protobuf 定义解释，正则为完整匹配。
+    不模拟垃圾回收策略，所有版本都会保留。用于测试与本地压测，线程安全。
+    """
+
+    def __init__(self, table_id: str = "in_memory_table", *, column_families: Iterable[str] = None):
+        """
+        table_id : 表名
+        column_families : 表的列族，设置后写入不存在的列族返回 NOT_FOUND，与 Bigtable 一致；为空时不校验
+        """
+        self.table_id = table_id
+        self.name = table_id
+        self.column_families = set(column_families) if column_families is not None else None
+        self.__lock = threading.RLock()
+        # rowkey -> 列族 -> 列名 -> [(时间戳微秒, 值)]，按时间戳倒序
+        self.__rows: dict[bytes, dict[str, dict[bytes, list[tuple[int, bytes]]]]] = {}
+        # 升序排列的 rowkey，用于范围扫描
+        self.__row_keys: list[bytes] = []
+        self.__regex_cache: dict = {}
+
+    def row(self, row_key: bytes, filter_: RowFilter = None, append: bool = False):
+        if append:
+            raise ValueError("append row is not supported by InMemoryBigtableTable")
+        if filter_ is not None:
+            return self.conditional_row(row_key, filter_)
+        return self.direct_row(row_key)
+
+    def direct_row(self, row_key: bytes) -> DirectRow:
+        return DirectRow(row_key, self)
+
+    def conditional_row(self, row_key: bytes, filter_: RowFilter) -> InMemoryConditionalRow:
+        return InMemoryConditionalRow(row_key, self, filter_=filter_)
+
+    def mutations_batcher(self, flush_count: int = 100, max_row_bytes: int = 20 * 1024 * 1024) -> MutationsBatcher:
+        return MutationsBatcher(self, flush_count, max_row_bytes)
+
+    def mutate_rows(self, rows: list[DirectRow], retry=None, timeout=None) -> list[Status]:
+        """
+        逐行原子地应用 mutation，返回每行的状态
+        """
+        statuses = []
+        with self.__lock:
+            for row in rows:
+                mutations = row._get_mutations()
+                error = self.__validate_mutations(mutations)
+                if error is not None:
+                    statuses.append(error)
+                    continue
+                self.__apply_mutations(row.row_key, mutations)
+                statuses.append(Status())
+        return statuses
+
+    def check_and_mutate_row(self, row_key: bytes, predicate_filter: RowFilter, *, true_mutations, false_mutations):
+        """
+        谓词过滤后的行有 cell 时应用 true_mutations，否则应用 false_mutations
+
+        return : 谓词是否匹配
+        """
+        with self.__lock:
+            cells = self.__row_cells(row_key)
+            predicate_matched = bool(cells) and bool(self.__apply_filter(predicate_filter, row_key, cells))
+            mutations = true_mutations if predicate_matched else false_mutations
+            error = self.__validate_mutations(mutations)
+            if error is not None:
+                raise ValueError(error.message)
+            self.__apply_mutations(row_key, mutations)
+            return predicate_matched
+
+    def read_row(self, row_key: bytes, filter_: RowFilter = None) -> Optional[PartialRowData]:
+        with self.__lock:
+            return self.__read_row(row_key, filter_)
+
+    def read_rows(
+        self,
+        start_key: bytes = None,
+        end_key: bytes = None,
+        limit: int = None,
+        filter_: RowFilter = None,
+        end_inclusive: bool = False,
+        row_set: RowSet = None,
+        retry=None,
+    ) -> list[PartialRowData]:
+        """
+        按 rowkey 升序返回范围内的行，过滤后没有 cell 的行不返回，limit 限制返回的行数
+        """
+        with self.__lock:
+            results = []
+            for row_key in self.__select_row_keys(start_key, end_key, end_inclusive, row_set):
+                row = self.__read_row(row_key, filter_)
+                if row is None:
+                    continue
+                results.append(row)
+                if limit and len(results) >= limit:
+                    break
+            return results
+
+    def sample_row_keys(self) -> list[InMemorySampleRowKey]:
+        """
+        每 100 行取一个分界 rowkey，最后一个 sample 的 rowkey 为空字节，表示表尾
+        """
+        with self.__lock:
+            samples = [
+                InMemorySampleRowKey(row_key=row_key, offset_bytes=index)
+                for index, row_key in enumerate(self.__row_keys)
+                if index > 0 and index % 100 == 0
+            ]
+            samples.append(InMemorySampleRowKey(row_key=b"", offset_bytes=len(self.__row_keys)))
+            return samples
+
+    def row_count(self) -> int:
+        with self.__lock:
+            return len(self.__row_keys)
+
+    def truncate(self):
+        with self.__lock:
+            self.__rows.clear()
+            self.__row_keys.clear()
+
+    def __read_row(self, row_key: bytes, filter_: Optional[RowFilter]) -> Optional[PartialRowData]:
+        cells = self.__row_cells(row_key)
+        if filter_ is not None and cells:
+            cells = self.__apply_filter(filter_, row_key, cells)
+        if not cells:
+            return None
+        row = PartialRowData(row_key)
+        for family, qualifier, timestamp_micros, value in cells:
+            row._cells.setdefault(family, {}).setdefault(qualifier, []).append(Cell(value, timestamp_micros))
+        return row
+
+    def __select_row_keys(
+        self, start_key: Optional[bytes], end_key: Optional[bytes], end_inclusive: bool, row_set: Optional[RowSet]
+    ) -> list[bytes]:
+        if row_set is None:
+            return self.__range_keys(start_key, end_key, True, end_inclusive)
+        if not row_set.row_keys and not row_set.row_ranges:
+            return list(self.__row_keys)
+        selected = set()
+        for row_key in row_set.row_keys:
+            row_key = row_key if isinstance(row_key, bytes) else row_key.encode()
+            if row_key in self.__rows:
+                selected.add(row_key)
+        for row_range in row_set.row_ranges:
+            selected.update(
+                self.__range_keys(
+                    row_range.start_key,
+                    row_range.end_key,
+                    row_range.start_inclusive,
+                    row_range.end_inclusive,
+                )
+            )
+        return sorted(selected)
+
+    def __range_keys(
+        self, start_key: Optional[bytes], end_key: Optional[bytes], start_inclusive: bool, end_inclusive: bool
+    ) -> list[bytes]:
+        row_keys = self.__row_keys
+        if start_key:
+            start = (bisect.bisect_left if start_inclusive else bisect.bisect_right)(row_keys, start_key)
+        else:
+            start = 0
+        if end_key:
+            end = (bisect.bisect_right if end_inclusive else bisect.bisect_left)(row_keys, end_key)
+        else:
+            end = len(row_keys)
+        return row_keys[start:end]
+
+    def __row_cells(self, row_key: bytes) -> list[tuple[str, bytes, int, bytes]]:
+        """
+        return : 按列族、列名、时间戳倒序排列的 [(列族, 列名, 时间戳微秒, 值)]
+        """
+        families = self.__rows.get(row_key)
+        if not families:
+            return []
+        return [
+            (family, qualifier, timestamp_micros, value)
+            for family in sorted(families)
+            for qualifier in sorted(families[family])
+            for timestamp_micros, value in families[family][qualifier]
+        ]
+
+    def __validate_mutations(self, mutations) -> Optional[Status]:
+        if self.column_families is None:
+            return None
+        for mutation in mutations:
+            mutation = _raw_pb(mutation)
+            kind = mutation.WhichOneof("mutation")
+            family = getattr(mutation, kind).family_name if kind != "delete_from_row" else None
+            if family is not None and family not in self.column_families:
+                return Status(code=_NOT_FOUND, message=f"column family not found: {family}")
+        return None
+
+    def __apply_mutations(self, row_key: bytes, mutations):
+        families = self.__rows.get(row_key)
+        if families is None:
+            families = {}
+        for mutation in mutations:
+            mutation = _raw_pb(mutation)
+            kind = mutation.WhichOneof("mutation")
+            if kind == "set_cell":
+                set_cell = mutation.set_cell
+                timestamp_micros = set_cell.timestamp_micros
+                if timestamp_micros == -1:
+                    # 服务端时间，毫秒精度
+                    timestamp_micros = int(time.time() * 1000) * 1000
+                versions = families.setdefault(set_cell.family_name, {}).setdefault(set_cell.column_qualifier, [])
+                versions[:] = [version for version in versions if version[0] != timestamp_micros]
+                versions.append((timestamp_micros, set_cell.value))
+                versions.sort(key=lambda version: -version[0])
+            elif kind == "delete_from_column":
+                delete = mutation.delete_from_column
+                columns = families.get(delete.family_name, {})
+                versions = columns.get(delete.column_qualifier)
+                if versions is None:
+                    continue
+                start = delete.time_range.start_timestamp_micros
+                end = delete.time_range.end_timestamp_micros
+                versions[:] = [
+                    version for version in versions if not (version[0] >= start and (end == 0 or version[0] < end))
+                ]
+                if not versions:
+                    del columns[delete.column_qualifier]
+                if not columns:
+                    families.pop(delete.family_name, None)
+            elif kind == "delete_from_family":
+                families.pop(mutation.delete_from_family.family_name, None)
+            elif kind == "delete_from_row":
+                families = {}
+            else:
+                raise ValueError(f"unsupported mutation: {kind}")
+        if families:
+            if row_key not in self.__rows:
+                bisect.insort(self.__row_keys, row_key)
+            self.__rows[row_key] = families
+        elif row_key in self.__rows:
+            del self.__rows[row_key]
+            del self.__row_keys[bisect.bisect_left(self.__row_keys, row_key)]
+
+    def __apply_filter(self, row_filter, row_key: bytes, cells: list) -> list:
+        if isinstance(row_filter, RowFilter):
+            filter_pb = row_filter.to_pb()
+        elif hasattr(row_filter, "_to_pb"):
+            # google.cloud.bigtable.data 的过滤器
+            filter_pb = row_filter._to_pb()
+        else:
+            filter_pb = row_filter
+        return self.__evaluate(_raw_pb(filter_pb), row_key, cells)
+
+    def __evaluate(self, filter_pb, row_key: bytes, cells: list) -> list:
+        kind = filter_pb.WhichOneof("filter")
+        if kind == "chain":
+            for sub_filter in filter_pb.chain.filters:
+                cells = self.__evaluate(sub_filter, row_key, cells)
+                if not cells:
+                    break
+            return cells
+        if kind == "interleave":
+            merged = []
+            for sub_filter in filter_pb.interleave.filters:
+                merged += self.__evaluate(sub_filter, row_key, cells)
+            return sorted(merged, key=lambda cell: (cell[0], cell[1], -cell[2]))
+        if kind == "condition":
+            condition = filter_pb.condition
+            matched = bool(self.__evaluate(condition.predicate_filter, row_key, cells))
+            branch = "true_filter" if matched else "false_filter"
+            return self.__evaluate(getattr(condition, branch), row_key, cells) if condition.HasField(branch) else []
+        if kind == "pass_all_filter":
+            return cells if filter_pb.pass_all_filter else []
+        if kind == "block_all_filter":
+            return [] if filter_pb.block_all_filter else cells
+        if kind == "row_key_regex_filter":
+            return cells if self.__full_match(filter_pb.row_key_regex_filter, row_key) else []
+        if kind == "family_name_regex_filter":
+            pattern = filter_pb.family_name_regex_filter.encode()
+            return [cell for cell in cells if self.__full_match(pattern, cell[0].encode())]
+        if kind == "column_qualifier_regex_filter":
+            pattern = filter_pb.column_qualifier_regex_filter
+            return [cell for cell in cells if self.__full_match(pattern, cell[1])]
+        if kind == "value_regex_filter":
+            pattern = filter_pb.value_regex_filter
+            return [cell for cell in cells if self.__full_match(pattern, cell[3])]
+        if kind == "column_range_filter":
+            column_range = filter_pb.column_range_filter
+            return [
+                cell
+                for cell in cells
+                if cell[0] == column_range.family_name
+                and self.__in_range(column_range, "start_qualifier", "end_qualifier", cell[1])
+            ]
+        if kind == "value_range_filter":
+            value_range = filter_pb.value_range_filter
+            return [cell for cell in cells if self.__in_range(value_range, "start_value", "end_value", cell[3])]
+        if kind == "timestamp_range_filter":
+            start = filter_pb.timestamp_range_filter.start_timestamp_micros
+            end = filter_pb.timestamp_range_filter.end_timestamp_micros
+            return [cell for cell in cells if cell[2] >= start and (end == 0 or cell[2] < end)]
+        if kind == "cells_per_row_offset_filter":
+            return cells[filter_pb.cells_per_row_offset_filter :]
+        if kind == "cells_per_row_limit_filter":
+            return cells[: filter_pb.cells_per_row_limit_filter]
+        if kind == "cells_per_column_limit_filter":
+            limit = filter_pb.cells_per_column_limit_filter
+            counts = {}
+            limited = []
+            for cell in cells:
+                column = (cell[0], cell[1])
+                counts[column] = counts.get(column, 0) + 1
+                if counts[column] <= limit:
+                    limited.append(cell)
+            return limited
+        if kind == "strip_value_transformer":
+            return [(family, qualifier, timestamp_micros, b"") for family, qualifier, timestamp_micros, _ in cells]
+        if kind == "apply_label_transformer":
+            return cells
+        raise ValueError(f"unsupported row filter: {kind}")
+
+    @staticmethod
+    def __in_range(range_pb, start_field: str, end_field: str, value: bytes) -> bool:
+        start_kind = range_pb.WhichOneof(start_field)
+        if start_kind is not None:
+            start = getattr(range_pb, start_kind)
+            if value < start or (start_kind.endswith("_open") and value == start):
+                return False
+        end_kind = range_pb.WhichOneof(end_field)
+        if end_kind is not None:
+            end = getattr(range_pb, end_kind)
+            if value > end or (end_kind.endswith("_open") and value == end):
+                return False
+        return True
+
+    def __full_match(self, pattern: bytes, value: bytes) -> bool:
+        compiled = self.__regex_cache.get(pattern)
+        if compiled is None:
+            # RE2 的 \C 匹配任意字节
+            compiled = re.compile(pattern.replace(rb"\C", rb"[\x00-\xff]"))
+            self.__regex_cache[pattern] = compiled
+        return compiled.fullmatch(value) is not None
+
+
+class InMemoryBigtableTableAsync:
+    """
+    InMemoryBigtableTable 的异步包装，实现 AsyncBigtableRepository 使用的 google.cloud.bigtable.data.TableAsync 接口：
+    read_row、read_rows、read_rows_stream、mutate_row、bulk_mutate_rows。用于测试，不需要事件循环以外的资源
+    """
+
+    def __init__(self, table: InMemoryBigtableTable = None, *, column_families: Iterable[str] = None):
+        """
+        table : 被包装的内存表，多个仓库（或同步与异步仓库）可以共享；为空时新建
+        column_families : 新建内存表时的列族
+        """
+        self.table = table if table is not None else InMemoryBigtableTable(column_families=column_families)
+        self.table_id = self.table.table_id
+
+    async def read_row(self, row_key: bytes, *, row_filter=None, **kwargs) -> Optional[DataRow]:
+        row = self.table.read_row(row_key, filter_=row_filter)
+        return self.__convert_row(row) if row is not None else None
+
+    async def read_rows(self, query: ReadRowsQuery, **kwargs) -> list[DataRow]:
+        row_set = None
+        if query.row_keys or query.row_ranges:
+            row_set = RowSet()
+            for row_key in query.row_keys:
+                row_set.add_row_key(row_key)
+            for row_range in query.row_ranges:
+                row_set.add_row_range_from_keys(
+                    start_key=row_range.start_key,
+                    end_key=row_range.end_key,
+                    start_inclusive=row_range.start_is_inclusive,
+                    end_inclusive=row_range.end_is_inclusive,
+                )
+        rows = self.table.read_rows(limit=query.limit or None, filter_=query.filter, row_set=row_set)
+        return [self.__convert_row(row) for row in rows]
+
+    async def read_rows_stream(self, query: ReadRowsQuery, **kwargs):
+        rows = await self.read_rows(query)
+
+        async def stream():
+            for row in rows:
+                yield row
+
+        return stream()
+
+    async def mutate_row(self, row_key: bytes, mutations, **kwargs):
+        mutations = list(mutations) if isinstance(mutations, (list, tuple)) else [mutations]
+        self.__mutate([(row_key, mutations)])
+
+    async def bulk_mutate_rows(self, mutation_entries: list[RowMutationEntry], **kwargs):
+        self.__mutate([(entry.row_key, list(entry.mutations)) for entry in mutation_entries])
+
+    async def close(self):
+        pass
+
+    def __mutate(self, entries: list[tuple[bytes, list]]):
+        rows = []
+        for row_key, mutations in entries:
+            row = DirectRow(row_key, self.table)
+            row._pb_mutations.extend(mutation._to_pb() for mutation in mutations)
+            rows.append(row)
+        for status in self.table.mutate_rows(rows):
+            if status.code != 0:
+                raise ValueError(status.message)
+
+    @staticmethod
+    def __convert_row(row: PartialRowData) -> DataRow:
+        cells = [
+            DataCell(cell.value, row.row_key, family, qualifier, cell.timestamp_micros)
+            for family, columns in row.cells.items()
+            for qualifier, cell_list in columns.items()
+            for cell in cell_list
+        ]
+        return DataRow(row.row_key, cells)
@@ -0,0 +1,221 @@
+import bisect
+import threading
+from typing import Callable, Optional
+
+from pydantic import BaseModel
+
+# 采集函数返回 [(指标名, 值, 标签)]，导出时调用，用于缓存、合并读取、写入管道等已有的统计
+MetricsCollector = Callable[[], list[tuple[str, float, dict[str, str]]]]
+
+# 延迟直方图的默认分桶（秒）
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class BigtableMetricsSink:
+    """
+    指标输出接口。BigtableRepository 未配置 metrics 时不做任何埋点，没有额外开销
+    """
+
+    def observe(self, name: str, value: float, labels: dict[str, str] = None):
+        """
+        记录直方图样本，如方法耗时（秒）
+        """
+
+    def increment(self, name: str, value: float = 1, labels: dict[str, str] = None):
+        """
+        累加计数器，如读取的行数、字节数
+        """
+
+    def gauge(self, name: str, value: float, labels: dict[str, str] = None):
+        """
+        设置瞬时值
+        """
+
+    def register_collector(self, collector: MetricsCollector):
+        """
+        注册导出时调用的采集函数
+        """
+
+
+class BigtableHistogram(BaseModel):
+    buckets: tuple[float, ...]
+    # 各分桶（非累计）的样本数，最后一个为超过最大分桶的样本数
+    bucket_counts: list[int]
+    sum: float = 0.0
+    count: int = 0
+
+
+class BigtableMetricsRegistry(BigtableMetricsSink):
+    """
+    进程内的指标注册表，支持按名称与标签查询，并导出 Prometheus 文本格式
+    """
+
+    def __init__(self, *, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.__lock = threading.Lock()
+        # key 为 (指标名, 排序后的标签元组)
+        self.__counters: dict[tuple, float] = {}
+        self.__gauges: dict[tuple, float] = {}
+        self.__histograms: dict[tuple, BigtableHistogram] = {}
+        self.__collectors: list[MetricsCollector] = []
+
+    def observe(self, name: str, value: float, labels: dict[str, str] = None):
+        key = (name, self.__label_key(labels))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = BigtableHistogram(buckets=self.buckets, bucket_counts=[0] * (len(self.buckets) + 1))
+                self.__histograms[key] = histogram
+            histogram.bucket_counts[index] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def increment(self, name: str, value: float = 1, labels: dict[str, str] = None):
+        key = (name, self.__label_key(labels))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def gauge(self, name: str, value: float, labels: dict[str, str] = None):
+        with self.__lock:
+            self.__gauges[(name, self.__label_key(labels))] = value
+
+    def register_collector(self, collector: MetricsCollector):
+        with self.__lock:
+            self.__collectors.append(collector)
+
+    def collect(self):
+        """
+        调用已注册的采集函数，更新对应的 gauge
+        """
+        with self.__lock:
+            collectors = list(self.__collectors)
+        for collector in collectors:
+            for name, value, labels in collector():
+                self.gauge(name, value, labels)
+
+    def get_counter(self, name: str, labels: dict[str, str] = None) -> float:
+        with self.__lock:
+            return self.__counters.get((name, self.__label_key(labels)), 0)
+
+    def get_gauge(self, name: str, labels: dict[str, str] = None) -> Optional[float]:
+        with self.__lock:
+            return self.__gauges.get((name, self.__label_key(labels)))
+
+    def get_histogram(self, name: str, labels: dict[str, str] = None) -> Optional[BigtableHistogram]:
+        with self.__lock:
+            histogram = self.__histograms.get((name, self.__label_key(labels)))
+            return histogram.model_copy(deep=True) if histogram else None
+
+    def to_prometheus_text(self) -> str:
+        """
+        导出 Prometheus 文本格式，导出前先调用采集函数
+        """
+        self.collect()
+        with self.__lock:
+            counters = sorted(self.__counters.items())
+            gauges = sorted(self.__gauges.items())
+            histograms = sorted((key, histogram.model_copy(deep=True)) for key, histogram in self.__histograms.items())
+        lines = []
+        self.__append_samples(lines, "counter", counters)
+        self.__append_samples(lines, "gauge", gauges)
+        typed_names = set()
+        for (name, label_key), histogram in histograms:
+            if name not in typed_names:
+                typed_names.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bucket, bucket_count in zip((*histogram.buckets, "+Inf"), histogram.bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{self.__format_labels(label_key, ('le', str(bucket)))} {cumulative}")
+            lines.append(f"{name}_sum{self.__format_labels(label_key)} {histogram.sum}")
+            lines.append(f"{name}_count{self.__format_labels(label_key)} {histogram.count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def __append_samples(self, lines: list[str], metric_type: str, samples: list):
+        typed_names = set()
+        for (name, label_key), value in samples:
+            if name not in typed_names:
+                typed_names.add(name)
+                lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name}{self.__format_labels(label_key)} {value}")
+
+    @staticmethod
+    def __label_key(labels: Optional[dict[str, str]]) -> tuple:
+        return tuple(sorted(labels.items())) if labels else ()
+
+    @staticmethod
+    def __format_labels(label_key: tuple, *extra_labels: tuple[str, str]) -> str:
+        labels = [*label_key, *extra_labels]
+        if not labels:
+            return ""
+        # 标签值中的反斜杠、双引号、换行需要转义
+        escaped = [
+            (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in labels
+        ]
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class BigtableMetricsHooks(BigtableMetricsSink):
+    """
+    将指标转发给回调函数，用于对接 OpenTelemetry 等外部系统：
+    on_observe 对应 Histogram.record，on_increment 对应 Counter.add，
+    采集函数的结果在调用 collect 时（如 ObservableGauge 的回调中）通过 on_gauge 输出
+    """
+
+    def __init__(
+        self,
+        *,
+        on_observe: Callable[[str, float, dict[str, str]], None] = None,
+        on_increment: Callable[[str, float, dict[str, str]], None] = None,
+        on_gauge: Callable[[str, float, dict[str, str]], None] = None,
+    ):
+        self.on_observe = on_observe
+        self.on_increment = on_increment
+        self.on_gauge = on_gauge
+        self.__collectors: list[MetricsCollector] = []
+
+    def observe(self, name: str, value: float, labels: dict[str, str] = None):
+        if self.on_observe:
+            self.on_observe(name, value, labels or {})
+
+    def increment(self, name: str, value: float = 1, labels: dict[str, str] = None):
+        if self.on_increment:
+            self.on_increment(name, value, labels or {})
+
+    def gauge(self, name: str, value: float, labels: dict[str, str] = None):
+        if self.on_gauge:
+            self.on_gauge(name, value, labels or {})
+
+    def register_collector(self, collector: MetricsCollector):
+        self.__collectors.append(collector)
+
+    def collect(self):
+        for collector in list(self.__collectors):
+            for name, value, labels in collector():
+                self.gauge(name, value, labels)
+
+
+class BigtableMetricsFanout(BigtableMetricsSink):
+    """
+    同时输出到多个 sink，如进程内注册表与 OpenTelemetry 回调
+    """
+
+    def __init__(self, sinks: list[BigtableMetricsSink]):
+        self.sinks = list(sinks)
+
+    def observe(self, name: str, value: float, labels: dict[str, str] = None):
+        for sink in self.sinks:
+            sink.observe(name, value, labels)
+
+    def increment(self, name: str, value: float = 1, labels: dict[str, str] = None):
+        for sink in self.sinks:
+            sink.increment(name, value, labels)
+
+    def gauge(self, name: str, value: float, labels: dict[str, str] = None):
+        for sink in self.sinks:
+            sink.gauge(name, value, labels)
+
+    def register_collector(self, collector: MetricsCollector):
+        for sink in self.sinks:
+            sink.register_collector(collector)
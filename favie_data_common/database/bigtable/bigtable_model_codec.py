@@ -0,0 +1,246 @@
+import codecs
+from typing import Any, Callable, Optional, Set, Type
+
+from pydantic import BaseModel
+
+from favie_data_common.common.pydantic_utils import PydanticUtils
+from favie_data_common.database.bigtable.bigtable_utils import BigtableUtils
+
+
+class BigtableModelCodec:
+    """
+    Pydantic 模型与 Bigtable 行之间的预编译编解码计划。
+
+    构造时为模型的每个字段生成专用的反序列化函数，并以列名的原始字节为 key 建立解码计划，
+    读取时每个 cell 只需一次字典查找，无需再解码列名、查询字段类型、逐层判断类型。
+    """
+
+    NULL_CF = "/dev/null"
+
+    def __init__(
+        self,
+        *,
+        model_class: Type[BaseModel],
+        charset: str = "utf-8",
+        default_cf: str = None,
+        cf_config: dict[str, str] = None,
+        cf_migration: dict[str, (str, str)] = None,
+        derializer_config: dict[str, Any] = None,
+        model_define_deserializer: bool = False,
+    ):
+        """
+        model_class: BigTable表对应的Pydantic模型类
+        charset: 列名及列值的编码
+        default_cf: 默认列族，如果cf_config中没有配置则使用default_cf
+        cf_config: 字段对应的列族，只需要配置不对应default_cf的即可
+        cf_migration:列族迁移配置，key为列名，value为（旧列簇,新列簇）元组
+        derializer_config:字段反序列化配置，key为列名，value为FieldDeserializer对象
+        model_define_deserializer: 为True时字段值保持字符串，由模型自行反序列化
+        """
+        self.model_class = model_class
+        self.charset = charset
+        self.default_cf = default_cf
+        self.cf_config = cf_config
+        self.cf_migration = cf_migration
+        self.derializer_config = derializer_config
+        self.model_define_deserializer = model_define_deserializer
+        # key 为列名字节，value 为 (字段名, 反序列化函数, 列族迁移配置)
+        self.decode_plan: dict[bytes, tuple[str, Callable[[bytes], Any], Optional[tuple[str, str]]]] = {}
+        self.__init_decode_plan()
+        # key 为 (模型类, 保存的列族, 排除的字段)，value 为该组合下的写入计划
+        self.encode_plans: dict[tuple, list[tuple[str, str, bytes, Callable[[Any], bytes]]]] = {}
+
+    def __init_decode_plan(self):
+        for field_name in self.model_class.model_fields.keys():
+            field_type = PydanticUtils.get_native_field_type(self.model_class, field_name)
+            # 字段类型为空的字段在读取时忽略
+            if field_type is None:
+                continue
+            migration = self.cf_migration.get(field_name) if self.cf_migration else None
+            self.decode_plan[field_name.encode(self.charset)] = (
+                field_name,
+                self.__compile_field_decoder(field_name, field_type),
+                migration,
+            )
+
+    def __compile_field_decoder(self, field_name: str, field_type: type) -> Callable[[bytes], Any]:
+        charset = self.charset
+        if self.derializer_config and field_name in self.derializer_config.keys():
+            convert = self.derializer_config[field_name].deserialize
+        elif self.model_define_deserializer:
+            return lambda cell_value: cell_value.decode(charset)
+        else:
+            convert = BigtableUtils.compile_str_convert_pydantic_field(field_type)
+        return lambda cell_value: convert(cell_value.decode(charset))
+
+    def get_encode_plan(
+        self,
+        model_class: Type[BaseModel] = None,
+        save_cfs: Optional[Set[str]] = None,
+        exclude_fields: list[str] = None,
+    ) -> list[tuple[str, str, bytes, Callable[[Any], bytes]]]:
+        """
+        获取写入计划，同一组参数只编译一次
+
+        model_class : 需要写入的模型类，默认为 self.model_class
+        save_cfs : list of column families need to be saved
+        exclude_fields : 不需要写入的字段
+        return : [(字段名, 列族, 列名字节, 序列化函数)]
+        """
+        model_class = model_class or self.model_class
+        plan_key = (
+            model_class,
+            frozenset(save_cfs) if save_cfs is not None else None,
+            frozenset(exclude_fields) if exclude_fields else None,
+        )
+        plan = self.encode_plans.get(plan_key)
+        if plan is None:
+            plan = self.__compile_encode_plan(model_class, save_cfs, exclude_fields)
+            self.encode_plans[plan_key] = plan
+        return plan
+
+    def __compile_encode_plan(
+        self, model_class: Type[BaseModel], save_cfs: Optional[Set[str]], exclude_fields: Optional[list[str]]
+    ) -> list[tuple[str, str, bytes, Callable[[Any], bytes]]]:
+        plan = []
+        for field_name, field_info in model_class.model_fields.items():
+            if exclude_fields and field_name in exclude_fields:
+                continue
+            if self.cf_migration and field_name in self.cf_migration.keys():
+                _, new_cf = self.cf_migration[field_name]
+                if new_cf == self.NULL_CF:
+                    continue
+            column_family = self.cf_config.get(field_name, self.default_cf) if self.cf_config else self.default_cf
+            if save_cfs is not None and column_family not in save_cfs:
+                continue
+            field_type = PydanticUtils.get_native_type(field_info.annotation)
+            plan.append(
+                (
+                    field_name,
+                    column_family,
+                    field_name.encode(self.charset),
+                    self.__compile_field_encoder(field_type),
+                )
+            )
+        return plan
+
+    def __compile_field_encoder(self, field_type: type) -> Callable[[Any], bytes]:
+        charset = self.charset
+        convert = BigtableUtils.compile_pydantic_field_convert_str(field_type)
+        if field_type == str:
+
+            def encode_str(field_value):
+                if field_value.__class__ is str:
+                    return field_value.encode(charset)
+                return convert(field_value).encode(charset)
+
+            return encode_str
+        if PydanticUtils.is_type_of_pydantic_class(field_type) and codecs.lookup(charset).name == "utf-8":
+
+            def encode_model(field_value):
+                # pydantic 直接输出 utf-8 字节，省去 str 的解码再编码
+                if field_value.__class__ is field_type:
+                    return field_value.__pydantic_serializer__.to_json(field_value, exclude_none=True)
+                return convert(field_value).encode(charset)
+
+            return encode_model
+        return lambda field_value: convert(field_value).encode(charset)
+
+    def convert_model_to_cells(
+        self,
+        model: BaseModel,
+        save_cfs: Optional[Set[str]] = None,
+        exclude_fields: list[str] = None,
+    ) -> list[tuple[str, bytes, bytes]]:
+        """
+        将模型转换为需要写入的 cell 列表，值为 None 的字段不写入
+
+        return : [(列族, 列名字节, 列值字节)]
+        """
+        plan = self.get_encode_plan(type(model), save_cfs, exclude_fields)
+        values = model.__dict__
+        cells = []
+        for field_name, column_family, column_qualifier, encode in plan:
+            field_value = values.get(field_name)
+            if field_value is not None:
+                cells.append((column_family, column_qualifier, encode(field_value)))
+        return cells
+
+    def convert_row_to_dict(self, row) -> tuple[dict[str, Any], set[str]]:
+        """
+        将 Bigtable 行转换为模型字段字典
+
+        row : PartialRowData，或 data API 返回的 Row
+        return : (字段字典, 需要清理旧列族的字段集合)
+        """
+        cells = row.cells
+        # data API 的 Row.cells 为按列族、列名、时间倒序排列的 cell 列表
+        if isinstance(cells, list):
+            cells = self.group_cells(cells)
+        model_dict = {}
+        migration_status = set()
+        decode_plan = self.decode_plan
+        for column_family, columns in cells.items():
+            for column_qualifier, cell_list in columns.items():
+                if not cell_list:
+                    continue
+                plan = decode_plan.get(column_qualifier)
+                # 模型中不存在的列直接忽略
+                if plan is None:
+                    continue
+                field_name, decode, migration = plan
+                if migration is None:
+                    model_dict[field_name] = decode(cell_list[0].value)
+                    continue
+                old_cf, new_cf = migration
+                if column_family == old_cf:
+                    if new_cf == self.NULL_CF:
+                        migration_status.add(field_name)
+                    elif field_name not in migration_status:
+                        model_dict[field_name] = decode(cell_list[0].value)
+                elif column_family == new_cf:
+                    migration_status.add(field_name)
+                    model_dict[field_name] = decode(cell_list[0].value)
+        return model_dict, migration_status
+
+    def convert_row_to_versions(self, row) -> dict[int, dict[str, Any]]:
+        """
+        将包含多个版本 cell 的 Bigtable 行按 cell 时间戳拆分为多个模型字段字典
+
+        row : PartialRowData，或 data API 返回的 Row
+        return : {时间戳（微秒）: 该时间戳写入的字段字典}；同一时间戳旧列族与新列族都有值时取新列族
+        """
+        cells = row.cells
+        if isinstance(cells, list):
+            cells = self.group_cells(cells)
+        versions: dict[int, dict[str, Any]] = {}
+        decode_plan = self.decode_plan
+        for column_family, columns in cells.items():
+            for column_qualifier, cell_list in columns.items():
+                plan = decode_plan.get(column_qualifier)
+                if plan is None:
+                    continue
+                field_name, decode, migration = plan
+                from_old_cf = False
+                if migration is not None:
+                    old_cf, new_cf = migration
+                    from_old_cf = column_family == old_cf
+                    # 已迁移到 NULL_CF 的字段不再读取
+                    if from_old_cf and new_cf == self.NULL_CF:
+                        continue
+                for cell in cell_list:
+                    model_dict = versions.setdefault(cell.timestamp_micros, {})
+                    if from_old_cf and field_name in model_dict:
+                        continue
+                    model_dict[field_name] = decode(cell.value)
+        return versions
+
+    @staticmethod
+    def group_cells(cells: list) -> dict[str, dict[bytes, list]]:
+        """
+        将 data API 的 cell 列表按列族、列名分组，与 PartialRowData.cells 结构一致
+        """
+        grouped = {}
+        for cell in cells:
+            grouped.setdefault(cell.family, {}).setdefault(cell.qualifier, []).append(cell)
+        return grouped
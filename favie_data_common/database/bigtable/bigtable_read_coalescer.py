@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    合并并发的相同请求：同一 key 同时只有一个调用真正执行，其余调用等待并共享其结果（或异常）
+    """
+
+    def __init__(self):
+        self.__calls: dict[Hashable, Future] = {}
+        self.__lock = threading.Lock()
+        self.shared_count = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        key : 请求的标识，相同 key 的并发调用共享一次执行
+        func : 实际执行的请求
+        """
+        with self.__lock:
+            future = self.__calls.get(key)
+            if future is not None:
+                self.shared_count += 1
+                leader = False
+            else:
+                future = Future()
+                self.__calls[key] = future
+                leader = True
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.__lock:
+                self.__calls.pop(key, None)
+        return future.result()
+
+
+class ReadBatcher:
+    """
+    将短时间窗口内的单 rowkey 读取合并为一次批量读取。
+    窗口内第一个请求的线程等待 window_seconds 后执行批量读取，其余请求等待结果；
+    窗口内请求数达到 max_batch_size 时立即执行。
+    """
+
+    def __init__(
+        self,
+        *,
+        fetch: Callable[[list[str], Optional[tuple], Optional[int]], dict[str, Any]],
+        window_seconds: float = 0.002,
+        max_batch_size: int = 100,
+    ):
+        """
+        fetch : 批量读取函数，参数为 (row_keys, fields, version)，返回 {rowkey: 模型}
+        window_seconds : 合并窗口（秒）
+        max_batch_size : 单次批量读取的最大 rowkey 数量
+        """
+        self.fetch = fetch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        # key 为 (fields, version)，同一组合的请求才能合并；value 为 {rowkey: Future}
+        self.__batches: dict[tuple, dict[str, Future]] = {}
+        self.__lock = threading.Lock()
+        self.batch_count = 0
+
+    def load(self, row_key: str, fields: Optional[tuple], version: Optional[int]) -> Any:
+        batch_key = (fields, version)
+        leader = False
+        full_batch = None
+        with self.__lock:
+            batch = self.__batches.get(batch_key)
+            if batch is None:
+                batch = {}
+                self.__batches[batch_key] = batch
+                leader = True
+            future = batch.get(row_key)
+            if future is None:
+                future = Future()
+                batch[row_key] = future
+            if len(batch) >= self.max_batch_size:
+                full_batch = self.__batches.pop(batch_key)
+
+        if full_batch is not None:
+            self.__flush(full_batch, fields, version)
+        elif leader:
+            time.sleep(self.window_seconds)
+            with self.__lock:
+                # 窗口内可能已因达到 max_batch_size 被其他线程执行
+                pending_batch = self.__batches.pop(batch_key) if self.__batches.get(batch_key) is batch else None
+            if pending_batch is not None:
+                self.__flush(pending_batch, fields, version)
+        return future.result()
+
+    def __flush(self, batch: dict[str, Future], fields: Optional[tuple], version: Optional[int]):
+        self.batch_count += 1
+        try:
+            models = self.fetch(list(batch.keys()), fields, version)
+        except BaseException as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for row_key, future in batch.items():
+            future.set_result(models.get(row_key))
@@ -1,27 +1,66 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Callable, List, Optional, Set, Type
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Type, Union
 
 from google.cloud import bigtable
-from google.cloud.bigtable.row import DirectRow
+from google.cloud.bigtable.row import ConditionalRow, DirectRow
 from google.cloud.bigtable.row_data import PartialRowData, PartialRowsData
 from google.cloud.bigtable.row_filters import (
-    CellsColumnLimitFilter,
+    CellsRowLimitFilter,
     ColumnQualifierRegexFilter,
     FamilyNameRegexFilter,
     RowFilterChain,
-    RowFilterUnion,
-    RowKeyRegexFilter,
+    StripValueTransformerFilter,
     TimestampRange,
     TimestampRangeFilter,
 )
 from google.cloud.bigtable.row_set import RowSet
-from pydantic import BaseModel
+from google.cloud.bigtable.table import Table
+from pydantic import BaseModel, create_model
 
 from favie_data_common.common.common_utils import CommonUtils
-from favie_data_common.common.pydantic_utils import PydanticUtils
+from favie_data_common.database.bigtable.bigtable_bloom_filter import BigtableBloomFilter
+from favie_data_common.database.bigtable.bigtable_cache import BigtableCache
+from favie_data_common.database.bigtable.bigtable_filter import BigtableFilterCompiler
+from favie_data_common.database.bigtable.bigtable_metrics import BigtableMetricsSink
+from favie_data_common.database.bigtable.bigtable_model_codec import BigtableModelCodec
+from favie_data_common.database.bigtable.bigtable_read_coalescer import ReadBatcher, SingleFlight
 from favie_data_common.database.bigtable.bigtable_utils import BigtableUtils
+from favie_data_common.database.bigtable.bigtable_write_fingerprint import BigtableWriteFingerprint
+from favie_data_common.database.bigtable.bigtable_write_pipeline import (
+    BigtableWriteError,
+    BigtableWritePipeline,
+    BigtableWritePipelineConfig,
+)
+
+# parallel_scan 中分片读取完成的标记
+_SHARD_DONE = object()
+
+# 配置 metrics 时记录耗时的方法，返回生成器的 iter_* 方法不计时
+_TIMED_METHODS = (
+    "save_model",
+    "save_models",
+    "delete_model",
+    "delete_models",
+    "upsert_model",
+    "upsert_models",
+    "read_model",
+    "read_by_model",
+    "read_models",
+    "read_models_map",
+    "read_model_history",
+    "read_models_history",
+    "query_models",
+    "query_models_batch",
+    "query_models_page",
+    "scan_models",
+    "scan_range",
+    "scan_page",
+)
 
 
 class FieldDeserializer:
@@ -30,7 +69,7 @@ class FieldDeserializer:
 
 
 class BigtableRepository:
-    NULL_CF = "/dev/null"
+    NULL_CF = BigtableModelCodec.NULL_CF
 
     def __init__(
         self,
@@ -47,6 +86,17 @@ class BigtableRepository:
         derializer_config: dict[str, FieldDeserializer] = None,
         model_define_deserializer: bool = False,
         charset: str = "utf-8",
+        cache: BigtableCache = None,
+        single_flight: bool = False,
+        read_batch_window: float = None,
+        read_batch_size: int = 100,
+        write_pipeline_config: BigtableWritePipelineConfig = None,
+        on_write_failure: Callable[[DirectRow, BigtableWriteError], None] = None,
+        write_fingerprint: BigtableWriteFingerprint = None,
+        diff_index: bool = False,
+        bigtable_indexes: dict[str, "BigtableIndexRepository"] = None,
+        metrics: BigtableMetricsSink = None,
+        table: Table = None,
     ):
         """
         bigtable_project_id: BigTable 项目 ID
@@ -59,13 +109,35 @@ class BigtableRepository:
         bigtable_index:bigtable二级索引
         cf_migration:列族迁移配置，key为列名，value为（旧列簇,新列簇）元组
         derializer_config:字段反序列化配置，key为列名，value为FieldDeserializer对象
+        cache: read_model 的读缓存，写入、删除时按 row_key 失效，为空时不缓存
+        single_flight: 为 True 时并发的相同 read_model 请求（row_key、fields、version 相同）共享一次读取
+        read_batch_window: 合并窗口（秒），设置后窗口内不同 row_key 的 read_model 请求合并为一次 read_rows
+        read_batch_size: 合并读取时单次 read_rows 的最大 rowkey 数量
+        write_pipeline_config: 设置后 save_models、delete_models 写入常驻的写入管道，由管道按批量、字节数、
+                               最大等待时间合并发送并反压，方法返回每行的 Future，不再等待写入完成
+        on_write_failure: 写入管道中单行写入失败时的回调
+        write_fingerprint: 设置后未指定 version 的写入跳过内容与上一次写入相同的列，所有列都未变化时跳过整行
+        diff_index: 为 True 时写入前批量读取已存储的索引字段，只写入变化的索引行并删除旧索引行，
+                    删除时按已存储的数据删除索引
+        bigtable_indexes: 具名的二级索引，key 为索引名，与 bigtable_index 一起维护，
+                          各索引与数据并发写入，通过 query_models(index=索引名) 查询
+        metrics: 指标输出，设置后记录各方法耗时、读写的行数与字节数、解码的 cell 数及解码与模型校验耗时，
+                 并在导出时采集缓存、合并读取、写入管道的统计；为空时不做任何埋点。
+                 索引表的耗时需要在索引仓库上同样配置 metrics
+        table: 存储后端，实现 google.cloud.bigtable.table.Table 的读写接口，如 InMemoryBigtableTable；
+               设置后不创建 Bigtable 客户端，为空时连接 bigtable_project_id 下的表
         """
         self.bigtable_project_id = bigtable_project_id
         self.bigtable_instance_id = bigtable_instance_id
         self.bigtable_table_id = bigtable_table_id
-        self.client = bigtable.Client(self.bigtable_project_id)
-        self.instance = self.client.instance(self.bigtable_instance_id)
-        self.table = self.instance.table(self.bigtable_table_id)
+        if table is not None:
+            self.client = None
+            self.instance = None
+            self.table = table
+        else:
+            self.client = bigtable.Client(self.bigtable_project_id)
+            self.instance = self.client.instance(self.bigtable_instance_id)
+            self.table = self.instance.table(self.bigtable_table_id)
         self.model_class = model_class
         self.gen_row_key = gen_rowkey
         self.cf_config = cf_config
@@ -79,6 +151,42 @@ class BigtableRepository:
         self.model_define_deserializer = model_define_deserializer
         self.logger = logging.getLogger(__name__)
         self.charset = charset
+        # 预编译字段编解码计划，避免读取时逐 cell 做类型推断
+        self.model_codec = BigtableModelCodec(
+            model_class=self.model_class,
+            charset=self.charset,
+            default_cf=self.default_cf,
+            cf_config=self.cf_config,
+            cf_migration=self.cf_migration,
+            derializer_config=self.derializer_config,
+            model_define_deserializer=self.model_define_deserializer,
+        )
+        self.filter_compiler = BigtableFilterCompiler(model_codec=self.model_codec)
+        self.cache = cache
+        # 进行中的缓存读取按 row_key 记录 [失效次数, 读取数]，读取期间被写入失效时不缓存读到的旧数据
+        self.__cache_generations: dict[str, list[int]] = {}
+        self.__cache_lock = threading.Lock()
+        self.single_flight = SingleFlight() if single_flight else None
+        self.read_batcher = (
+            ReadBatcher(
+                fetch=self.__batch_read_models, window_seconds=read_batch_window, max_batch_size=read_batch_size
+            )
+            if read_batch_window is not None
+            else None
+        )
+        self.write_fingerprint = write_fingerprint
+        self.diff_index = diff_index
+        self.bigtable_indexes = dict(bigtable_indexes) if bigtable_indexes else {}
+        self.write_pipeline = (
+            BigtableWritePipeline(table=self.table, config=write_pipeline_config, on_failure=on_write_failure)
+            if write_pipeline_config is not None
+            else None
+        )
+        self.metrics = metrics
+        self.metric_labels = {"table": self.bigtable_table_id}
+        if metrics is not None:
+            self.__instrument_methods()
+            metrics.register_collector(self.collect_metrics)
 
     def __init_cf_list(self):
         cf_set = set([self.default_cf]) if self.default_cf else set()  # 确保self.default_cf成为集合，即使它是字符串
@@ -96,20 +204,32 @@ class BigtableRepository:
         ignore_index: bool = False,
     ):
         """
+        索引变化在数据写入前计算，数据写入成功后才写入索引，数据写入失败时不写入索引
+
         model : pydantic object need to be saved
         save_cfs : list of column families need to be saved
         version : version number of saved data
+        raises : 写入失败时抛出 BigtableWriteError
         """
+        index_changes = (
+            self.__diff_save_indexes([model], save_cfs=save_cfs, exclude_fields=exclude_fields)
+            if model and not ignore_index
+            else []
+        )
         self.__save_model(model=model, save_cfs=save_cfs, version=version, exclude_fields=exclude_fields)
-        if self.bigtable_index and not ignore_index:
-            self.bigtable_index.save_index(model=model, version=version)
+        self.__apply_index_changes(index_changes)
 
     def delete_model(self, *, model: BaseModel):
+        """
+        数据删除成功后才删除索引行
+
+        raises : 删除失败时抛出 BigtableWriteError
+        """
         if not model:
             return None
-        if self.bigtable_index:
-            self.bigtable_index.delete_index(model=model)
+        index_changes = self.__diff_delete_indexes([model])
         self.__delete_model(row_key=self.gen_row_key(model))
+        self.__apply_index_changes(index_changes)
 
     def save_models(
         self,
@@ -124,22 +244,38 @@ class BigtableRepository:
         models : list of pydantic objects need to be saved
         save_cfs : list of column families need to be saved
         version : version number of saved data
+        ignore_indexes : 不需要维护索引的 rowkey
+        return : 配置了写入管道时返回每行写入结果的 Future 列表，维护索引时在各行完成且写入成功的行的索引写入后完成
+        raises : 未配置写入管道时任一行写入失败抛出 google.cloud.bigtable.batcher.MutationsBatchError，其余行已写入，
+                 此时不写入任何索引行，需要重试整批写入
         """
-        self.__save_models(models=models, save_cfs=save_cfs, version=version, exclude_fields=exclude_fields)
-        if self.bigtable_index:
-            if ignore_indexes:
-                self.bigtable_index.save_indexes(
-                    models=[model for model in models if self.gen_row_key(model) not in ignore_indexes], version=version
-                )
-            else:
-                self.bigtable_index.save_indexes(models=models, version=version)
+        index_models = models
+        if models and ignore_indexes:
+            index_models = [model for model in models if self.gen_row_key(model) not in ignore_indexes]
+        index_changes = (
+            self.__diff_save_indexes(index_models, save_cfs=save_cfs, exclude_fields=exclude_fields)
+            if index_models
+            else []
+        )
+        return self.__save_models(
+            models=models,
+            save_cfs=save_cfs,
+            version=version,
+            exclude_fields=exclude_fields,
+            index_changes=index_changes,
+        )
 
     def delete_models(self, *, models: List[BaseModel]):
+        """
+        索引行与 save_models 相同，在数据删除成功后才删除
+
+        return : 配置了写入管道时返回每行删除结果的 Future 列表
+        raises : 未配置写入管道时任一行删除失败抛出 google.cloud.bigtable.batcher.MutationsBatchError，其余行已删除
+        """
         if not models:
             return None
-        if self.bigtable_index:
-            self.bigtable_index.delete_indexes(models=models)
-        self.__delete_models(row_keys=[self.gen_row_key(model) for model in models])
+        index_changes = self.__diff_delete_indexes(models)
+        return self.__delete_models(row_keys=[self.gen_row_key(model) for model in models], index_changes=index_changes)
 
     def delete_fields(self, *, model: BaseModel, deleted_fields: list[str]):
         self.executor.submit(self.__delete_fields, self.gen_row_key(model), deleted_fields)
@@ -147,35 +283,148 @@ class BigtableRepository:
     def delete_fields_sync(self, *, model: BaseModel, deleted_fields: list[str]):
         self.__delete_fields(self.gen_row_key(model), deleted_fields)
 
-    def upsert_model(self, *, model: BaseModel, save_fields: list[str] = None, version: int = None):
+    def upsert_model(
+        self, *, model: BaseModel, save_fields: list[str] = None, version: int = None, condition_field: str = None
+    ) -> bool:
         """
+        只写入 save_fields 中的字段，其他列保持不变，值为 None 的字段不写入；
+        写入的字段影响二级索引时，先读取已存储的数据，数据写入成功后按合并后的行写入新索引行并删除旧索引行
+
         model : pydantic object need to be upserted
-        save_cf : list of column families need to be upserted
+        save_fields : 需要写入的字段，为空时写入所有字段
         version : version number of upserted data
+        condition_field : 设置后使用 check-and-mutate 条件写入：该列已存在时间戳晚于 version 的 cell 时不写入，
+                          避免旧数据覆盖新数据；需要同时指定 version，且模型中该字段不能为 None
+        return : 是否写入
+        """
+        if not model:
+            return False
+        if condition_field is None:
+            index_changes = self.__diff_upsert_indexes([model], save_fields)
+            self.__save_model(
+                model=model, version=version, exclude_fields=self.__gen_upsert_exclude_fields(save_fields)
+            )
+            self.__apply_index_changes(index_changes)
+            return True
+        return self.__conditional_upsert_model(
+            model=model, save_fields=save_fields, version=version, condition_field=condition_field
+        )
+
+    def upsert_models(
+        self,
+        *,
+        models: List[BaseModel],
+        save_fields: list[str] = None,
+        version: int = None,
+        condition_field: str = None,
+        max_workers: int = 4,
+    ) -> list[bool]:
         """
+        批量 upsert，参数含义与 upsert_model 相同；
+        无条件写入时合并为一次批量写入，条件写入时每行一次 check-and-mutate，并发执行
 
-    def read_models(self, *, row_keys: list[str], version: int = None, fields: list[str] = None):
+        max_workers : 条件写入的并发线程数
+        return : 与 models 一一对应的是否写入
+        """
+        if not models:
+            return []
+        if condition_field is None:
+            self.__save_models(
+                models=models,
+                version=version,
+                exclude_fields=self.__gen_upsert_exclude_fields(save_fields),
+                index_changes=self.__diff_upsert_indexes(models, save_fields),
+            )
+            return [True] * len(models)
+
+        def upsert(model: BaseModel) -> bool:
+            return self.__conditional_upsert_model(
+                model=model, save_fields=save_fields, version=version, condition_field=condition_field
+            )
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(models))) as executor:
+            return list(executor.map(upsert, models))
+
+    def read_models(
+        self,
+        *,
+        row_keys: list[str],
+        version: int = None,
+        fields: list[str] = None,
+        chunk_size: int = None,
+        max_workers: int = None,
+        aligned: bool = False,
+    ):
         """
         row_keys : list of rowkeys for data to be read
         version : version number for reading data
         fields : list of columns to read from data
+        chunk_size : 每次请求的 rowkey 数量，设置后分批并发读取，单批失败重试不影响其他批次
+        max_workers : 分批读取的并发线程数，默认为 4
+        aligned : 为 True 时返回与 row_keys 一一对应的列表，不存在的 rowkey 对应 None
+        return : 未分批且 aligned 为 False 时按 Bigtable rowkey 顺序返回，否则按 row_keys 的顺序返回
         """
         if CommonUtils.list_len(row_keys) == 0:
             return None
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive: {chunk_size}")
 
-        combined_filter = self.__gen_filters(version=version, fields=fields)
-        row_set = self.__gen_row_set(row_keys)
-        rows: Optional[PartialRowsData] = self.table.read_rows(row_set=row_set, filter_=combined_filter)
-        if rows is None:
-            self.logger.debug(f"Can't find model: row_keys = {row_keys}, version = {version},fields = {fields}")
-            return None
-        results = []
-        for row in rows:
-            results.append(self.__convert_row_to_model(row))
+        if chunk_size is None and not aligned:
+            combined_filter = self.__gen_filters(version=version, fields=fields)
+            row_set = self.__gen_row_set(row_keys)
+            rows: Optional[PartialRowsData] = self.table.read_rows(row_set=row_set, filter_=combined_filter)
+            if rows is None:
+                self.logger.debug(f"Can't find model: row_keys = {row_keys}, version = {version},fields = {fields}")
+                return None
+            results = []
+            for row in rows:
+                results.append(self.__convert_row_to_model(row))
+            return results if CommonUtils.list_len(results) > 0 else None
+
+        models = self.__read_models_by_key(
+            row_keys=row_keys, version=version, fields=fields, chunk_size=chunk_size, max_workers=max_workers
+        )
+        if aligned:
+            return [models.get(row_key) for row_key in row_keys]
+        results = [models[row_key] for row_key in dict.fromkeys(row_keys) if row_key in models]
         return results if CommonUtils.list_len(results) > 0 else None
 
+    def read_models_map(
+        self,
+        *,
+        row_keys: list[str],
+        version: int = None,
+        fields: list[str] = None,
+        chunk_size: int = None,
+        max_workers: int = None,
+    ) -> dict[str, BaseModel]:
+        """
+        按 rowkey 批量读取，返回 {rowkey: 模型}，rowkey 取自读取到的行，调用方无需再用 gen_row_key 关联结果；
+        不存在的 rowkey 不在结果中
+
+        row_keys : list of rowkeys for data to be read
+        version : version number for reading data
+        fields : list of columns to read from data
+        chunk_size : 每次请求的 rowkey 数量，设置后分批并发读取
+        max_workers : 分批读取的并发数，默认为 4
+        """
+        if CommonUtils.list_len(row_keys) == 0:
+            return {}
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive: {chunk_size}")
+        return self.__read_models_by_key(
+            row_keys=row_keys, version=version, fields=fields, chunk_size=chunk_size, max_workers=max_workers
+        )
+
     def query_models(
-        self, *, index_key: str, version: int = None, fields: list[str] = None, limit: int = None, filters: list = None
+        self,
+        *,
+        index_key: str,
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+        index: str = None,
     ):
         """
         Query Bigtable by index key.
@@ -184,19 +433,107 @@ class BigtableRepository:
         index_key : query by index key
         version : version number for reading data
         fields : list of columns to read from data
+        index : bigtable_indexes 中的索引名，为空时使用 bigtable_index
         """
-        if not self.bigtable_index:
-            self.logger.error("Bigtable index is not configured")
+        bigtable_index = self.__get_index(index)
+        if not bigtable_index:
             return None
-        indexes: list[BigtableIndex] = self.bigtable_index.scan_index(
+        indexes: list[BigtableIndex] = bigtable_index.scan_index(
             index_key=index_key, version=version, limit=limit, filters=filters
         )
         if CommonUtils.list_len(indexes) == 0:
             return None
+        # 覆盖索引包含所有请求的字段时直接由索引行返回，省去读取主表
+        if version is None and bigtable_index.covers(fields):
+            return [bigtable_index.convert_index_to_model(index, fields) for index in indexes]
         row_keys = [index.rowkey for index in indexes]
         results = self.read_models(row_keys=row_keys, version=version, fields=fields)
         return results
 
+    def query_models_batch(
+        self,
+        *,
+        index_keys: list[str],
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+        index: str = None,
+        max_workers: int = 8,
+    ) -> dict[str, list[BaseModel]]:
+        """
+        批量按索引查询：一次解析所有 index_key，对目标 rowkey 去重后一次批量读取主表
+
+        index_keys : 需要查询的索引 key
+        version : version number for reading data
+        fields : list of columns to read from data
+        limit : 每个 index_key 最多返回的数量
+        index : bigtable_indexes 中的索引名，为空时使用 bigtable_index
+        max_workers : 多映射索引并发范围扫描的线程数
+        return : {index_key: 模型列表}，没有结果的 index_key 对应空列表
+        """
+        if CommonUtils.list_len(index_keys) == 0:
+            return {}
+        bigtable_index = self.__get_index(index)
+        if not bigtable_index:
+            return {}
+        indexes_by_key = bigtable_index.scan_indexes(
+            index_keys=index_keys, version=version, limit=limit, filters=filters, max_workers=max_workers
+        )
+        if version is None and bigtable_index.covers(fields):
+            return {
+                index_key: [
+                    bigtable_index.convert_index_to_model(index, fields) for index in indexes_by_key.get(index_key, [])
+                ]
+                for index_key in index_keys
+            }
+        row_keys = list(dict.fromkeys(index.rowkey for indexes in indexes_by_key.values() for index in indexes))
+        models = self.read_models_map(row_keys=row_keys, version=version, fields=fields) if row_keys else {}
+        return {
+            index_key: [models[index.rowkey] for index in indexes_by_key.get(index_key, []) if index.rowkey in models]
+            for index_key in index_keys
+        }
+
+    def query_models_page(
+        self,
+        *,
+        index_key: str,
+        page_size: int,
+        continuation_token: str = None,
+        version: int = None,
+        fields: list[str] = None,
+        filters: list = None,
+        index: str = None,
+    ) -> "BigtableModelPage":
+        """
+        按索引分页查询，从 continuation_token 指向的索引行之后继续扫描，不需要从头重新扫描
+
+        index_key : query by index key
+        page_size : 每页的索引数量
+        continuation_token : 上一页返回的 continuation_token（最后一个索引行的 rowkey），为空时从第一页开始
+        version : version number for reading data
+        fields : list of columns to read from data
+        index : bigtable_indexes 中的索引名，为空时使用 bigtable_index
+        return : 本页的模型及 continuation_token；索引指向的数据不存在时本页的模型数可能少于 page_size
+        """
+        bigtable_index = self.__get_index(index)
+        if not bigtable_index:
+            return BigtableModelPage()
+        index_page = bigtable_index.scan_index_page(
+            index_key=index_key,
+            page_size=page_size,
+            continuation_token=continuation_token,
+            version=version,
+            filters=filters,
+        )
+        if version is None and bigtable_index.covers(fields):
+            models = [bigtable_index.convert_index_to_model(index, fields) for index in index_page.models]
+        else:
+            row_keys = [index.rowkey for index in index_page.models]
+            models_map = self.read_models_map(row_keys=row_keys, version=version, fields=fields) if row_keys else {}
+            models = [models_map[row_key] for row_key in row_keys if row_key in models_map]
+        return BigtableModelPage(models=models, continuation_token=index_page.continuation_token)
+
     def scan_models(
         self,
         *,
@@ -217,21 +554,276 @@ class BigtableRepository:
         if not rowkey_prefix:
             return None
 
-        row_key_filter_regex = f"{rowkey_prefix}.*"
-        row_key_filter = RowKeyRegexFilter(row_key_filter_regex.encode(self.charset))
-        other_filters = filters if filters else []
-        other_filters.append(row_key_filter)
+        start_key, end_key = self.__gen_prefix_range(rowkey_prefix)
+        rows = self.__scan_rows(
+            start_key=start_key, end_key=end_key, version=version, fields=fields, limit=limit, filters=filters
+        )
+        results = []
+        for row in rows:
+            results.append(self.__convert_row_to_model(row))
+        return results if CommonUtils.list_len(results) > 0 else None
 
-        combined_filter = self.__gen_filters(version=version, fields=fields, other_filters=other_filters)
-        rows: Optional[PartialRowsData] = self.table.read_rows(filter_=combined_filter, limit=limit)
-        if rows is None:
-            self.logger.debug(f"Can't find model: row_keys = {row_keys}, version = {version},fields = {fields}")
-            return None
+    def scan_range(
+        self,
+        *,
+        start_key: str = None,
+        end_key: str = None,
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+    ):
+        """
+        Scan Bigtable rows in the key range [start_key, end_key).
+
+        Args:
+        start_key : 起始 rowkey（含），为空时从表头开始
+        end_key : 结束 rowkey（不含），为空时扫描到表尾
+        version : version number for reading data
+        fields : list of columns to read from data
+        """
+        rows = self.__scan_rows(
+            start_key=start_key.encode(self.charset) if start_key else None,
+            end_key=end_key.encode(self.charset) if end_key else None,
+            version=version,
+            fields=fields,
+            limit=limit,
+            filters=filters,
+        )
         results = []
         for row in rows:
             results.append(self.__convert_row_to_model(row))
         return results if CommonUtils.list_len(results) > 0 else None
 
+    def iter_read_models(
+        self, *, row_keys: list[str], version: int = None, fields: list[str] = None, batch_size: int = None
+    ) -> Iterator[BaseModel]:
+        """
+        与 read_models 相同，但随着数据流返回逐个产出模型，不在内存中保留全部结果
+
+        row_keys : list of rowkeys for data to be read
+        version : version number for reading data
+        fields : list of columns to read from data
+        batch_size : 每次请求的 rowkey 数量，为空时所有 rowkey 在一次请求中读取
+        """
+        if CommonUtils.list_len(row_keys) == 0:
+            return
+
+        combined_filter = self.__gen_filters(version=version, fields=fields)
+        batch_size = batch_size or len(row_keys)
+        for start in range(0, len(row_keys), batch_size):
+            row_set = self.__gen_row_set(row_keys[start : start + batch_size])
+            for row in self.table.read_rows(row_set=row_set, filter_=combined_filter):
+                yield self.__convert_row_to_model(row)
+
+    def iter_scan_models(
+        self,
+        *,
+        rowkey_prefix: str,
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+        continuation_token: str = None,
+    ) -> Iterator[BaseModel]:
+        """
+        与 scan_models 相同，但随着数据流返回逐个产出模型，不在内存中保留全部结果
+
+        rowkey_prefix : the prefix to scan for in rowkeys
+        version : version number for reading data
+        fields : list of columns to read from data
+        continuation_token : 从该 rowkey 之后（不含）开始扫描，用于断点续扫
+        """
+        if not rowkey_prefix:
+            return
+
+        start_key, end_key = self.__gen_prefix_range(rowkey_prefix)
+        rows = self.__scan_rows(
+            start_key=start_key,
+            end_key=end_key,
+            version=version,
+            fields=fields,
+            limit=limit,
+            filters=filters,
+            start_after=continuation_token,
+        )
+        for row in rows:
+            yield self.__convert_row_to_model(row)
+
+    def iter_scan_pages(
+        self,
+        *,
+        rowkey_prefix: str,
+        page_size: int,
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+        continuation_token: str = None,
+    ) -> Iterator["BigtableModelPage"]:
+        """
+        按页产出扫描结果，每页最多 page_size 个模型；
+        每页的 continuation_token 为该页最后一行的 rowkey，传给下一次调用即可从断点继续扫描，
+        扫描结束时最后一页的 continuation_token 为空
+
+        rowkey_prefix : the prefix to scan for in rowkeys
+        page_size : 每页的模型数量
+        version : version number for reading data
+        fields : list of columns to read from data
+        continuation_token : 从该 rowkey 之后（不含）开始扫描
+        """
+        if not rowkey_prefix:
+            return
+        if page_size <= 0:
+            raise ValueError(f"page_size must be positive: {page_size}")
+
+        start_key, end_key = self.__gen_prefix_range(rowkey_prefix)
+        rows = self.__scan_rows(
+            start_key=start_key,
+            end_key=end_key,
+            version=version,
+            fields=fields,
+            limit=limit,
+            filters=filters,
+            start_after=continuation_token,
+        )
+        models = []
+        last_row_key = None
+        for row in rows:
+            # 读到下一行时才产出已满的一页，保证只有最后一页的 continuation_token 为空
+            if len(models) >= page_size:
+                yield BigtableModelPage(models=models, continuation_token=last_row_key.decode(self.charset))
+                models = []
+            models.append(self.__convert_row_to_model(row))
+            last_row_key = row.row_key
+        if models:
+            yield BigtableModelPage(models=models)
+
+    def scan_page(
+        self,
+        *,
+        rowkey_prefix: str,
+        page_size: int,
+        continuation_token: str = None,
+        version: int = None,
+        fields: list[str] = None,
+        filters: list = None,
+    ) -> "BigtableModelPage":
+        """
+        只取 iter_scan_pages 的一页，每次请求只读取 page_size + 1 行（多读的一行用于判断是否还有下一页）
+
+        rowkey_prefix : the prefix to scan for in rowkeys，为空时返回空页，与 scan_models 一致
+        page_size : 每页的模型数量
+        continuation_token : 上一页返回的 continuation_token，为空时从第一页开始
+        version : version number for reading data
+        fields : list of columns to read from data
+        return : 本页的模型及 continuation_token，最后一页的 continuation_token 为空
+        """
+        if page_size <= 0:
+            raise ValueError(f"page_size must be positive: {page_size}")
+        pages = self.iter_scan_pages(
+            rowkey_prefix=rowkey_prefix,
+            page_size=page_size,
+            version=version,
+            fields=fields,
+            limit=page_size + 1,
+            filters=filters,
+            continuation_token=continuation_token,
+        )
+        try:
+            return next(pages, BigtableModelPage())
+        finally:
+            pages.close()
+
+    def iter_row_keys(self, *, rowkey_prefix: str = None) -> Iterator[str]:
+        """
+        只扫描 rowkey：每行只返回一个去掉值的 cell，rowkey_prefix 为空时扫描整个表
+        """
+        row_set = None
+        if rowkey_prefix:
+            start_key, end_key = self.__gen_prefix_range(rowkey_prefix)
+            row_set = RowSet()
+            row_set.add_row_range_from_keys(start_key=start_key, end_key=end_key)
+        key_filter = RowFilterChain(filters=[CellsRowLimitFilter(1), StripValueTransformerFilter(True)])
+        for row in self.table.read_rows(row_set=row_set, filter_=key_filter):
+            yield row.row_key.decode(self.charset)
+
+    def parallel_scan(
+        self,
+        *,
+        rowkey_prefix: str = None,
+        shards: int = 8,
+        hashed_rowkey: bool = False,
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+        max_workers: int = None,
+        buffer_size: int = 1000,
+    ) -> Iterator[BaseModel]:
+        """
+        将扫描范围切分为多个分片并发读取，按到达顺序合并产出模型（不保证 rowkey 顺序）
+
+        rowkey_prefix : the prefix to scan for in rowkeys，为空时扫描全表
+        shards : 分片数量
+        hashed_rowkey : rowkey 由 BigtableUtils.gen_hash_rowkey 生成时为 True，按 6 位 md5 前缀均分，
+                        否则按表的 sample_row_keys 切分
+        version : version number for reading data
+        fields : list of columns to read from data
+        limit : 最多产出的模型数量
+        max_workers : 并发读取的线程数，默认与分片数相同
+        buffer_size : 已读取未消费的模型数量上限，消费慢时读取线程阻塞等待
+        """
+        if shards <= 0:
+            raise ValueError(f"shards must be positive: {shards}")
+        start_key, end_key = self.__gen_prefix_range(rowkey_prefix) if rowkey_prefix else (None, None)
+        shard_ranges = self.__gen_shard_ranges(start_key, end_key, shards, hashed_rowkey)
+        results = queue.Queue(maxsize=buffer_size)
+        stopped = threading.Event()
+
+        def put(item) -> bool:
+            while not stopped.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def scan_shard(shard_start: Optional[bytes], shard_end: Optional[bytes]):
+            try:
+                rows = self.__scan_rows(
+                    start_key=shard_start, end_key=shard_end, version=version, fields=fields, filters=filters
+                )
+                for row in rows:
+                    if not put(self.__convert_row_to_model(row)):
+                        return
+                put(_SHARD_DONE)
+            except Exception as e:
+                put(e)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers or len(shard_ranges))
+        try:
+            for shard_start, shard_end in shard_ranges:
+                executor.submit(scan_shard, shard_start, shard_end)
+            pending = len(shard_ranges)
+            count = 0
+            while pending > 0:
+                item = results.get()
+                if item is _SHARD_DONE:
+                    pending -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+        finally:
+            # 提前结束或出错时通知读取线程退出
+            stopped.set()
+            executor.shutdown(wait=False)
+
     def read_by_model(self, *, model: BaseModel, version: int = None, fields: list[str] = None) -> Optional[BaseModel]:
         """
         model : pydantic object need to be read
@@ -247,6 +839,146 @@ class BigtableRepository:
         version : version number for reading data
         fields : list of columns to read from data
         """
+        if self.cache is None and self.single_flight is None and self.read_batcher is None:
+            return self.__read_model(row_key=row_key, version=version, fields=fields)
+
+        read_key = (row_key, tuple(fields) if fields else None, version)
+        if self.cache is not None:
+            hit, model = self.cache.get(read_key)
+            if hit:
+                return model
+        if self.single_flight is not None:
+            return self.single_flight.do(read_key, lambda: self.__load_model(read_key))
+        return self.__load_model(read_key)
+
+    def read_model_history(
+        self,
+        *,
+        row_key: str,
+        versions: int = None,
+        start_version: int = None,
+        end_version: int = None,
+        fields: list[str] = None,
+        filters: list = None,
+    ) -> Optional["BigtableModelHistory"]:
+        """
+        一次请求读取一行的多个版本，按时间正序组装为各版本的模型与每个字段的时间线
+
+        row_key : rowkey for data to be read
+        versions : 每个字段最多读取最近的版本数，为空时不限制
+        start_version : 时间窗口起点（秒级版本号，包含），为空时不限制
+        end_version : 时间窗口终点（秒级版本号，不包含），为空时不限制
+        fields : list of columns to read from data
+        filters : BigtableFilters 生成的过滤条件或原始过滤器
+        """
+        row_filter = self.__gen_history_filter(versions, start_version, end_version, fields, filters)
+        row: Optional[PartialRowData] = self.table.read_row(row_key.encode(self.charset), filter_=row_filter)
+        if row is None:
+            return None
+        return BigtableModelHistory.build(row_key, self.model_class, self.model_codec.convert_row_to_versions(row))
+
+    def read_models_history(
+        self,
+        *,
+        row_keys: list[str],
+        versions: int = None,
+        start_version: int = None,
+        end_version: int = None,
+        fields: list[str] = None,
+        filters: list = None,
+        chunk_size: int = None,
+        max_workers: int = None,
+    ) -> dict[str, "BigtableModelHistory"]:
+        """
+        批量读取多行的多个版本，参数同 read_model_history
+
+        chunk_size : 每次请求的 rowkey 数量，设置后分批并发读取
+        max_workers : 分批读取的并发线程数，默认为 4
+        return : {rowkey: 历史}，不存在的 rowkey 不在结果中
+        """
+        if CommonUtils.list_len(row_keys) == 0:
+            return {}
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive: {chunk_size}")
+        row_filter = self.__gen_history_filter(versions, start_version, end_version, fields, filters)
+        unique_row_keys = list(dict.fromkeys(row_keys))
+
+        def read_chunk(chunk_row_keys: list[str]) -> dict[str, "BigtableModelHistory"]:
+            rows = self.table.read_rows(row_set=self.__gen_row_set(chunk_row_keys), filter_=row_filter)
+            histories = {}
+            for row in rows:
+                row_key = row.row_key.decode(self.charset)
+                histories[row_key] = BigtableModelHistory.build(
+                    row_key, self.model_class, self.model_codec.convert_row_to_versions(row)
+                )
+            return histories
+
+        chunk_size = chunk_size or len(unique_row_keys)
+        chunks = [unique_row_keys[i : i + chunk_size] for i in range(0, len(unique_row_keys), chunk_size)]
+        if len(chunks) == 1:
+            return read_chunk(chunks[0])
+        histories = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers or 4, len(chunks))) as executor:
+            for chunk_histories in executor.map(read_chunk, chunks):
+                histories.update(chunk_histories)
+        return histories
+
+    def __load_model(self, read_key: tuple[str, Optional[tuple], Optional[int]]) -> Optional[BaseModel]:
+        row_key, fields, version = read_key
+        if self.cache is None:
+            return self.__fetch_model(read_key)
+        generation = self.__begin_cache_fill(row_key)
+        try:
+            model = self.__fetch_model(read_key)
+        except Exception:
+            self.__end_cache_fill(read_key, generation, loaded=False)
+            raise
+        self.__end_cache_fill(read_key, generation, loaded=True, model=model)
+        return model
+
+    def __fetch_model(self, read_key: tuple[str, Optional[tuple], Optional[int]]) -> Optional[BaseModel]:
+        row_key, fields, version = read_key
+        if self.read_batcher is not None:
+            return self.read_batcher.load(row_key, fields, version)
+        return self.__read_model(row_key=row_key, version=version, fields=list(fields) if fields else None)
+
+    def __begin_cache_fill(self, row_key: str) -> int:
+        """
+        return : 读取开始时 row_key 的失效次数
+        """
+        with self.__cache_lock:
+            generation = self.__cache_generations.setdefault(row_key, [0, 0])
+            generation[1] += 1
+            return generation[0]
+
+    def __end_cache_fill(
+        self, read_key: tuple[str, Optional[tuple], Optional[int]], generation: int, loaded: bool, model=None
+    ):
+        """
+        读取期间 row_key 没有被写入失效时才写入缓存，检查与写入在同一锁内，避免旧数据在失效之后写入缓存
+        """
+        row_key = read_key[0]
+        with self.__cache_lock:
+            current = self.__cache_generations[row_key]
+            current[1] -= 1
+            if current[1] == 0:
+                del self.__cache_generations[row_key]
+            if loaded and current[0] == generation:
+                self.cache.put(read_key, model)
+
+    def __invalidate_cached(self, row_key: str):
+        with self.__cache_lock:
+            generation = self.__cache_generations.get(row_key)
+            if generation is not None:
+                generation[0] += 1
+        self.cache.invalidate(row_key)
+
+    def __batch_read_models(
+        self, row_keys: list[str], fields: Optional[tuple], version: Optional[int]
+    ) -> dict[str, BaseModel]:
+        return self.__read_models_by_key(row_keys=row_keys, version=version, fields=list(fields) if fields else None)
+
+    def __read_model(self, *, row_key: str, version: int = None, fields: list[str] = None) -> Optional[BaseModel]:
         combined_filter = self.__gen_filters(version=version, fields=fields)
         row: Optional[PartialRowData] = self.table.read_row(row_key.encode(self.charset), filter_=combined_filter)
         if row is None:
@@ -264,13 +996,377 @@ class BigtableRepository:
     ) -> None:
         if not model:
             return
-        row = self.__convert_model_to_row(model, save_cfs=save_cfs, version=version, exclude_fields=exclude_fields)
-        row.commit()
+        row_key, cells = self.__convert_model_to_cells(
+            model, save_cfs=save_cfs, version=version, exclude_fields=exclude_fields
+        )
+        if cells is None:
+            return
+        row = self.__build_row(row_key, cells, version)
+        self.__commit_row(row)
+        self.__invalidate_cache([row_key])
+        self.__record_fingerprint(row_key, cells)
+
+    def __commit_row(self, row: DirectRow):
+        """
+        DirectRow.commit 返回该行的状态而不抛出异常，写入失败时抛出 BigtableWriteError，调用方不再写入索引
+        """
+        self.__record_mutations([row])
+        status = row.commit()
+        if status is not None and status.code != 0:
+            raise BigtableWriteError(row.row_key, status=status)
+
+    def __get_index(self, index: Optional[str]) -> Optional["BigtableIndexRepository"]:
+        bigtable_index = self.bigtable_indexes.get(index) if index else self.bigtable_index
+        if not bigtable_index:
+            self.logger.error(f"Bigtable index is not configured: {index}")
+        return bigtable_index
+
+    def __get_all_indexes(self) -> list["BigtableIndexRepository"]:
+        return ([self.bigtable_index] if self.bigtable_index else []) + list(self.bigtable_indexes.values())
+
+    def __read_stored_models_for_indexes(
+        self, row_keys: list[str], models: List[BaseModel], indexes: list["BigtableIndexRepository"]
+    ) -> dict[str, BaseModel]:
+        """
+        一次批量读取所有索引依赖的字段，任一索引未配置 index_fields 时读取整行；
+        只读取部分字段时，未读取的字段取自本次写入的模型，否则 gen_index 依赖的 id 等字段为空，生成错误的旧索引行
+        """
+        fields = set()
+        for bigtable_index in indexes:
+            if not bigtable_index.index_fields:
+                fields = None
+                break
+            fields.update(bigtable_index.index_fields)
+        stored_models = self.__read_models_by_key(row_keys=row_keys, fields=list(fields) if fields else None)
+        if not fields:
+            return stored_models
+        models_by_key = dict(zip(row_keys, models))
+        return {
+            row_key: models_by_key[row_key].model_copy(
+                update={field_name: getattr(stored_model, field_name, None) for field_name in fields}
+            )
+            for row_key, stored_model in stored_models.items()
+        }
+
+    def __diff_save_indexes(
+        self,
+        models: List[BaseModel],
+        save_cfs: Optional[Set[str]] = None,
+        exclude_fields: list[str] = None,
+    ) -> list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]]:
+        """
+        生成写入后需要应用的索引变化，未开启 diff_index 时写入所有模型的索引行；
+        开启 diff_index 时先读取已存储的数据（必须在数据写入前），值为 None 及未写入的字段保留已存储的值，
+        按合并后的模型只写入变化的索引行并删除旧索引行
+        """
+        indexes = self.__get_all_indexes()
+        if not indexes:
+            return []
+        if not self.diff_index:
+            changes = []
+            for bigtable_index in indexes:
+                saved_indexes = [index for index in map(bigtable_index.build_index, models) if index is not None]
+                if saved_indexes:
+                    changes.append((bigtable_index, saved_indexes, []))
+            return changes
+
+        written_fields = [
+            field_name
+            for field_name, *_ in self.model_codec.get_encode_plan(self.model_class, save_cfs, exclude_fields)
+        ]
+        row_keys = [self.gen_row_key(model) for model in models]
+        stored_models = self.__read_stored_models_for_indexes(row_keys, models, indexes)
+        merged_models = self.__merge_written_fields(row_keys, models, stored_models, written_fields)
+        return self.__diff_indexes(indexes, row_keys, merged_models, stored_models)
+
+    def __diff_indexes(
+        self,
+        indexes: list["BigtableIndexRepository"],
+        row_keys: list[str],
+        models: List[BaseModel],
+        stored_models: dict[str, BaseModel],
+    ) -> list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]]:
+        """
+        对比写入后的模型与已存储的模型，return : [(索引, 需要写入的索引行, 需要删除的索引行)]
+        """
+        changes = []
+        for bigtable_index in indexes:
+            saved_indexes = []
+            deleted_indexes = []
+            for row_key, model in zip(row_keys, models):
+                new_index = bigtable_index.build_index(model)
+                stored_model = stored_models.get(row_key)
+                stored_index = bigtable_index.build_index(stored_model) if stored_model else None
+                new_index_row_key = bigtable_index.gen_index_rowkey(new_index) if new_index else None
+                stored_index_row_key = bigtable_index.gen_index_rowkey(stored_index) if stored_index else None
+                if new_index_row_key == stored_index_row_key:
+                    # 索引行不变，覆盖索引的字段变化时只需重写
+                    if new_index and new_index != stored_index:
+                        saved_indexes.append(new_index)
+                    continue
+                if new_index:
+                    saved_indexes.append(new_index)
+                if stored_index:
+                    deleted_indexes.append(stored_index)
+            if saved_indexes or deleted_indexes:
+                changes.append((bigtable_index, saved_indexes, deleted_indexes))
+        return changes
+
+    def __apply_index_changes(
+        self, changes: list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]]
+    ):
+        """
+        数据写入成功后调用，各索引的变化提交到线程池并发写入
+        """
+        futures = [
+            self.executor.submit(
+                bigtable_index.apply_index_changes, saved_indexes=saved_indexes, deleted_indexes=deleted_indexes
+            )
+            for bigtable_index, saved_indexes, deleted_indexes in changes
+        ]
+        for future in futures:
+            future.result()
+
+    def __chain_index_changes(
+        self,
+        row_keys: list[str],
+        futures: list[Future],
+        changes: list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]],
+    ) -> list[Future]:
+        """
+        写入管道的各行全部完成后，只应用写入成功的行（按索引行的 rowkey 匹配）的索引变化；
+        return : 与 futures 一一对应，在索引写入后完成，索引写入失败时设置该异常
+        """
+        chained_futures = [Future() for _ in futures]
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def apply():
+            failed_row_keys = {row_key for row_key, future in zip(row_keys, futures) if future.exception() is not None}
+            error = None
+            try:
+                # 在线程池中执行，直接写入，不再提交到线程池
+                for bigtable_index, saved_indexes, deleted_indexes in changes:
+                    bigtable_index.apply_index_changes(
+                        saved_indexes=[index for index in saved_indexes if index.rowkey not in failed_row_keys],
+                        deleted_indexes=[index for index in deleted_indexes if index.rowkey not in failed_row_keys],
+                    )
+            except Exception as e:
+                self.logger.error(f"apply index changes failed,rows:{len(row_keys)},error:{e}")
+                error = e
+            for future, chained_future in zip(futures, chained_futures):
+                if future.exception() is not None:
+                    chained_future.set_exception(future.exception())
+                elif error is not None:
+                    chained_future.set_exception(error)
+                else:
+                    chained_future.set_result(future.result())
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self.executor.submit(apply)
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        return chained_futures
+
+    def __diff_upsert_indexes(
+        self, models: List[BaseModel], save_fields: Optional[list[str]]
+    ) -> list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]]:
+        """
+        upsert 只写入部分字段，写入后的行由已存储的数据与本次写入的非空字段合并而成；
+        写入的字段与索引依赖的字段有交集时（或索引未配置 index_fields），按合并后的模型对比已存储的模型生成索引变化，
+        必须在数据写入前调用
+        """
+        indexes = self.__get_all_indexes()
+        if not indexes:
+            return []
+        written_fields = save_fields or list(self.model_class.model_fields.keys())
+        indexes = [
+            bigtable_index
+            for bigtable_index in indexes
+            if not bigtable_index.index_fields or set(bigtable_index.index_fields) & set(written_fields)
+        ]
+        if not indexes:
+            return []
+
+        row_keys = [self.gen_row_key(model) for model in models]
+        stored_models = self.__read_stored_models_for_indexes(row_keys, models, indexes)
+        merged_models = self.__merge_written_fields(row_keys, models, stored_models, written_fields)
+        return self.__diff_indexes(indexes, row_keys, merged_models, stored_models)
+
+    @staticmethod
+    def __merge_written_fields(
+        row_keys: list[str],
+        models: List[BaseModel],
+        stored_models: dict[str, BaseModel],
+        written_fields: list[str],
+    ) -> list[BaseModel]:
+        """
+        值为 None 的字段不写入，写入后的行由已存储的数据与本次写入的非空字段合并而成
+        """
+        merged_models = []
+        for row_key, model in zip(row_keys, models):
+            stored_model = stored_models.get(row_key)
+            if stored_model is None:
+                # 新行只包含本次写入的字段
+                stored_model = model.model_copy(
+                    update={field_name: None for field_name in model.model_fields if field_name not in written_fields}
+                )
+            written_values = {}
+            for field_name in written_fields:
+                field_value = getattr(model, field_name, None)
+                if field_value is not None:
+                    written_values[field_name] = field_value
+            merged_models.append(stored_model.model_copy(update=written_values))
+        return merged_models
+
+    def __diff_delete_indexes(
+        self, models: List[BaseModel]
+    ) -> list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]]:
+        """
+        生成删除后需要删除的索引行，未开启 diff_index 时按传入的模型生成；
+        开启 diff_index 时删除已存储数据对应的索引，以及传入模型对应的索引（清理可能存在的孤立索引行）
+        """
+        indexes = self.__get_all_indexes()
+        if not indexes:
+            return []
+        if not self.diff_index:
+            changes = []
+            for bigtable_index in indexes:
+                deleted_indexes = [index for index in map(bigtable_index.gen_index, models) if index is not None]
+                if deleted_indexes:
+                    changes.append((bigtable_index, [], deleted_indexes))
+            return changes
+
+        row_keys = [self.gen_row_key(model) for model in models]
+        stored_models = self.__read_stored_models_for_indexes(row_keys, models, indexes)
+        changes = []
+        for bigtable_index in indexes:
+            deleted_indexes = {}
+            for row_key, model in zip(row_keys, models):
+                stored_model = stored_models.get(row_key)
+                for index in (
+                    bigtable_index.gen_index(stored_model) if stored_model else None,
+                    bigtable_index.gen_index(model),
+                ):
+                    if index:
+                        deleted_indexes.setdefault(bigtable_index.gen_index_rowkey(index), index)
+            if deleted_indexes:
+                changes.append((bigtable_index, [], list(deleted_indexes.values())))
+        return changes
+
+    def __gen_upsert_exclude_fields(self, save_fields: Optional[list[str]]) -> Optional[list[str]]:
+        if not save_fields:
+            return None
+        return [field_name for field_name in self.model_class.model_fields.keys() if field_name not in save_fields]
+
+    def __conditional_upsert_model(
+        self, *, model: BaseModel, save_fields: Optional[list[str]], version: int, condition_field: str
+    ) -> bool:
+        if version is None:
+            raise ValueError("version is required for conditional upsert")
+        if save_fields and condition_field not in save_fields:
+            raise ValueError(f"condition_field must be in save_fields: {condition_field}")
+        # 值为 None 的字段不写入，条件列没有写入新的 cell，之后的版本检查会失效
+        if getattr(model, condition_field, None) is None:
+            raise ValueError(f"condition_field value is None: {condition_field}")
+        row_key = self.gen_row_key(model)
+        condition_cf = self.cf_config.get(condition_field, self.default_cf) if self.cf_config else self.default_cf
+        # 匹配条件列中时间戳晚于 version 的 cell，匹配到说明已有更新的写入；列族、列名完全匹配
+        newer_filter = RowFilterChain(
+            filters=[
+                FamilyNameRegexFilter(BigtableFilterCompiler.anchored_regex(condition_cf)),
+                ColumnQualifierRegexFilter(BigtableFilterCompiler.anchored_regex(condition_field).encode(self.charset)),
+                TimestampRangeFilter(TimestampRange(start=datetime.fromtimestamp(version + 1, tz=timezone.utc))),
+            ]
+        )
+        row = self.table.conditional_row(row_key.encode(self.charset), filter_=newer_filter)
+        timestamp = datetime.fromtimestamp(version, tz=timezone.utc)
+        cells = self.model_codec.convert_model_to_cells(
+            model, exclude_fields=self.__gen_upsert_exclude_fields(save_fields)
+        )
+        if not cells:
+            return False
+        for column_family, column_qualifier, column_value in cells:
+            row.set_cell(column_family, column_qualifier, column_value, timestamp=timestamp, state=False)
+        # 索引变化需要在写入前对比已存储的数据，写入成功后再应用
+        index_changes = self.__diff_upsert_indexes([model], save_fields)
+        self.__record_mutations([row])
+        newer_exists = row.commit()
+        if newer_exists:
+            self.logger.debug(f"Skip stale upsert: row_key = {row_key}, version = {version}")
+            return False
+        self.__invalidate_cache([row_key])
+        self.__record_fingerprint(row_key, cells)
+        self.__apply_index_changes(index_changes)
+        return True
+
+    def __scan_rows(
+        self,
+        *,
+        start_key: Optional[bytes],
+        end_key: Optional[bytes],
+        version: int = None,
+        fields: list[str] = None,
+        limit: int = None,
+        filters: list = None,
+        start_after: Union[str, bytes] = None,
+    ) -> Iterable[PartialRowData]:
+        """
+        扫描 [start_key, end_key) 范围内的行，只访问该范围所在的 tablet
+
+        start_key : 起始 rowkey（含），为空时从表头开始
+        end_key : 结束 rowkey（不含），为空时扫描到表尾
+        start_after : 从该 rowkey 之后（不含）开始扫描，用于断点续扫
+        """
+        start_inclusive = True
+        if start_after:
+            start_after_key = start_after if isinstance(start_after, bytes) else start_after.encode(self.charset)
+            if start_key is None or start_after_key >= start_key:
+                start_key = start_after_key
+                start_inclusive = False
+        if start_key is not None and end_key is not None and start_key >= end_key:
+            return []
+
+        row_set = RowSet()
+        row_set.add_row_range_from_keys(start_key=start_key, end_key=end_key, start_inclusive=start_inclusive)
+        combined_filter = self.__gen_filters(version=version, fields=fields, other_filters=filters)
+        return self.table.read_rows(row_set=row_set, filter_=combined_filter, limit=limit)
+
+    def __gen_prefix_range(self, rowkey_prefix: str) -> tuple[bytes, Optional[bytes]]:
+        start_key = rowkey_prefix.encode(self.charset)
+        return start_key, BigtableUtils.gen_prefix_end_key(start_key)
+
+    def __gen_shard_ranges(
+        self, start_key: Optional[bytes], end_key: Optional[bytes], shards: int, hashed_rowkey: bool
+    ) -> list[tuple[Optional[bytes], Optional[bytes]]]:
+        if hashed_rowkey:
+            split_keys = [shard_key.encode(self.charset) for shard_key in BigtableUtils.gen_hash_shard_keys(shards)]
+        else:
+            # 最后一个 sample 可能为空字节，表示表尾
+            split_keys = [sample.row_key for sample in self.table.sample_row_keys() if sample.row_key]
+        split_keys = sorted(
+            {
+                split_key
+                for split_key in split_keys
+                if (start_key is None or split_key > start_key) and (end_key is None or split_key < end_key)
+            }
+        )
+        # 分界点多于所需时均匀抽取
+        if len(split_keys) >= shards:
+            split_keys = [split_keys[len(split_keys) * i // shards] for i in range(1, shards)]
+        boundaries = [start_key, *split_keys, end_key]
+        return list(zip(boundaries[:-1], boundaries[1:]))
 
     def __delete_model(self, *, row_key: str):
         row = self.table.row(row_key.encode(self.charset))
         row.delete()
-        row.commit()
+        self.__commit_row(row)
+        self.__invalidate_cache([row_key], deleted=True)
 
     def __save_models(
         self,
@@ -279,62 +1375,180 @@ class BigtableRepository:
         save_cfs: Optional[Set[str]] = None,
         version: int = None,
         exclude_fields: list[str] = None,
-    ) -> None:
+        index_changes: list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]] = None,
+    ) -> Optional[list[Future]]:
         if not models:
-            return
-        batcher = self.table.mutations_batcher()
+            return None
+        rows = []
+        written_cells = {}
         for model in models:
-            row = self.__convert_model_to_row(model, save_cfs=save_cfs, version=version, exclude_fields=exclude_fields)
-            batcher.mutate(row)
-        batcher.flush()
+            row_key, cells = self.__convert_model_to_cells(
+                model, save_cfs=save_cfs, version=version, exclude_fields=exclude_fields
+            )
+            if cells is None:
+                continue
+            rows.append(self.__build_row(row_key, cells, version))
+            written_cells[row_key] = cells
+        if not rows:
+            # 内容均未变化，不需要写入数据，索引变化照常应用
+            self.__apply_index_changes(index_changes or [])
+            return None
+        return self.__mutate_rows(rows, written_cells=written_cells, index_changes=index_changes)
 
-    def __delete_models(self, *, row_keys: List[str]):
+    def __delete_models(
+        self,
+        *,
+        row_keys: List[str],
+        index_changes: list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]] = None,
+    ) -> Optional[list[Future]]:
         if not row_keys:
-            return
-        batcher = self.table.mutations_batcher()
+            return None
+        rows = []
         for row_key in row_keys:
             row = self.table.row(row_key.encode(self.charset))
             row.delete()
-            batcher.mutate(row)
-        batcher.flush()
+            rows.append(row)
+        return self.__mutate_rows(rows, index_changes=index_changes)
+
+    def __mutate_rows(
+        self,
+        rows: list[DirectRow],
+        written_cells: dict[str, list[tuple[str, bytes, bytes]]] = None,
+        index_changes: list[tuple["BigtableIndexRepository", list["BigtableIndex"], list["BigtableIndex"]]] = None,
+    ) -> Optional[list[Future]]:
+        """
+        rows : 需要写入的行
+        written_cells : 写入的 cell，key 为 rowkey，写入成功后记录指纹；删除行时为空
+        index_changes : 数据写入成功后应用的索引变化
+        未配置写入管道时关闭 batcher 会发送并检查所有行，任一行失败抛出 MutationsBatchError（exc 为各行的错误），
+        其余行已写入，因此失败时同样失效缓存，但不记录指纹，也不应用任何索引变化（无法区分失败的行）；
+        配置了写入管道时返回的 Future 在写入成功的行的索引变化应用后完成
+        """
+        row_keys = [row.row_key.decode(self.charset) for row in rows]
+        self.__record_mutations(rows)
+        if self.write_pipeline is None:
+            try:
+                with self.table.mutations_batcher() as batcher:
+                    batcher.mutate_rows(rows)
+            finally:
+                self.__invalidate_cache(row_keys, deleted=written_cells is None)
+            if written_cells:
+                for row_key in row_keys:
+                    self.__record_fingerprint(row_key, written_cells.get(row_key))
+            self.__apply_index_changes(index_changes or [])
+            return None
+
+        if written_cells is None and self.write_fingerprint is not None:
+            for row_key in row_keys:
+                self.write_fingerprint.invalidate(row_key)
+        futures = self.write_pipeline.mutate_rows(rows)
+        for row_key, future in zip(row_keys, futures):
+            if self.cache is not None:
+                # 写入完成后再次失效，避免写入期间读取的旧数据被缓存
+                self.__invalidate_cached(row_key)
+                future.add_done_callback(lambda _, key=row_key: self.__invalidate_cached(key))
+            if written_cells and self.write_fingerprint is not None:
+                future.add_done_callback(
+                    lambda done, key=row_key: done.exception() is None
+                    and self.__record_fingerprint(key, written_cells.get(key))
+                )
+        if index_changes:
+            return self.__chain_index_changes(row_keys, futures, index_changes)
+        return futures
+
+    def __record_mutations(self, rows: list[Union[DirectRow, ConditionalRow]]):
+        """
+        记录提交的行数与 mutation 字节数，批量写入、单行写入、条件写入、删除列都在提交前调用（提交后 mutation 被清空）
+        """
+        if self.metrics is None:
+            return
+        mutation_bytes = 0
+        for row in rows:
+            if isinstance(row, ConditionalRow):
+                # ConditionalRow 没有 get_mutations_size，条件写入的 mutation 都在条件不成立的分支
+                mutation_bytes += sum(mutation._pb.ByteSize() for mutation in row._get_mutations(state=False))
+            else:
+                mutation_bytes += row.get_mutations_size()
+        self.metrics.increment("bigtable_rows_mutated_total", len(rows), self.metric_labels)
+        self.metrics.increment("bigtable_mutation_bytes_total", mutation_bytes, self.metric_labels)
 
-    def __convert_model_to_row(
+    def __convert_model_to_cells(
         self,
         model: BaseModel,
         save_cfs: Optional[Set[str]] = None,
         version: int = None,
         exclude_fields: list[str] = None,
-    ):
+    ) -> tuple[str, Optional[list[tuple[str, bytes, bytes]]]]:
         """
         model : pydantic object need to be saved
         save_cfs : list of column families need to be saved
         version : version number of saved data
+        return : (rowkey, 需要写入的 cell)，开启写入指纹且内容均未变化时 cell 为 None
         """
         row_key = self.gen_row_key(model)
+        # 列族、列名字节及序列化函数已按 (模型类, save_cfs, exclude_fields) 预编译并缓存
+        cells = self.model_codec.convert_model_to_cells(model, save_cfs=save_cfs, exclude_fields=exclude_fields)
+        # 指定 version 的写入需要保留该版本，不跳过
+        if self.write_fingerprint is not None and version is None and cells:
+            cells = self.write_fingerprint.filter_changed_cells(row_key, cells)
+            if not cells:
+                return row_key, None
+        return row_key, cells
+
+    def __build_row(self, row_key: str, cells: list[tuple[str, bytes, bytes]], version: int = None) -> DirectRow:
         row: DirectRow = self.table.direct_row(row_key.encode(self.charset))
         timestamp = None
         if version is not None:
             timestamp = datetime.fromtimestamp(version, tz=timezone.utc)
-        for field_name, field_value in model.__dict__.items():
-            if exclude_fields and field_name in exclude_fields:
-                continue
-            if self.cf_migration and field_name in self.cf_migration.keys():
-                old_cf, new_cf = self.cf_migration[field_name]
-                if new_cf == self.NULL_CF:
-                    continue
-            if field_value is None:
-                continue
-            column_family = (
-                self.cf_config.get(field_name, self.default_cf) if self.cf_config is not None else self.default_cf
-            )
-            if save_cfs is None or column_family in save_cfs:
-                column_value = BigtableUtils.pydantic_field_convert_str(field_value).encode(self.charset)
-                if timestamp is not None:
-                    row.set_cell(column_family, field_name, column_value, timestamp=timestamp)
-                else:
-                    row.set_cell(column_family, field_name, column_value)
+        for column_family, column_qualifier, column_value in cells:
+            row.set_cell(column_family, column_qualifier, column_value, timestamp=timestamp)
         return row
 
+    def __record_fingerprint(self, row_key: str, cells: Optional[list[tuple[str, bytes, bytes]]]):
+        if self.write_fingerprint is not None and cells:
+            self.write_fingerprint.record(row_key, cells)
+
+    def __read_models_by_key(
+        self,
+        *,
+        row_keys: list[str],
+        version: int = None,
+        fields: list[str] = None,
+        chunk_size: int = None,
+        max_workers: int = None,
+    ) -> dict[str, BaseModel]:
+        """
+        读取 row_keys 对应的模型，rowkey 直接取自 row.row_key，返回 {rowkey: 模型}，不存在的 rowkey 不在结果中
+        """
+        combined_filter = self.__gen_filters(version=version, fields=fields)
+        unique_row_keys = list(dict.fromkeys(row_keys))
+
+        def read_chunk(chunk_row_keys: list[str]) -> dict[str, BaseModel]:
+            rows = self.table.read_rows(row_set=self.__gen_row_set(chunk_row_keys), filter_=combined_filter)
+            return {row.row_key.decode(self.charset): self.__convert_row_to_model(row) for row in rows}
+
+        chunk_size = chunk_size or len(unique_row_keys)
+        chunks = [unique_row_keys[i : i + chunk_size] for i in range(0, len(unique_row_keys), chunk_size)]
+        if len(chunks) == 1:
+            return read_chunk(chunks[0])
+
+        models = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers or 4, len(chunks))) as executor:
+            for chunk_models in executor.map(read_chunk, chunks):
+                models.update(chunk_models)
+        return models
+
+    def __invalidate_cache(self, row_keys: list[str], deleted: bool = False):
+        """
+        row_keys : 写入或删除的 rowkey
+        deleted : 删除行或列时为 True，同时失效写入指纹，保证下一次写入不被跳过
+        """
+        for row_key in row_keys:
+            if self.cache is not None:
+                self.__invalidate_cached(row_key)
+            if deleted and self.write_fingerprint is not None:
+                self.write_fingerprint.invalidate(row_key)
+
     def __gen_row_set(self, row_keys: list[str]):
         row_set = RowSet()
         for row_key in row_keys:
@@ -344,40 +1558,35 @@ class BigtableRepository:
 
     # convert bigtable row to pydantic object
     def __convert_row_to_model(self, row, row_key: str = None):
-        model_dict = {}
-        migration_status = set()
-        for column_family in row.cells:
-            for column_qualifier, cell_list in row.cells[column_family].items():
-                if len(cell_list) > 0:
-                    cell_value = cell_list[0].value
-                    field_value = cell_value.decode(self.charset)
-                    field_name = column_qualifier.decode(self.charset)
-                    field_type = PydanticUtils.get_native_field_type(self.model_class, field_name)
-                    # if field_type is None,ignore this field,otherwise convert it to pydantic field
-                    if field_type is not None:
-                        if self.cf_migration and field_name in self.cf_migration.keys():
-                            old_cf, new_cf = self.cf_migration[field_name]
-                            if column_family == old_cf:
-                                if new_cf == self.NULL_CF:
-                                    migration_status.add(field_name)
-                                elif field_name not in migration_status:
-                                    model_dict[field_name] = self.__derialize_field(field_name, field_value, field_type)
-                            elif column_family == new_cf:
-                                migration_status.add(field_name)
-                                model_dict[field_name] = self.__derialize_field(field_name, field_value, field_type)
-                        else:
-                            model_dict[field_name] = self.__derialize_field(field_name, field_value, field_type)
+        if self.metrics is not None:
+            return self.__convert_row_to_model_with_metrics(row, row_key)
+        model_dict, migration_status = self.model_codec.convert_row_to_dict(row)
         if migration_status and row_key:
             self.executor.submit(self.__delete_migeration_fields, row_key, migration_status)
         return self.model_class(**model_dict)
 
-    def __derialize_field(self, field_name: str, field_value: str, field_type: type):
-        if self.derializer_config and field_name in self.derializer_config.keys():
-            return self.derializer_config[field_name].deserialize(field_value)
-        if self.model_define_deserializer:
-            return field_value
-        else:
-            return BigtableUtils.str_convert_pydantic_field(field_value, field_type)
+    def __convert_row_to_model_with_metrics(self, row, row_key: str = None):
+        start = time.perf_counter()
+        model_dict, migration_status = self.model_codec.convert_row_to_dict(row)
+        decoded = time.perf_counter()
+        if migration_status and row_key:
+            self.executor.submit(self.__delete_migeration_fields, row_key, migration_status)
+        model = self.model_class(**model_dict)
+        validated = time.perf_counter()
+
+        cell_count = 0
+        cell_bytes = len(row.row_key)
+        for columns in row.cells.values():
+            for cell_list in columns.values():
+                cell_count += len(cell_list)
+                cell_bytes += sum(len(cell.value) for cell in cell_list)
+        metrics, labels = self.metrics, self.metric_labels
+        metrics.increment("bigtable_rows_read_total", 1, labels)
+        metrics.increment("bigtable_cells_decoded_total", cell_count, labels)
+        metrics.increment("bigtable_bytes_read_total", cell_bytes, labels)
+        metrics.increment("bigtable_decode_seconds_total", decoded - start, labels)
+        metrics.increment("bigtable_validate_seconds_total", validated - decoded, labels)
+        return model
 
     def __delete_migeration_fields(self, row_key: str, fields: set[str]):
         try:
@@ -400,69 +1609,95 @@ class BigtableRepository:
                 row = self.table.row(row_key.encode(self.charset))
                 for cf, field in fields:
                     row.delete_cell(cf, field.encode(self.charset))
+                self.__record_mutations([row])
                 row.commit()
+                self.__invalidate_cache([row_key], deleted=True)
         except Exception as e:
             self.logger.error(f"delete fields failed,row_key:{row_key},fields:{fields},error:{e}")
 
     # generate filters for querying bigtable based on parameters
     def __gen_filters(self, *, version: Optional[str], fields: Optional[list[str]], other_filters: list = None):
-        filters = [*other_filters] if other_filters else []
-        # 增加版本过滤器
-        if version is not None:
-            start_timestamp = datetime.fromtimestamp(version, tz=timezone.utc)
-            end_timestamp = datetime.fromtimestamp(version + 1, tz=timezone.utc)
-            filters.append(TimestampRangeFilter(TimestampRange(start=start_timestamp, end=end_timestamp)))
-        else:
-            filters.append(CellsColumnLimitFilter(1))
-
-        # 增加列过滤器
-        if CommonUtils.list_len(fields) > 0:
-            column_filters = [ColumnQualifierRegexFilter(qualifier.encode(self.charset)) for qualifier in fields]
-            # 表达OR关系
-            union_filters = (
-                RowFilterUnion(filters=column_filters)
-                if CommonUtils.list_len(column_filters) > 1
-                else column_filters[0]
-            )
-            filters.append(union_filters)
-
-        # 列簇过滤器，支持多个列簇
-        families = self.__get_families(fields)
-        if CommonUtils.list_len(families) > 0:
-            family_filters = [FamilyNameRegexFilter(family) for family in families]
-            if CommonUtils.list_len(family_filters) > 1:
-                family_filter_union = RowFilterUnion(filters=family_filters)
-                filters.append(family_filter_union)
-            elif CommonUtils.list_len(family_filters) == 1:
-                filters.append(family_filters[0])
-
-        # 根据 filters 列表的长度决定如何调用 read_row
-        combined_filter = None
-        if len(filters) > 1:
-            combined_filter = RowFilterChain(filters=filters)
-        elif len(filters) == 1:
-            combined_filter = filters[0]
-
-        return combined_filter
-
-    # retrieve column families base on the list of fields parameters
-    def __get_families(self, fields: list[str]):
-        if CommonUtils.list_len(fields) == 0:
-            return self.cf_list
-
-        if self.cf_config is None:
-            return self.cf_list
-
-        families = set()
-        for field in fields:
-            if field in self.cf_config.keys():
-                families.add(self.cf_config[field])
-            else:
-                families.add(self.default_cf)
-        return families
+        return self.filter_compiler.build_row_filter(version=version, fields=fields, other_filters=other_filters)
+
+    def __gen_history_filter(
+        self,
+        versions: Optional[int],
+        start_version: Optional[int],
+        end_version: Optional[int],
+        fields: Optional[list[str]],
+        filters: Optional[list],
+    ):
+        if versions is not None and versions <= 0:
+            raise ValueError(f"versions must be positive: {versions}")
+        if start_version is not None and end_version is not None and start_version >= end_version:
+            raise ValueError(f"start_version must be less than end_version: {start_version}, {end_version}")
+        return self.filter_compiler.build_history_filter(
+            versions=versions,
+            start_version=start_version,
+            end_version=end_version,
+            fields=fields,
+            other_filters=filters,
+        )
+
+    def collect_metrics(self) -> list[tuple[str, float, dict[str, str]]]:
+        """
+        采集缓存、合并读取、写入管道、写入指纹的统计，由 metrics 在导出时调用
+
+        return : [(指标名, 值, 标签)]
+        """
+        labels = self.metric_labels
+        samples = []
+        if self.cache is not None:
+            samples += [(f"bigtable_cache_{name}", value, labels) for name, value in self.cache.stats()]
+        if self.single_flight is not None:
+            samples.append(("bigtable_single_flight_shared", self.single_flight.shared_count, labels))
+        if self.read_batcher is not None:
+            samples.append(("bigtable_read_batches", self.read_batcher.batch_count, labels))
+        if self.write_pipeline is not None:
+            samples += [
+                (f"bigtable_write_pipeline_{name}", value, labels) for name, value in self.write_pipeline.stats()
+            ]
+        if self.write_fingerprint is not None:
+            samples += [
+                (f"bigtable_write_fingerprint_{name}", value, labels) for name, value in self.write_fingerprint.stats()
+            ]
+        return samples
+
+    def __instrument_methods(self):
+        """
+        以实例属性覆盖需要计时的方法，未配置 metrics 时方法调用没有任何额外开销
+        """
+        for method_name in _TIMED_METHODS:
+            setattr(self, method_name, self.__timed(method_name, getattr(self, method_name)))
+
+    def __timed(self, method_name: str, method: Callable) -> Callable:
+        metrics = self.metrics
+        labels = {**self.metric_labels, "method": method_name}
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                metrics.increment("bigtable_method_errors_total", 1, labels)
+                raise
+            finally:
+                metrics.observe("bigtable_method_seconds", time.perf_counter() - start, labels)
+
+        return timed
+
+    def flush(self):
+        """
+        等待写入管道中所有已提交的写入完成，未配置写入管道时无操作
+        """
+        if self.write_pipeline is not None:
+            self.write_pipeline.flush()
 
     def close(self):
-        self.client.close()
+        if self.write_pipeline is not None:
+            self.write_pipeline.close()
+        if self.client is not None:
+            self.client.close()
         self.executor.shutdown()
 
 
@@ -471,6 +1706,55 @@ class BigtableIndex(BaseModel):
     index_key: Optional[str] = None
 
 
+class BigtableModelPage(BaseModel):
+    models: list[BaseModel] = []
+    # 本页最后一行的 rowkey，传给分页方法的 continuation_token 参数获取下一页，为空表示已扫描完
+    continuation_token: Optional[str] = None
+
+
+class BigtableFieldVersion(BaseModel):
+    # 秒级版本号，与 save_model 的 version 一致
+    version: int
+    timestamp: datetime
+    value: Any = None
+
+
+class BigtableModelVersion(BaseModel):
+    version: int
+    timestamp: datetime
+    # 只包含该版本写入的字段
+    model: BaseModel
+
+
+class BigtableModelHistory(BaseModel):
+    row_key: str
+    # 按时间正序排列的各版本模型
+    versions: list[BigtableModelVersion] = []
+    # 每个字段按时间正序排列的取值
+    timelines: dict[str, list[BigtableFieldVersion]] = {}
+
+    @staticmethod
+    def build(
+        row_key: str, model_class: Type[BaseModel], versions: dict[int, dict[str, Any]]
+    ) -> "BigtableModelHistory":
+        """
+        versions : BigtableModelCodec.convert_row_to_versions 的返回值
+        """
+        history = BigtableModelHistory(row_key=row_key)
+        for timestamp_micros in sorted(versions):
+            model_dict = versions[timestamp_micros]
+            version = timestamp_micros // 1000000
+            timestamp = datetime.fromtimestamp(timestamp_micros / 1000000, tz=timezone.utc)
+            history.versions.append(
+                BigtableModelVersion(version=version, timestamp=timestamp, model=model_class(**model_dict))
+            )
+            for field_name, value in model_dict.items():
+                history.timelines.setdefault(field_name, []).append(
+                    BigtableFieldVersion(version=version, timestamp=timestamp, value=value)
+                )
+        return history
+
+
 class BigtableIndexRepository:
     def __init__(
         self,
@@ -481,37 +1765,266 @@ class BigtableIndexRepository:
         index_class: Type[BigtableIndex] = None,
         index_cf: str = None,
         gen_index: Callable[[BaseModel], BigtableIndex] = None,
+        cache: BigtableCache = None,
+        write_fingerprint: BigtableWriteFingerprint = None,
+        index_fields: list[str] = None,
+        model_class: Type[BaseModel] = None,
+        covering_fields: list[str] = None,
+        bloom_filter: BigtableBloomFilter = None,
+        bloom_filter_built: bool = False,
+        metrics: BigtableMetricsSink = None,
+        table: Table = None,
     ):
+        """
+        write_fingerprint: 设置后 index_key 未变化的索引行跳过写入
+        index_fields: gen_index 依赖的数据字段，主表开启 diff_index 时只读取这些字段，为空时读取整行；
+                      其余字段取自本次写入的模型，因此只有不会变化的字段（如对应 rowkey 的 id）可以不列出
+        model_class: 主表的 Pydantic 模型类，配置 covering_fields 时必填
+        covering_fields: 覆盖索引字段，写入索引时将主表模型的这些字段一并写入索引行，
+                         query_models 请求的 fields 都在其中时直接由索引行返回，不再读取主表
+        bloom_filter: index_key 的布隆过滤器，写入索引时增量加入，判定不存在的 index_key 不再请求 Bigtable；
+                      新的过滤器不包含索引表中已有的 index_key，rebuild_bloom_filter 完成之前不用于跳过读取。
+                      过滤器只加入本进程写入的 index_key，其他进程写入的 index_key 在下一次重建之前会被判定为不存在、
+                      查询返回空，删除的 index_key 也不会移出过滤器；存在多个写入方时需要按可接受的延迟定期调用
+                      rebuild_bloom_filter 刷新，或只在唯一写入方的进程中启用
+        bloom_filter_built: 传入的过滤器已包含索引表中全部 index_key（如 rebuild_bloom_filter 生成后 save、load 的过滤器）
+                            时设为 True，立即用于跳过读取
+        metrics: 索引表的指标输出，同时采集布隆过滤器的统计
+        table: 索引表的存储后端，为空时连接 bigtable_index_table_id 对应的表
+        """
         self.gen_index = gen_index
+        self.model_class = model_class
+        self.covering_fields = covering_fields
+        self.index_class = self.__gen_index_class(index_class if index_class else BigtableIndex)
+        # 覆盖索引字段变化时也需要重写索引行，diff_index 时一并读取
+        self.index_fields = [*index_fields, *covering_fields] if index_fields and covering_fields else index_fields
         self.index_table = BigtableRepository(
             bigtable_project_id=bigtable_project_id,
             bigtable_instance_id=bigtable_instance_id,
             bigtable_table_id=bigtable_index_table_id,
-            model_class=index_class if index_class else BigtableIndex,
+            model_class=self.index_class,
             default_cf=index_cf,
             gen_rowkey=self._gen_rowkey,
+            cache=cache,
+            write_fingerprint=write_fingerprint,
+            metrics=metrics,
+            table=table,
         )
+        self.bloom_filter = bloom_filter
+        # 过滤器包含索引表中全部 index_key 之后才能据此跳过读取，否则已有的索引会被误判为不存在
+        self.__bloom_filter_built = bloom_filter_built
+        self.__bloom_filter_lock = threading.Lock()
+        # 重建布隆过滤器期间写入的 index_key，重建完成后补充到新的过滤器中
+        self.__bloom_filter_pending: Optional[list[str]] = None
+        if metrics is not None:
+            metrics.register_collector(self.collect_metrics)
 
-    def save_index(self, *, model: BaseModel, version: int = None):
+    def __gen_index_class(self, index_class: Type[BigtableIndex]) -> Type[BigtableIndex]:
+        """
+        配置 covering_fields 时生成继承 index_class 并带有覆盖字段的索引模型类
+        """
+        if not self.covering_fields:
+            return index_class
+        if self.model_class is None:
+            raise ValueError("model_class is required for covering index")
+        covered_fields = {}
+        for field_name in self.covering_fields:
+            if field_name in index_class.model_fields:
+                raise ValueError(f"covering field conflicts with index field: {field_name}")
+            field_info = self.model_class.model_fields.get(field_name)
+            if field_info is None:
+                raise ValueError(f"covering field not found in {self.model_class.__name__}: {field_name}")
+            covered_fields[field_name] = (Optional[field_info.annotation], None)
+        return create_model(f"Covering{index_class.__name__}", __base__=index_class, **covered_fields)
+
+    def build_index(self, model: BaseModel) -> Optional[BigtableIndex]:
+        """
+        生成需要写入的索引行，覆盖索引会带上 covering_fields 的值
+        """
         index = self.gen_index(model)
+        if index is None or not self.covering_fields:
+            return index
+        return self.index_class(
+            **index.__dict__, **{field_name: getattr(model, field_name, None) for field_name in self.covering_fields}
+        )
+
+    def covers(self, fields: Optional[list[str]]) -> bool:
+        """
+        索引行是否包含 fields 中的全部字段
+        """
+        if not self.covering_fields or not fields:
+            return False
+        return all(field_name in self.covering_fields for field_name in fields)
+
+    def convert_index_to_model(self, index: BigtableIndex, fields: list[str]) -> BaseModel:
+        """
+        将覆盖索引行转换为只包含 fields 的主表模型
+        """
+        return self.model_class(**{field_name: getattr(index, field_name, None) for field_name in fields})
+
+    def save_index(self, *, model: BaseModel, version: int = None):
+        index = self.build_index(model)
         self.index_table.save_model(model=index, exclude_fields=["index_key"])
+        self.__add_to_bloom_filter([index])
 
     def delete_index(self, *, model: BaseModel):
         index = self.gen_index(model)
         self.index_table.delete_model(model=index)
 
     def save_indexes(self, *, models: List[BaseModel], version: int = None):
-        indexes = [self.gen_index(model) for model in models]
+        indexes = [self.build_index(model) for model in models]
         self.index_table.save_models(models=indexes, exclude_fields=["index_key"])
+        self.__add_to_bloom_filter(indexes)
 
     def delete_indexes(self, *, models: List[BaseModel]):
         indexes = [self.gen_index(model) for model in models]
         self.index_table.delete_models(models=indexes)
 
+    def apply_index_changes(self, *, saved_indexes: List[BigtableIndex], deleted_indexes: List[BigtableIndex]):
+        """
+        批量写入新增的索引行、删除过期的索引行
+        """
+        if deleted_indexes:
+            self.index_table.delete_models(models=deleted_indexes)
+        if saved_indexes:
+            self.index_table.save_models(models=saved_indexes, exclude_fields=["index_key"])
+            self.__add_to_bloom_filter(saved_indexes)
+
+    def might_contain(self, index_key: str) -> bool:
+        """
+        return : False 表示 index_key 一定没有索引，未配置布隆过滤器或过滤器尚未构建时总是返回 True
+        """
+        bloom_filter = self.bloom_filter
+        return bloom_filter is None or not self.__bloom_filter_built or bloom_filter.might_contain(index_key)
+
+    def rebuild_bloom_filter(self, *, expected_items: int = None, false_positive_rate: float = None):
+        """
+        扫描整个索引表（只读取 rowkey）重建布隆过滤器，清除已删除的 index_key，并加入其他进程写入的 index_key；
+        重建期间写入的 index_key 不会丢失。重建完成后过滤器才用于跳过读取
+
+        expected_items : 新过滤器预计的 key 数量，为空时按索引表中 index_key 的数量
+        false_positive_rate : 新过滤器的误判率，为空时沿用当前过滤器的配置
+        """
+        with self.__bloom_filter_lock:
+            self.__bloom_filter_pending = []
+        try:
+            index_keys = set()
+            for row_key in self.index_table.iter_row_keys():
+                index_keys.update(self._parse_index_keys(row_key))
+            current = self.bloom_filter
+            bloom_filter = BigtableBloomFilter(
+                expected_items=max(1, expected_items or len(index_keys)),
+                false_positive_rate=false_positive_rate or (current.false_positive_rate if current else 0.01),
+            )
+            bloom_filter.add_all(index_keys)
+            # 加入重建期间写入的 index_key 与替换过滤器在同一个临界区内完成，之后的写入直接进入新过滤器
+            with self.__bloom_filter_lock:
+                bloom_filter.add_all(self.__bloom_filter_pending)
+                self.bloom_filter = bloom_filter
+                self.__bloom_filter_built = True
+        finally:
+            with self.__bloom_filter_lock:
+                self.__bloom_filter_pending = None
+        return bloom_filter
+
+    def collect_metrics(self) -> list[tuple[str, float, dict[str, str]]]:
+        """
+        采集布隆过滤器的统计
+        """
+        bloom_filter = self.bloom_filter
+        if bloom_filter is None:
+            return []
+        labels = self.index_table.metric_labels
+        stats = bloom_filter.stats()
+        samples = [(f"bigtable_bloom_filter_{name}", value, labels) for name, value in stats]
+        samples.append(
+            ("bigtable_bloom_filter_observed_false_positive_rate", stats.observed_false_positive_rate, labels)
+        )
+        return samples
+
+    def _filter_index_keys(self, index_keys: List[str]) -> List[str]:
+        """
+        去掉布隆过滤器判定一定不存在的 index_key
+        """
+        if self.bloom_filter is None or not self.__bloom_filter_built:
+            return index_keys
+        return [index_key for index_key in index_keys if self.might_contain(index_key)]
+
+    def _record_lookup(self, found: bool):
+        bloom_filter = self.bloom_filter
+        if bloom_filter is not None and self.__bloom_filter_built and not found:
+            bloom_filter.record_false_positive()
+
+    def _parse_index_keys(self, row_key: str) -> List[str]:
+        """
+        由索引行 rowkey 解析可能的 index_key；index_key 或 rowkey 中可能含有 #，每个 # 之前的部分都加入
+        """
+        return [row_key[:position] for position, char in enumerate(row_key) if char == "#"]
+
+    def __add_to_bloom_filter(self, indexes: List[BigtableIndex]):
+        if self.bloom_filter is None:
+            return
+        index_keys = [index.index_key for index in indexes if index is not None and index.index_key is not None]
+        with self.__bloom_filter_lock:
+            self.bloom_filter.add_all(index_keys)
+            if self.__bloom_filter_pending is not None:
+                self.__bloom_filter_pending.extend(index_keys)
+
+    def gen_index_rowkey(self, index: BigtableIndex) -> str:
+        return self._gen_rowkey(index)
+
     def scan_index(
         self, *, index_key: str, version: int = None, filters: list = None, limit: int = None
     ) -> list[BaseModel]:
-        return self.index_table.scan_models(rowkey_prefix=index_key, limit=limit, filters=filters)
+        if not self.might_contain(index_key):
+            return None
+        # 前缀扫描转换为 rowkey 范围 [index_key, index_key 的后继)，只访问索引所在的 tablet
+        indexes = self.index_table.scan_models(rowkey_prefix=index_key, limit=limit, filters=filters)
+        self._record_lookup(bool(indexes))
+        return indexes
+
+    def scan_index_page(
+        self,
+        *,
+        index_key: str,
+        page_size: int,
+        continuation_token: str = None,
+        version: int = None,
+        filters: list = None,
+    ) -> BigtableModelPage:
+        """
+        分页扫描 index_key 的索引行，continuation_token 为上一页最后一个索引行的 rowkey
+        """
+        if page_size <= 0:
+            raise ValueError(f"page_size must be positive: {page_size}")
+        if not continuation_token and not self.might_contain(index_key):
+            return BigtableModelPage()
+        return self.index_table.scan_page(
+            rowkey_prefix=index_key, page_size=page_size, continuation_token=continuation_token, filters=filters
+        )
+
+    def scan_indexes(
+        self,
+        *,
+        index_keys: List[str],
+        version: int = None,
+        filters: list = None,
+        limit: int = None,
+        max_workers: int = 8,
+    ) -> dict[str, list[BigtableIndex]]:
+        """
+        并发扫描多个 index_key 的 rowkey 范围
+
+        limit : 每个 index_key 最多返回的数量
+        return : {index_key: 索引列表}，没有索引的 index_key 不在结果中
+        """
+        unique_index_keys = list(dict.fromkeys(index_keys))
+
+        def scan(index_key: str):
+            return index_key, self.scan_index(index_key=index_key, version=version, filters=filters, limit=limit)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_index_keys))) as executor:
+            return {index_key: indexes for index_key, indexes in executor.map(scan, unique_index_keys) if indexes}
 
     def close(self):
         if self.index_table:
@@ -531,7 +2044,29 @@ class BigtableSingleMapIndexRepository(BigtableIndexRepository):
         index_class: Type[BigtableIndex] = None,
         index_cf: str = None,
         gen_index: Callable[[BaseModel], BigtableIndex] = None,
+        cache: BigtableCache = None,
+        write_fingerprint: BigtableWriteFingerprint = None,
+        index_fields: list[str] = None,
+        model_class: Type[BaseModel] = None,
+        covering_fields: list[str] = None,
+        bloom_filter: BigtableBloomFilter = None,
+        bloom_filter_built: bool = False,
+        metrics: BigtableMetricsSink = None,
+        table: Table = None,
     ):
+        """
+        cache: 索引表 read_model 的读缓存，scan_index 按 index_key 读取时生效
+        write_fingerprint: 设置后 index_key 与 rowkey 的映射未变化的索引行跳过写入
+        index_fields: gen_index 依赖的数据字段，主表开启 diff_index 时只读取这些字段，为空时读取整行；
+                      其余字段取自本次写入的模型，因此只有不会变化的字段（如对应 rowkey 的 id）可以不列出
+        model_class: 主表的 Pydantic 模型类，配置 covering_fields 时必填
+        covering_fields: 覆盖索引字段，写入索引时将主表模型的这些字段一并写入索引行
+        bloom_filter: index_key 的布隆过滤器，判定不存在的 index_key 不再请求 Bigtable，
+                      rebuild_bloom_filter 完成前不用于跳过读取，多写入方时的刷新方式见 BigtableIndexRepository
+        bloom_filter_built: 传入的过滤器已包含索引表中全部 index_key 时设为 True
+        metrics: 索引表的指标输出，同时采集布隆过滤器的统计
+        table: 索引表的存储后端，为空时连接 bigtable_index_table_id 对应的表
+        """
         super().__init__(
             bigtable_project_id=bigtable_project_id,
             bigtable_instance_id=bigtable_instance_id,
@@ -539,17 +2074,74 @@ class BigtableSingleMapIndexRepository(BigtableIndexRepository):
             index_class=index_class,
             index_cf=index_cf,
             gen_index=gen_index,
+            cache=cache,
+            write_fingerprint=write_fingerprint,
+            index_fields=index_fields,
+            model_class=model_class,
+            covering_fields=covering_fields,
+            bloom_filter=bloom_filter,
+            bloom_filter_built=bloom_filter_built,
+            metrics=metrics,
+            table=table,
         )
         self.logger = logging.getLogger(__name__)
 
     def scan_index(
         self, *, index_key: str, version: int = None, filters: list = None, limit: int = None
     ) -> list[BaseModel]:
+        if not self.might_contain(index_key):
+            return None
         index = self.index_table.read_model(row_key=index_key)
+        self._record_lookup(index is not None)
         return [index] if index else None
 
     def read_indexes(self, *, index_keys: List[str], version: int = None, filters: list = None):
+        index_keys = self._filter_index_keys(index_keys)
+        if not index_keys:
+            return None
         return self.index_table.read_models(row_keys=index_keys, version=version, fields=None)
 
+    def scan_index_page(
+        self,
+        *,
+        index_key: str,
+        page_size: int,
+        continuation_token: str = None,
+        version: int = None,
+        filters: list = None,
+    ) -> BigtableModelPage:
+        """
+        单映射索引每个 index_key 只有一行，第一页即全部结果
+        """
+        if page_size <= 0:
+            raise ValueError(f"page_size must be positive: {page_size}")
+        if continuation_token:
+            return BigtableModelPage()
+        indexes = self.scan_index(index_key=index_key, version=version, filters=filters)
+        return BigtableModelPage(models=indexes or [])
+
+    def scan_indexes(
+        self,
+        *,
+        index_keys: List[str],
+        version: int = None,
+        filters: list = None,
+        limit: int = None,
+        max_workers: int = 8,
+    ) -> dict[str, list[BigtableIndex]]:
+        """
+        单映射索引的 rowkey 即 index_key，所有 index_key 一次批量读取
+        """
+        unique_index_keys = self._filter_index_keys(list(dict.fromkeys(index_keys)))
+        if not unique_index_keys:
+            return {}
+        indexes = self.index_table.read_models_map(row_keys=unique_index_keys, version=version)
+        for index_key in unique_index_keys:
+            self._record_lookup(index_key in indexes)
+        return {index_key: [index] for index_key, index in indexes.items()}
+
+    def _parse_index_keys(self, row_key: str) -> List[str]:
+        return [row_key]
+
     def _gen_rowkey(self, model):
         return model.index_key
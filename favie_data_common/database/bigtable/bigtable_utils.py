@@ -1,11 +1,15 @@
 import json
-from typing import Any, get_args
+from typing import Any, Callable, Optional, get_args
 
 from pydantic import BaseModel
 
 from favie_data_common.common.common_utils import CommonUtils
 from favie_data_common.common.pydantic_utils import PydanticUtils
 
+_SIMPLE_TYPES = (int, float, str, bool)
+_CONTAINER_TYPES = (list, set, tuple, dict)
+_SEQUENCE_TYPES = (list, set, tuple)
+
 
 class BigtableUtils:
     @staticmethod
@@ -14,6 +18,30 @@ class BigtableUtils:
         md5 = CommonUtils.md5_hash(key)
         return f"{md5[0:6]}-{key}"
 
+    @staticmethod
+    def gen_hash_shard_keys(shards: int) -> list[str]:
+        """
+        将 gen_hash_rowkey 生成的 6 位 md5 十六进制前缀空间均分为 shards 段，返回各段之间的分界 rowkey
+
+        shards : 分段数
+        return : 升序排列的 shards - 1 个分界 rowkey
+        """
+        space = 16**6
+        return [f"{space * i // shards:06x}" for i in range(1, shards)]
+
+    @staticmethod
+    def gen_prefix_end_key(prefix: bytes) -> Optional[bytes]:
+        """
+        生成前缀扫描的结束 rowkey（不含），即大于所有以 prefix 开头的 rowkey 的最小值
+
+        prefix : rowkey 前缀字节
+        return : 结束 rowkey，prefix 全为 0xff 时返回 None，表示扫描到表尾
+        """
+        end_key = prefix.rstrip(b"\xff")
+        if not end_key:
+            return None
+        return end_key[:-1] + bytes([end_key[-1] + 1])
+
     @staticmethod
     def pydantic_field_convert_str(param, force_dump_json: bool = False) -> str:
         """
@@ -41,6 +69,67 @@ class BigtableUtils:
         else:
             raise TypeError(f"Unsupported type : {type(param)}")
 
+    @staticmethod
+    def compile_pydantic_field_convert_str(data_type: type, force_dump_json: bool = False) -> Callable[[Any], str]:
+        """
+        按字段声明类型预编译 pydantic_field_convert_str，返回专用的序列化函数，结果与 pydantic_field_convert_str 一致；
+        字段实际值的类型与声明不一致时回退到 pydantic_field_convert_str
+        """
+
+        def convert_generic(param):
+            return BigtableUtils.pydantic_field_convert_str(param, force_dump_json)
+
+        if data_type in _SIMPLE_TYPES:
+            dump = json.dumps if force_dump_json else str
+
+            def convert_simple(param):
+                if isinstance(param, _SIMPLE_TYPES):
+                    return dump(param)
+                return convert_generic(param)
+
+            return convert_simple
+
+        if isinstance(data_type, type) and issubclass(data_type, BaseModel):
+
+            def convert_model(param):
+                # 先比较具体类型，避免 pydantic 元类 isinstance 的开销
+                if param.__class__ is data_type or isinstance(param, BaseModel):
+                    return param.model_dump_json(exclude_none=True)
+                return convert_generic(param)
+
+            return convert_model
+
+        if (
+            PydanticUtils.is_type_of_list(data_type)
+            or PydanticUtils.is_type_of_set(data_type)
+            or (PydanticUtils.is_type_of_tuple(data_type) and len(set(get_args(data_type))) == 1)
+        ):
+            item_type = get_args(data_type)[0] if get_args(data_type) else Any
+            convert_item = BigtableUtils.compile_pydantic_field_convert_str(item_type, True)
+
+            def convert_sequence(param):
+                if isinstance(param, _SEQUENCE_TYPES):
+                    return "[" + ", ".join([convert_item(item) for item in param]) + "]"
+                return convert_generic(param)
+
+            return convert_sequence
+
+        if PydanticUtils.is_type_of_dict(data_type) and get_args(data_type):
+            convert_value = BigtableUtils.compile_pydantic_field_convert_str(get_args(data_type)[1], True)
+
+            def convert_dict(param):
+                if isinstance(param, dict):
+                    return (
+                        "{"
+                        + ", ".join([f"{json.dumps(key)}: {convert_value(value)}" for key, value in param.items()])
+                        + "}"
+                    )
+                return convert_generic(param)
+
+            return convert_dict
+
+        return convert_generic
+
     @staticmethod
     def str_convert_pydantic_field(string_data, data_type: type):
         """
@@ -189,3 +278,123 @@ class BigtableUtils:
 
         # 处理基础数据类型 或者 仍然为`expected_type`
         return BigtableUtils.str_convert_pydantic_field(item, expected_type)
+
+    @staticmethod
+    def compile_str_convert_pydantic_field(data_type: type) -> Callable[[Any], Any]:
+        """
+        按类型预编译 str_convert_pydantic_field，返回专用的反序列化函数，结果与 str_convert_pydantic_field 一致，
+        类型判断只在编译时做一次，适合对同一类型反复反序列化的场景（如 Bigtable 行转换）
+        """
+        if data_type == int:
+            return int
+        elif data_type == float:
+            return float
+        elif data_type == str:
+            return lambda string_data: string_data
+        elif data_type == bool:
+            return lambda string_data: (
+                string_data.lower() == "true" if isinstance(string_data, str) else bool(string_data)
+            )
+
+        if data_type == Any or data_type == any:
+            return lambda string_data: BigtableUtils.str_convert_pydantic_field(string_data, Any)
+
+        if PydanticUtils.is_type_of_list(data_type):
+            item_type = get_args(data_type)[0] if get_args(data_type) else Any
+            convert_item = BigtableUtils.compile_str_convert_complex_type(item_type)
+
+            def convert_list(string_data):
+                items = json.loads(string_data) if isinstance(string_data, str) else string_data
+                return [convert_item(item) for item in items]
+
+            return convert_list
+
+        if PydanticUtils.is_type_of_set(data_type):
+            item_type = get_args(data_type)[0] if get_args(data_type) else Any
+            convert_item = BigtableUtils.compile_str_convert_complex_type(item_type)
+
+            def convert_set(string_data):
+                items = json.loads(string_data) if isinstance(string_data, str) else string_data
+                return {convert_item(item) for item in items}
+
+            return convert_set
+
+        if PydanticUtils.is_type_of_dict(data_type):
+            key_type, value_type = get_args(data_type) or (Any, Any)
+            convert_key = BigtableUtils.compile_str_convert_pydantic_field(key_type)
+            convert_value = BigtableUtils.compile_str_convert_complex_type(value_type)
+
+            def convert_dict(string_data):
+                dict_items = json.loads(string_data) if isinstance(string_data, str) else string_data
+                return {convert_key(key): convert_value(value) for key, value in dict_items.items()}
+
+            return convert_dict
+
+        if isinstance(data_type, type) and issubclass(data_type, BaseModel):
+
+            def convert_model(string_data):
+                if isinstance(string_data, str):
+                    return data_type.model_validate_json(string_data)
+                return BigtableUtils.str_convert_pydantic_field(string_data, data_type)
+
+            return convert_model
+
+        # 元组及不支持的类型走通用逻辑（不支持的类型在调用时抛出 TypeError）
+        return lambda string_data: BigtableUtils.str_convert_pydantic_field(string_data, data_type)
+
+    @staticmethod
+    def compile_str_convert_complex_type(expected_type: type) -> Callable[[Any], Any]:
+        """
+        按类型预编译 str_convert_complex_type，用于 JSON 解析后的元素转换；
+        元素的实际类型与预期不一致时回退到 str_convert_complex_type，保证行为一致
+        """
+
+        def convert_generic(item):
+            return BigtableUtils.str_convert_complex_type(item, expected_type)
+
+        if expected_type == Any:
+            return convert_generic
+
+        if isinstance(expected_type, type) and issubclass(expected_type, BaseModel):
+
+            def convert_model(item):
+                if isinstance(item, dict):
+                    return expected_type(**item)
+                return convert_generic(item)
+
+            return convert_model
+
+        if PydanticUtils.is_type_of_list(expected_type):
+            inner_type = get_args(expected_type)[0] if get_args(expected_type) else Any
+            convert_inner = BigtableUtils.compile_str_convert_complex_type(inner_type)
+
+            def convert_list(item):
+                if isinstance(item, list):
+                    return [convert_inner(i) for i in item]
+                return convert_generic(item)
+
+            return convert_list
+
+        if PydanticUtils.is_type_of_dict(expected_type):
+            key_type, value_type = get_args(expected_type) or (Any, Any)
+            convert_key = BigtableUtils.compile_str_convert_complex_type(key_type)
+            convert_value = BigtableUtils.compile_str_convert_complex_type(value_type)
+
+            def convert_dict(item):
+                if isinstance(item, dict):
+                    return {convert_key(k): convert_value(v) for k, v in item.items()}
+                return convert_generic(item)
+
+            return convert_dict
+
+        if expected_type in (int, float, str, bool):
+            convert_simple = BigtableUtils.compile_str_convert_pydantic_field(expected_type)
+
+            def convert_simple_item(item):
+                if isinstance(item, _CONTAINER_TYPES):
+                    return convert_generic(item)
+                return convert_simple(item)
+
+            return convert_simple_item
+
+        return convert_generic
@@ -0,0 +1,83 @@
+import hashlib
+import threading
+from typing import Optional
+
+from pydantic import BaseModel
+
+from favie_data_common.database.bigtable.bigtable_cache import LruTtlBigtableCache
+
+
+class BigtableWriteFingerprintStats(BaseModel):
+    rows_skipped: int = 0
+    cells_skipped: int = 0
+    cells_written: int = 0
+
+
+class BigtableWriteFingerprint:
+    """
+    记录每行最近一次写入的各列内容指纹（8 字节 blake2b），写入前过滤掉内容未变化的列，
+    所有列都未变化时整行跳过写入。
+
+    指纹保存在进程内的 LRU 缓存中并在 ttl_seconds 后过期；其他进程写入同一行时本地指纹不会感知，
+    因此只适用于该表由本进程（或按 rowkey 分区的单一写入方）写入的场景，ttl_seconds 限定了不一致的最长时间。
+    """
+
+    def __init__(self, *, max_rows: int = 100000, ttl_seconds: float = 3600):
+        """
+        max_rows : 最多保存指纹的行数
+        ttl_seconds : 指纹的有效期（秒），过期后下一次写入不跳过
+        """
+        self.__fingerprints = LruTtlBigtableCache(max_size=max_rows, ttl_seconds=ttl_seconds)
+        self.__lock = threading.Lock()
+        self.__stats = BigtableWriteFingerprintStats()
+
+    def filter_changed_cells(
+        self, row_key: str, cells: list[tuple[str, bytes, bytes]]
+    ) -> list[tuple[str, bytes, bytes]]:
+        """
+        row_key : 写入的 rowkey
+        cells : [(列族, 列名字节, 列值字节)]
+        return : 内容与上一次写入不同的 cell
+        """
+        hit, fingerprints = self.__fingerprints.get((row_key, None, None))
+        if not hit:
+            changed_cells = cells
+        else:
+            changed_cells = [cell for cell in cells if fingerprints.get((cell[0], cell[1])) != self.__digest(cell[2])]
+        with self.__lock:
+            self.__stats.cells_skipped += len(cells) - len(changed_cells)
+            self.__stats.cells_written += len(changed_cells)
+            if cells and not changed_cells:
+                self.__stats.rows_skipped += 1
+        return changed_cells
+
+    def record(self, row_key: str, cells: list[tuple[str, bytes, bytes]]):
+        """
+        写入成功后记录写入的 cell 指纹
+        """
+        if not cells:
+            return
+        digests = {
+            (column_family, column_qualifier): self.__digest(column_value)
+            for column_family, column_qualifier, column_value in cells
+        }
+        # 读取-合并-写回需要在锁内完成，否则同一行的并发 record 会互相覆盖对方的指纹
+        with self.__lock:
+            hit, fingerprints = self.__fingerprints.get((row_key, None, None))
+            fingerprints = {**fingerprints, **digests} if hit else digests
+            self.__fingerprints.put((row_key, None, None), fingerprints)
+
+    def invalidate(self, row_key: str):
+        """
+        删除行或列后需要失效，保证下一次写入不被跳过
+        """
+        with self.__lock:
+            self.__fingerprints.invalidate(row_key)
+
+    def stats(self) -> BigtableWriteFingerprintStats:
+        with self.__lock:
+            return self.__stats.model_copy()
+
+    @staticmethod
+    def __digest(column_value: Optional[bytes]) -> bytes:
+        return hashlib.blake2b(column_value, digest_size=8).digest()
@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from google.cloud.bigtable.row import DirectRow
+from google.cloud.bigtable.table import Table
+from pydantic import BaseModel
+
+
+class BigtableWriteError(Exception):
+    def __init__(self, row_key: bytes, status: Any = None, cause: Exception = None):
+        """
+        row_key : 写入失败的 rowkey
+        status : Bigtable 返回的 google.rpc.Status，请求整体失败时为空
+        cause : 请求整体失败时的异常
+        """
+        self.row_key = row_key
+        self.status = status
+        self.cause = cause
+        message = status.message if status is not None else repr(cause)
+        super().__init__(f"write row failed, row_key:{row_key}, error:{message}")
+
+
+class BigtableWritePipelineConfig(BaseModel):
+    # 缓冲的行数达到该值时发送
+    flush_count: int = 500
+    # 缓冲的 mutation 字节数达到该值时发送
+    flush_bytes: int = 5 * 1024 * 1024
+    # 缓冲中最早的行等待超过该时间（秒）时发送
+    flush_interval: float = 0.5
+    # 已提交未完成（缓冲中及发送中）的 mutation 字节数上限，超过时 mutate 阻塞等待
+    max_inflight_bytes: int = 64 * 1024 * 1024
+    # 并发发送的批次数
+    max_workers: int = 4
+
+
+class BigtableWritePipelineStats(BaseModel):
+    rows_written: int = 0
+    rows_failed: int = 0
+    batches: int = 0
+    inflight_bytes: int = 0
+
+
+class BigtableWritePipeline:
+    """
+    长期存在的写入管道：多次 mutate 提交的行在缓冲中合并，按行数、字节数或最大等待时间批量调用 mutate_rows，
+    在途数据超过 max_inflight_bytes 时对写入方反压；每行的写入结果通过 Future 及 on_failure 回调返回。
+    线程安全，可被多个线程共享。
+    """
+
+    def __init__(
+        self,
+        *,
+        table: Table,
+        config: BigtableWritePipelineConfig = None,
+        on_failure: Callable[[DirectRow, BigtableWriteError], None] = None,
+    ):
+        """
+        table : Bigtable 表
+        config : 管道配置，为空时使用默认配置
+        on_failure : 单行写入失败时的回调，在发送线程中调用
+        """
+        self.table = table
+        self.config = config or BigtableWritePipelineConfig()
+        self.on_failure = on_failure
+        self.logger = logging.getLogger(__name__)
+        self.__condition = threading.Condition()
+        # 缓冲中的 (行, Future, mutation 字节数)
+        self.__buffer: list[tuple[DirectRow, Future, int]] = []
+        self.__buffer_bytes = 0
+        self.__buffer_started_at = 0.0
+        self.__inflight_bytes = 0
+        self.__closed = False
+        self.__stats = BigtableWritePipelineStats()
+        self.__executor = ThreadPoolExecutor(max_workers=self.config.max_workers)
+        self.__flush_thread = threading.Thread(target=self.__flush_periodically, daemon=True)
+        self.__flush_thread.start()
+
+    def mutate(self, row: DirectRow) -> Future:
+        """
+        提交一行写入，在途数据超过上限时阻塞直到有批次完成
+
+        return : 写入完成时返回 google.rpc.Status，失败时抛出 BigtableWriteError
+        """
+        future = Future()
+        row_bytes = row.get_mutations_size()
+        with self.__condition:
+            # 单行超过上限时只在没有在途数据时放行，避免永久阻塞
+            while (
+                not self.__closed
+                and self.__inflight_bytes > 0
+                and self.__inflight_bytes + row_bytes > self.config.max_inflight_bytes
+            ):
+                self.__condition.wait()
+            # 等待期间管道可能已关闭，此时写入缓冲的行不会再被发送
+            if self.__closed:
+                raise RuntimeError("write pipeline is closed")
+            if not self.__buffer:
+                self.__buffer_started_at = time.monotonic()
+            self.__buffer.append((row, future, row_bytes))
+            self.__buffer_bytes += row_bytes
+            self.__inflight_bytes += row_bytes
+            batch = None
+            if len(self.__buffer) >= self.config.flush_count or self.__buffer_bytes >= self.config.flush_bytes:
+                batch = self.__take_buffer()
+        if batch:
+            self.__executor.submit(self.__send, batch)
+        return future
+
+    def mutate_rows(self, rows: list[DirectRow]) -> list[Future]:
+        return [self.mutate(row) for row in rows]
+
+    def flush(self):
+        """
+        发送缓冲中的行，并等待所有在途批次完成
+        """
+        with self.__condition:
+            batch = self.__take_buffer()
+        if batch:
+            self.__executor.submit(self.__send, batch)
+        with self.__condition:
+            while self.__inflight_bytes > 0:
+                self.__condition.wait()
+
+    def close(self):
+        """
+        先标记关闭，之后的 mutate 抛出 RuntimeError，再发送缓冲中剩余的行并等待所有在途批次完成
+        """
+        with self.__condition:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__condition.notify_all()
+        self.flush()
+        self.__flush_thread.join()
+        self.__executor.shutdown()
+
+    def stats(self) -> BigtableWritePipelineStats:
+        with self.__condition:
+            return self.__stats.model_copy(update={"inflight_bytes": self.__inflight_bytes})
+
+    def __take_buffer(self) -> Optional[list[tuple[DirectRow, Future, int]]]:
+        if not self.__buffer:
+            return None
+        batch = self.__buffer
+        self.__buffer = []
+        self.__buffer_bytes = 0
+        return batch
+
+    def __flush_periodically(self):
+        while True:
+            with self.__condition:
+                if self.__closed:
+                    return
+                self.__condition.wait(timeout=self.config.flush_interval)
+                batch = None
+                if self.__buffer and time.monotonic() - self.__buffer_started_at >= self.config.flush_interval:
+                    batch = self.__take_buffer()
+            if batch:
+                self.__executor.submit(self.__send, batch)
+
+    def __send(self, batch: list[tuple[DirectRow, Future, int]]):
+        rows = [row for row, _, _ in batch]
+        failed = 0
+        try:
+            statuses = self.table.mutate_rows(rows)
+            for (row, future, _), status in zip(batch, statuses):
+                if status.code == 0:
+                    future.set_result(status)
+                else:
+                    failed += 1
+                    self.__fail(row, future, BigtableWriteError(row.row_key, status=status))
+        except Exception as e:
+            failed = len(batch)
+            self.logger.error(f"write batch failed,rows:{len(batch)},error:{e}")
+            for row, future, _ in batch:
+                self.__fail(row, future, BigtableWriteError(row.row_key, cause=e))
+        finally:
+            with self.__condition:
+                self.__inflight_bytes -= sum(row_bytes for _, _, row_bytes in batch)
+                self.__stats.batches += 1
+                self.__stats.rows_written += len(batch) - failed
+                self.__stats.rows_failed += failed
+                self.__condition.notify_all()
+
+    def __fail(self, row: DirectRow, future: Future, error: BigtableWriteError):
+        future.set_exception(error)
+        if self.on_failure:
+            try:
+                self.on_failure(row, error)
+            except Exception as e:
+                self.logger.error(f"write failure callback failed,row_key:{row.row_key},error:{e}")
@@ -0,0 +1,234 @@
+import os
+import unittest
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from favie_data_common.database.bigtable.async_bigtable_repository import (
+    AsyncBigtableRepository,
+    AsyncBigtableSingleMapIndexRepository,
+)
+from favie_data_common.database.bigtable.bigtable_memory_table import InMemoryBigtableTableAsync
+from favie_data_common.database.bigtable.bigtable_repository import BigtableIndex, BigtableModelPage
+
+# 需要本地 Bigtable 模拟器：gcloud beta emulators bigtable start，并设置 BIGTABLE_EMULATOR_HOST=localhost:8086
+EMULATOR_HOST = os.environ.get("BIGTABLE_EMULATOR_HOST")
+PROJECT_ID = "favie-test-project"
+INSTANCE_ID = "favie-test-instance"
+TABLE_ID = "favie_async_test_table"
+INDEX_TABLE_ID = "favie_async_test_table_index"
+
+
+class Person(BaseModel):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    age: Optional[int] = None
+    city: Optional[str] = None
+    tags: Optional[List[str]] = None
+
+
+def gen_person_rowkey(person: Person):
+    return person.id
+
+
+def gen_person_index(person: Person):
+    return BigtableIndex(rowkey=person.id, index_key=person.city)
+
+
+def create_tables():
+    from google.cloud import bigtable
+
+    client = bigtable.Client(project=PROJECT_ID, admin=True)
+    instance = client.instance(INSTANCE_ID)
+    for table_id, column_families in [(TABLE_ID, ["main_cf", "new_cf"]), (INDEX_TABLE_ID, ["index_cf"])]:
+        table = instance.table(table_id)
+        if not table.exists():
+            table.create(column_families={column_family: None for column_family in column_families})
+        else:
+            table.truncate()
+    client.close()
+
+
+@unittest.skipUnless(EMULATOR_HOST, "BIGTABLE_EMULATOR_HOST is not set")
+class TestAsyncBigtableRepository(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+
+    async def asyncSetUp(self):
+        self.index_repository = AsyncBigtableSingleMapIndexRepository(
+            bigtable_project_id=PROJECT_ID,
+            bigtable_instance_id=INSTANCE_ID,
+            bigtable_index_table_id=INDEX_TABLE_ID,
+            index_cf="index_cf",
+            gen_index=gen_person_index,
+        )
+        self.repository = AsyncBigtableRepository(
+            bigtable_project_id=PROJECT_ID,
+            bigtable_instance_id=INSTANCE_ID,
+            bigtable_table_id=TABLE_ID,
+            model_class=Person,
+            gen_rowkey=gen_person_rowkey,
+            default_cf="main_cf",
+            cf_config={"city": "new_cf"},
+            bigtable_index=self.index_repository,
+        )
+
+    async def asyncTearDown(self):
+        await self.repository.close()
+        await self.index_repository.close()
+
+    async def test_save_and_read(self):
+        person = Person(id="A00001", name="Alice", age=30, city="hangzhou", tags=["a", "b"])
+        await self.repository.save_model(model=person)
+
+        self.assertEqual(await self.repository.read_model(row_key="A00001"), person)
+        self.assertEqual(
+            await self.repository.read_model(row_key="A00001", fields=["name", "city"]),
+            Person(name="Alice", city="hangzhou"),
+        )
+        self.assertIsNone(await self.repository.read_model(row_key="A99999"))
+
+    async def test_save_models_and_scan(self):
+        persons = [Person(id=f"B0000{i}", name=f"Bob{i}", city="beijing") for i in range(5)]
+        await self.repository.save_models(models=persons)
+
+        self.assertEqual(await self.repository.read_models(row_keys=["B00001", "B00003"]), [persons[1], persons[3]])
+        self.assertEqual(await self.repository.scan_models(rowkey_prefix="B0000"), persons)
+        self.assertEqual(len(await self.repository.scan_models(rowkey_prefix="B0000", limit=2)), 2)
+        self.assertEqual(
+            await self.repository.read_models(row_keys=["B00003", "B09999", "B00001"], chunk_size=1, aligned=True),
+            [persons[3], None, persons[1]],
+        )
+        self.assertEqual(
+            await self.repository.read_models(row_keys=["B00004", "B00000", "B09999"], chunk_size=2),
+            [persons[4], persons[0]],
+        )
+        self.assertEqual(await self.repository.read_models_map(row_keys=["B00002", "B09999"]), {"B00002": persons[2]})
+
+    async def test_scan_range(self):
+        persons = [Person(id=f"E.000{i}", name=f"Eve{i}") for i in range(5)]
+        await self.repository.save_models(models=persons + [Person(id="EX0001", name="Eve")])
+
+        # 前缀中的正则元字符按字面匹配
+        self.assertEqual(await self.repository.scan_models(rowkey_prefix="E.000"), persons)
+        self.assertEqual(await self.repository.scan_range(start_key="E.0001", end_key="E.0003"), persons[1:3])
+
+    async def test_iter_scan_models(self):
+        persons = [Person(id=f"D0000{i}", name=f"Dan{i}") for i in range(5)]
+        await self.repository.save_models(models=persons)
+
+        self.assertEqual([person async for person in self.repository.iter_scan_models(rowkey_prefix="D0000")], persons)
+        self.assertEqual(
+            [
+                person
+                async for person in self.repository.iter_scan_models(rowkey_prefix="D0000", continuation_token="D00002")
+            ],
+            persons[3:],
+        )
+        self.assertEqual(
+            [person async for person in self.repository.iter_read_models(row_keys=["D00004", "D00000"])],
+            [persons[0], persons[4]],
+        )
+
+    async def test_scan_page(self):
+        persons = [Person(id=f"F0000{i}", name=f"Fay{i}") for i in range(5)]
+        await self.repository.save_models(models=persons)
+
+        pages = []
+        continuation_token = None
+        while True:
+            page = await self.repository.scan_page(
+                rowkey_prefix="F0000", page_size=2, continuation_token=continuation_token
+            )
+            pages.append(page.models)
+            continuation_token = page.continuation_token
+            if not continuation_token:
+                break
+        self.assertEqual(pages, [persons[0:2], persons[2:4], persons[4:]])
+
+    async def test_query_and_delete(self):
+        person = Person(id="C00001", name="Carol", city="shanghai")
+        await self.repository.save_model(model=person)
+        self.assertEqual(await self.repository.query_models(index_key="shanghai"), [person])
+
+        await self.repository.delete_model(model=person)
+        self.assertIsNone(await self.repository.read_model(row_key="C00001"))
+        self.assertIsNone(await self.repository.query_models(index_key="shanghai"))
+
+
+class TestAsyncBigtableRepositoryInMemory(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.index_repository = AsyncBigtableSingleMapIndexRepository(
+            bigtable_project_id=PROJECT_ID,
+            bigtable_instance_id=INSTANCE_ID,
+            bigtable_index_table_id=INDEX_TABLE_ID,
+            index_cf="index_cf",
+            gen_index=gen_person_index,
+            table=InMemoryBigtableTableAsync(column_families=["index_cf"]),
+        )
+        self.repository = AsyncBigtableRepository(
+            bigtable_project_id=PROJECT_ID,
+            bigtable_instance_id=INSTANCE_ID,
+            bigtable_table_id=TABLE_ID,
+            model_class=Person,
+            gen_rowkey=gen_person_rowkey,
+            default_cf="main_cf",
+            cf_config={"city": "new_cf"},
+            bigtable_index=self.index_repository,
+            table=InMemoryBigtableTableAsync(column_families=["main_cf", "new_cf"]),
+        )
+
+    async def asyncTearDown(self):
+        await self.repository.close()
+        await self.index_repository.close()
+
+    async def test_read_with_version(self):
+        await self.repository.save_model(model=Person(id="V00001", name="v1", city="hangzhou"), version=100)
+        await self.repository.save_model(model=Person(id="V00001", name="v2", age=2, city="hangzhou"), version=200)
+
+        self.assertEqual(
+            await self.repository.read_model(row_key="V00001", version=100),
+            Person(id="V00001", name="v1", city="hangzhou"),
+        )
+        self.assertEqual(
+            await self.repository.read_model(row_key="V00001", version=200),
+            Person(id="V00001", name="v2", age=2, city="hangzhou"),
+        )
+        self.assertEqual(
+            await self.repository.read_model(row_key="V00001", version=200, fields=["name"]), Person(name="v2")
+        )
+        self.assertIsNone(await self.repository.read_model(row_key="V00001", version=150))
+        self.assertEqual(
+            await self.repository.read_models(row_keys=["V00001"], version=100),
+            [Person(id="V00001", name="v1", city="hangzhou")],
+        )
+        self.assertEqual(await self.repository.read_model(row_key="V00001", fields=["age"]), Person(age=2))
+
+    async def test_save_scan_and_query(self):
+        persons = [Person(id=f"M0000{i}", name=f"Max{i}", city="beijing") for i in range(3)]
+        await self.repository.save_models(models=persons)
+
+        self.assertEqual(await self.repository.scan_models(rowkey_prefix="M0000"), persons)
+        self.assertEqual(await self.repository.read_models_map(row_keys=["M00002", "M09999"]), {"M00002": persons[2]})
+        self.assertEqual(await self.repository.query_models(index_key="beijing"), [persons[2]])
+
+    async def test_scan_page(self):
+        persons = [Person(id=f"S0000{i}", name=f"Sam{i}", city="beijing") for i in range(3)]
+        await self.repository.save_models(models=persons)
+
+        page = await self.repository.scan_page(rowkey_prefix="S0000", page_size=2)
+        self.assertEqual(page.continuation_token, "S00001")
+        next_page = await self.repository.scan_page(
+            rowkey_prefix="S0000", page_size=2, continuation_token=page.continuation_token
+        )
+        self.assertEqual(
+            (page.models, next_page.models, next_page.continuation_token), (persons[:2], persons[2:], None)
+        )
+        # 空前缀与 scan_models 一致，不扫描整个表
+        self.assertEqual(await self.repository.scan_page(rowkey_prefix="", page_size=2), BigtableModelPage())
+        self.assertIsNone(await self.repository.scan_models(rowkey_prefix=""))
+
+
+if __name__ == "__main__":
+    unittest.main()
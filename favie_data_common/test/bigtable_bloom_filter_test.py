@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from favie_data_common.database.bigtable.bigtable_bloom_filter import BigtableBloomFilter
+
+
+class TestBigtableBloomFilter(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom_filter = BigtableBloomFilter(expected_items=1000, false_positive_rate=0.01)
+        keys = [f"https://example.com/product/{i}" for i in range(1000)]
+        bloom_filter.add_all(keys)
+        self.assertTrue(all(bloom_filter.might_contain(key) for key in keys))
+
+    def test_false_positive_rate(self):
+        bloom_filter = BigtableBloomFilter(expected_items=1000, false_positive_rate=0.01)
+        bloom_filter.add_all(f"key{i}" for i in range(1000))
+        false_positives = sum(bloom_filter.might_contain(f"absent{i}") for i in range(10000))
+        # 误判率应接近配置值，留出统计波动的余量
+        self.assertLess(false_positives / 10000, 0.03)
+
+        stats = bloom_filter.stats()
+        self.assertEqual(stats.items, 1000)
+        self.assertEqual(stats.lookups, 10000)
+        self.assertEqual(stats.negatives, 10000 - false_positives)
+        self.assertLess(stats.estimated_false_positive_rate, 0.03)
+
+    def test_record_false_positive(self):
+        bloom_filter = BigtableBloomFilter(expected_items=10)
+        bloom_filter.add("key1")
+        self.assertFalse(bloom_filter.might_contain("key2"))
+        bloom_filter.record_false_positive()
+        stats = bloom_filter.stats()
+        self.assertEqual((stats.negatives, stats.false_positives), (1, 1))
+        self.assertEqual(stats.observed_false_positive_rate, 0.5)
+
+    def test_save_and_load(self):
+        bloom_filter = BigtableBloomFilter(expected_items=100, false_positive_rate=0.001)
+        bloom_filter.add_all(["hangzhou", "beijing"])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.bloom")
+            bloom_filter.save(path)
+            for use_mmap in (True, False):
+                loaded = BigtableBloomFilter.load(path, false_positive_rate=0.001, use_mmap=use_mmap)
+                self.assertTrue(loaded.might_contain("hangzhou"))
+                self.assertTrue(loaded.might_contain("beijing"))
+                self.assertFalse(loaded.might_contain("shanghai"))
+                self.assertEqual(
+                    (loaded.size_bits, loaded.hash_count, loaded.items),
+                    (bloom_filter.size_bits, bloom_filter.hash_count, 2),
+                )
+                # mmap 为写时复制，增量加入不修改文件
+                loaded.add("shanghai")
+                self.assertTrue(loaded.might_contain("shanghai"))
+            self.assertFalse(BigtableBloomFilter.load(path).might_contain("shanghai"))
+
+            invalid_path = os.path.join(directory, "invalid.bloom")
+            with open(invalid_path, "wb") as file:
+                file.write(b"\x00" * 64)
+            with self.assertRaises(ValueError):
+                BigtableBloomFilter.load(invalid_path)
+
+    def test_invalid_config(self):
+        with self.assertRaises(ValueError):
+            BigtableBloomFilter(expected_items=0)
+        with self.assertRaises(ValueError):
+            BigtableBloomFilter(false_positive_rate=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
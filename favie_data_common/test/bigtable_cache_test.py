@@ -0,0 +1,60 @@
+import time
+import unittest
+
+from favie_data_common.database.bigtable.bigtable_cache import LruTtlBigtableCache
+
+
+class TestLruTtlBigtableCache(unittest.TestCase):
+    def test_get_and_put(self):
+        cache = LruTtlBigtableCache(max_size=10, ttl_seconds=60)
+        self.assertEqual(cache.get(("row1", None, None)), (False, None))
+        cache.put(("row1", None, None), "model1")
+        cache.put(("row2", ("name",), None), None)
+        self.assertEqual(cache.get(("row1", None, None)), (True, "model1"))
+        # 不存在的行同样缓存
+        self.assertEqual(cache.get(("row2", ("name",), None)), (True, None))
+        self.assertEqual(cache.get(("row2", None, None)), (False, None))
+
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.size), (2, 2, 2))
+
+    def test_lru_eviction(self):
+        cache = LruTtlBigtableCache(max_size=2, ttl_seconds=60)
+        cache.put(("row1", None, None), "model1")
+        cache.put(("row2", None, None), "model2")
+        # 访问 row1 后 row2 成为最久未访问的条目
+        cache.get(("row1", None, None))
+        cache.put(("row3", None, None), "model3")
+
+        self.assertEqual(cache.get(("row2", None, None)), (False, None))
+        self.assertEqual(cache.get(("row1", None, None)), (True, "model1"))
+        self.assertEqual(cache.get(("row3", None, None)), (True, "model3"))
+        self.assertEqual(cache.stats().evictions, 1)
+
+    def test_ttl_expiration(self):
+        cache = LruTtlBigtableCache(max_size=10, ttl_seconds=0.01)
+        cache.put(("row1", None, None), "model1")
+        time.sleep(0.02)
+        self.assertEqual(cache.get(("row1", None, None)), (False, None))
+        self.assertEqual(cache.stats().expirations, 1)
+        self.assertEqual(cache.stats().size, 0)
+
+    def test_invalidate(self):
+        cache = LruTtlBigtableCache(max_size=10, ttl_seconds=60)
+        cache.put(("row1", None, None), "model1")
+        cache.put(("row1", ("name",), None), "model1_name")
+        cache.put(("row1", None, 1700000000), "model1_v1")
+        cache.put(("row2", None, None), "model2")
+        cache.invalidate("row1")
+
+        self.assertEqual(cache.get(("row1", None, None)), (False, None))
+        self.assertEqual(cache.get(("row1", ("name",), None)), (False, None))
+        self.assertEqual(cache.get(("row2", None, None)), (True, "model2"))
+        self.assertEqual(cache.stats().invalidations, 3)
+
+        cache.clear()
+        self.assertEqual(cache.stats().size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
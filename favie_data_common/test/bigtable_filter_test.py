@@ -0,0 +1,143 @@
+import unittest
+from datetime import datetime, timezone
+from typing import Optional
+
+from google.cloud.bigtable.data import row_filters as data_row_filters
+from google.cloud.bigtable.row_filters import ConditionalRowFilter, RowKeyRegexFilter, TimestampRangeFilter
+from pydantic import BaseModel
+
+from favie_data_common.database.bigtable.bigtable_filter import BigtableFilterCompiler, BigtableFilters
+from favie_data_common.database.bigtable.bigtable_memory_table import InMemoryBigtableTable
+from favie_data_common.database.bigtable.bigtable_model_codec import BigtableModelCodec
+
+
+class Product(BaseModel):
+    id: Optional[str] = None
+    brand: Optional[str] = None
+    price: Optional[float] = None
+    updated_at: Optional[str] = None
+
+
+codec = BigtableModelCodec(model_class=Product, default_cf="main_cf", cf_config={"price": "price_cf"})
+
+
+class TestBigtableFilterCompiler(unittest.TestCase):
+    def test_field_filters(self):
+        compiler = BigtableFilterCompiler(model_codec=codec)
+        compiled = compiler.compile([BigtableFilters.equals("brand", "a.b"), BigtableFilters.absent("price")])
+        self.assertEqual(len(compiled), 2)
+        self.assertTrue(all(isinstance(row_filter, ConditionalRowFilter) for row_filter in compiled))
+
+        equals_pb = compiled[0].to_pb().condition
+        predicate = [row_filter for row_filter in equals_pb.predicate_filter.chain.filters]
+        self.assertEqual(predicate[0].family_name_regex_filter, "^main_cf$")
+        self.assertEqual(predicate[1].column_qualifier_regex_filter, b"^brand$")
+        self.assertEqual(predicate[2].cells_per_column_limit_filter, 1)
+        self.assertEqual(predicate[3].value_range_filter.start_value_closed, b"a.b")
+        self.assertEqual(predicate[3].value_range_filter.end_value_closed, b"a.b")
+        self.assertTrue(equals_pb.true_filter.pass_all_filter)
+        self.assertTrue(equals_pb.false_filter.block_all_filter)
+
+        absent_pb = compiled[1].to_pb().condition
+        self.assertEqual(absent_pb.predicate_filter.chain.filters[0].family_name_regex_filter, "^price_cf$")
+        self.assertTrue(absent_pb.true_filter.block_all_filter)
+        self.assertTrue(absent_pb.false_filter.pass_all_filter)
+
+    def test_range_and_timestamp(self):
+        compiler = BigtableFilterCompiler(model_codec=codec)
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        compiled = compiler.compile(
+            [BigtableFilters.timestamp_range(start=start), BigtableFilters.range("updated_at", start="2024-01-01")]
+        )
+        # 字段条件在时间戳过滤之前，谓词读取完整的行
+        self.assertIsInstance(compiled[0], ConditionalRowFilter)
+        self.assertIsInstance(compiled[1], TimestampRangeFilter)
+        value_range = compiled[0].to_pb().condition.predicate_filter.chain.filters[3].value_range_filter
+        self.assertEqual(value_range.start_value_closed, b"2024-01-01")
+        self.assertFalse(value_range.end_value_open)
+
+        with self.assertRaises(ValueError):
+            compiler.compile([BigtableFilters.range("price", start=10)])
+        with self.assertRaises(ValueError):
+            compiler.compile([BigtableFilters.present("unknown")])
+        with self.assertRaises(ValueError):
+            BigtableFilters.equals("brand", None)
+
+    def test_cache_and_raw_filters(self):
+        compiler = BigtableFilterCompiler(model_codec=codec)
+        raw_filter = RowKeyRegexFilter(b"B.*")
+        filters = [raw_filter, BigtableFilters.regex("brand", "ni.*")]
+        compiled = compiler.compile(filters)
+        self.assertIs(compiled[-1], raw_filter)
+        self.assertEqual(len(filters), 2)
+        # 同一字段复用编译好的列谓词，过滤值在每次调用时绑定
+        other = compiler.compile([BigtableFilters.regex("brand", "ad.*")])[0]
+        self.assertIs(other.base_filter.filters[0], compiled[0].base_filter.filters[0])
+        self.assertEqual(other.to_pb().condition.predicate_filter.chain.filters[3].value_regex_filter, b"ad.*")
+        self.assertEqual(compiled[0].to_pb().condition.predicate_filter.chain.filters[3].value_regex_filter, b"ni.*")
+        # 列谓词按字段缓存，不同的过滤值不会产生新的缓存项
+        for i in range(100):
+            compiled_value = compiler.compile([BigtableFilters.equals("brand", f"brand{i}")])[0]
+            self.assertIs(compiled_value.base_filter.filters[1], compiled[0].base_filter.filters[1])
+        self.assertEqual(compiler.compile([raw_filter]), [raw_filter])
+        self.assertEqual(compiler.compile(None), [])
+
+    def test_async_api(self):
+        compiler = BigtableFilterCompiler(model_codec=codec, async_api=True)
+        compiled = compiler.compile(
+            [BigtableFilters.present("brand"), BigtableFilters.timestamp_range(end=datetime.now(timezone.utc))]
+        )
+        self.assertIsInstance(compiled[0], data_row_filters.ConditionalRowFilter)
+        self.assertIsInstance(compiled[1], data_row_filters.TimestampRangeFilter)
+
+    def test_projection(self):
+        compiler = BigtableFilterCompiler(model_codec=codec)
+        table = InMemoryBigtableTable(column_families=["main_cf", "price_cf"])
+        row = table.direct_row(b"p1")
+        row.set_cell("main_cf", b"brand", b"nike")
+        row.set_cell("main_cf", b"brand_id", b"1")
+        row.set_cell("price_cf", b"price", b"9.9")
+        row.set_cell("price_cf", b"price_history", b"19.9")
+        row.set_cell("price_cf", b"brand", b"other")
+        row.commit()
+
+        # 列名完全匹配，且只在字段所在的列族中匹配
+        cells = table.read_row(b"p1", filter_=compiler.build_row_filter(version=None, fields=["brand", "price"])).cells
+        self.assertEqual(
+            {family: set(columns) for family, columns in cells.items()}, {"main_cf": {b"brand"}, "price_cf": {b"price"}}
+        )
+        cells = table.read_row(b"p1", filter_=compiler.build_row_filter(version=None, fields=None)).cells
+        self.assertEqual(len(cells["main_cf"]) + len(cells["price_cf"]), 5)
+
+        # 同一组字段复用编译结果
+        self.assertIs(compiler.compile_projection(["brand", "price"]), compiler.compile_projection(["brand", "price"]))
+
+    def test_projection_with_migration(self):
+        migration_codec = BigtableModelCodec(
+            model_class=Product,
+            default_cf="main_cf",
+            cf_config={"price": "price_cf"},
+            cf_migration={"price": ("main_cf", "price_cf")},
+        )
+        projection = BigtableFilterCompiler(model_codec=migration_codec).compile_projection(["id", "price"])
+        family_filters = [row_filter.to_pb().chain.filters for row_filter in projection.filters]
+        self.assertEqual(
+            [
+                (filters[0].family_name_regex_filter, filters[1].column_qualifier_regex_filter)
+                for filters in family_filters
+            ],
+            [("^main_cf$", b"^(?:id|price)$"), ("^price_cf$", b"^price$")],
+        )
+
+    def test_async_version_filter(self):
+        compiler = BigtableFilterCompiler(model_codec=codec, async_api=True)
+        row_filter = compiler.build_row_filter(version=100, fields=["brand"])
+        self.assertIsInstance(row_filter, data_row_filters.RowFilterChain)
+        self.assertEqual(
+            row_filter.filters[0]._to_dict(),
+            {"timestamp_range_filter": {"start_timestamp_micros": 100000000, "end_timestamp_micros": 101000000}},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
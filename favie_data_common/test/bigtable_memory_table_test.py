@@ -0,0 +1,206 @@
+import unittest
+from datetime import datetime, timezone
+from typing import Optional
+
+from google.cloud.bigtable.row_filters import (
+    CellsColumnLimitFilter,
+    ColumnQualifierRegexFilter,
+    ConditionalRowFilter,
+    PassAllFilter,
+    RowFilterChain,
+    TimestampRange,
+    TimestampRangeFilter,
+    ValueRangeFilter,
+)
+from google.cloud.bigtable.row_set import RowSet
+from pydantic import BaseModel
+
+from favie_data_common.database.bigtable.bigtable_filter import BigtableFilters
+from favie_data_common.database.bigtable.bigtable_memory_table import InMemoryBigtableTable
+from favie_data_common.database.bigtable.bigtable_repository import (
+    BigtableIndex,
+    BigtableIndexRepository,
+    BigtableRepository,
+)
+
+
+class Person(BaseModel):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    age: Optional[int] = None
+    city: Optional[str] = None
+
+
+def gen_person_index(person: Person):
+    return BigtableIndex(rowkey=person.id, index_key=person.city)
+
+
+def timestamp(seconds: int) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+class TestInMemoryBigtableTable(unittest.TestCase):
+    def setUp(self):
+        self.table = InMemoryBigtableTable(column_families=["cf"])
+        rows = []
+        for i in range(5):
+            row = self.table.direct_row(f"k{i}".encode())
+            row.set_cell("cf", b"name", f"n{i}".encode(), timestamp=timestamp(100))
+            row.set_cell("cf", b"name", f"old{i}".encode(), timestamp=timestamp(50))
+            rows.append(row)
+        self.assertTrue(all(status.code == 0 for status in self.table.mutate_rows(rows)))
+
+    def test_versions_and_filters(self):
+        row = self.table.read_row(b"k1")
+        self.assertEqual([cell.value for cell in row.cells["cf"][b"name"]], [b"n1", b"old1"])
+        row = self.table.read_row(b"k1", filter_=CellsColumnLimitFilter(1))
+        self.assertEqual([cell.value for cell in row.cells["cf"][b"name"]], [b"n1"])
+        row = self.table.read_row(
+            b"k1", filter_=TimestampRangeFilter(TimestampRange(start=timestamp(50), end=timestamp(51)))
+        )
+        self.assertEqual([cell.value for cell in row.cells["cf"][b"name"]], [b"old1"])
+        # 正则为完整匹配
+        self.assertIsNone(self.table.read_row(b"k1", filter_=ColumnQualifierRegexFilter(b"nam")))
+        self.assertIsNone(self.table.read_row(b"missing"))
+
+    def test_read_rows_by_range(self):
+        row_set = RowSet()
+        row_set.add_row_range_from_keys(start_key=b"k1", end_key=b"k3")
+        row_set.add_row_key(b"k4")
+        self.assertEqual([row.row_key for row in self.table.read_rows(row_set=row_set)], [b"k1", b"k2", b"k4"])
+        self.assertEqual([row.row_key for row in self.table.read_rows(limit=2)], [b"k0", b"k1"])
+        value_filter = RowFilterChain(
+            filters=[CellsColumnLimitFilter(1), ValueRangeFilter(b"n2", b"n3", inclusive_end=False)]
+        )
+        self.assertEqual([row.row_key for row in self.table.read_rows(filter_=value_filter)], [b"k2"])
+        self.assertEqual(self.table.sample_row_keys()[-1].row_key, b"")
+
+    def test_mutations(self):
+        row = self.table.row(b"k0")
+        row.delete_cell("cf", b"name", time_range=TimestampRange(start=timestamp(50), end=timestamp(51)))
+        row.commit()
+        self.assertEqual(len(self.table.read_row(b"k0").cells["cf"][b"name"]), 1)
+        row = self.table.row(b"k0")
+        row.delete()
+        row.commit()
+        self.assertIsNone(self.table.read_row(b"k0"))
+        self.assertEqual(self.table.row_count(), 4)
+
+        row = self.table.direct_row(b"k9")
+        row.set_cell("unknown_cf", b"name", b"value")
+        self.assertEqual(self.table.mutate_rows([row])[0].code, 5)
+
+    def test_conditional_row(self):
+        condition = ConditionalRowFilter(ValueRangeFilter(b"n1", b"n1", inclusive_end=True), PassAllFilter(True))
+        row = self.table.conditional_row(b"k1", filter_=condition)
+        row.set_cell("cf", b"name", b"matched", state=True)
+        row.set_cell("cf", b"name", b"unmatched", state=False)
+        self.assertTrue(row.commit())
+        cells = self.table.read_row(b"k1", filter_=CellsColumnLimitFilter(1)).cells
+        self.assertEqual(cells["cf"][b"name"][0].value, b"matched")
+
+
+class TestBigtableRepositoryInMemory(unittest.TestCase):
+    def setUp(self):
+        self.index_repository = BigtableIndexRepository(
+            bigtable_project_id="local",
+            bigtable_instance_id="local",
+            bigtable_index_table_id="person_index",
+            index_cf="index_cf",
+            gen_index=gen_person_index,
+            table=InMemoryBigtableTable("person_index", column_families=["index_cf"]),
+        )
+        self.repository = BigtableRepository(
+            bigtable_project_id="local",
+            bigtable_instance_id="local",
+            bigtable_table_id="person",
+            model_class=Person,
+            gen_rowkey=lambda person: person.id,
+            default_cf="main_cf",
+            cf_config={"city": "new_cf"},
+            bigtable_index=self.index_repository,
+            table=InMemoryBigtableTable("person", column_families=["main_cf", "new_cf"]),
+        )
+
+    def tearDown(self):
+        self.repository.close()
+        self.index_repository.close()
+
+    def test_save_read_and_query(self):
+        persons = [
+            Person(id=f"P{i:03d}", name=f"name{i}", age=i, city="hangzhou" if i % 2 else "beijing") for i in range(6)
+        ]
+        self.repository.save_models(models=persons)
+
+        self.assertEqual(self.repository.read_model(row_key="P001"), persons[1])
+        self.assertEqual(self.repository.read_model(row_key="P001", fields=["name"]), Person(name="name1"))
+        self.assertEqual(self.repository.read_models(row_keys=["P004", "P000"]), [persons[0], persons[4]])
+        self.assertEqual(self.repository.scan_models(rowkey_prefix="P00", limit=2), persons[:2])
+        self.assertEqual(self.repository.query_models(index_key="hangzhou"), [persons[1], persons[3], persons[5]])
+        self.assertEqual(
+            self.repository.scan_models(rowkey_prefix="P", filters=[BigtableFilters.equals("city", "beijing")]),
+            [persons[0], persons[2], persons[4]],
+        )
+
+        page = self.repository.query_models_page(index_key="hangzhou", page_size=2)
+        next_page = self.repository.query_models_page(
+            index_key="hangzhou", page_size=2, continuation_token=page.continuation_token
+        )
+        self.assertEqual(page.models + next_page.models, [persons[1], persons[3], persons[5]])
+        self.assertIsNone(next_page.continuation_token)
+
+    def test_versions_and_upsert(self):
+        self.repository.save_model(model=Person(id="P100", name="v1"), version=100)
+        self.repository.save_model(model=Person(id="P100", name="v2"), version=200)
+        self.assertEqual(self.repository.read_model(row_key="P100", version=100).name, "v1")
+        self.assertEqual(self.repository.read_model(row_key="P100").name, "v2")
+
+        # 已有更新的版本时条件写入不生效
+        self.assertFalse(
+            self.repository.upsert_model(
+                model=Person(id="P100", name="stale"), save_fields=["name"], version=150, condition_field="name"
+            )
+        )
+        self.assertTrue(
+            self.repository.upsert_model(
+                model=Person(id="P100", name="v3"), save_fields=["name"], version=300, condition_field="name"
+            )
+        )
+        self.assertEqual(self.repository.read_model(row_key="P100").name, "v3")
+
+    def test_history(self):
+        for version, age in [(100, 1), (200, 2), (300, 3)]:
+            self.repository.save_model(model=Person(id="P300", name=f"v{version}", age=age), version=version)
+        self.repository.save_model(model=Person(id="P301", name="other"), version=100)
+        self.repository.upsert_model(model=Person(id="P300", city="hangzhou"), save_fields=["city"], version=250)
+
+        history = self.repository.read_model_history(row_key="P300")
+        self.assertEqual([version.version for version in history.versions], [100, 200, 250, 300])
+        self.assertEqual(history.versions[2].model, Person(city="hangzhou"))
+        self.assertEqual([item.value for item in history.timelines["age"]], [1, 2, 3])
+
+        history = self.repository.read_model_history(row_key="P300", versions=2, fields=["name"])
+        self.assertEqual([item.value for item in history.timelines["name"]], ["v200", "v300"])
+        self.assertEqual(set(history.timelines), {"name"})
+
+        histories = self.repository.read_models_history(
+            row_keys=["P300", "P301", "missing"], start_version=100, end_version=200
+        )
+        self.assertEqual(set(histories), {"P300", "P301"})
+        self.assertEqual([version.model.name for version in histories["P300"].versions], ["v100"])
+
+        with self.assertRaises(ValueError):
+            self.repository.read_model_history(row_key="P300", versions=0)
+        with self.assertRaises(ValueError):
+            self.repository.read_model_history(row_key="P300", start_version=200, end_version=100)
+
+    def test_delete(self):
+        person = Person(id="P200", name="Bob", city="shanghai")
+        self.repository.save_model(model=person)
+        self.repository.delete_model(model=person)
+        self.assertIsNone(self.repository.read_model(row_key="P200"))
+        self.assertIsNone(self.repository.query_models(index_key="shanghai"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from typing import Optional
+
+from pydantic import BaseModel
+
+from favie_data_common.database.bigtable.bigtable_memory_table import InMemoryBigtableTable
+from favie_data_common.database.bigtable.bigtable_metrics import (
+    BigtableMetricsFanout,
+    BigtableMetricsHooks,
+    BigtableMetricsRegistry,
+)
+from favie_data_common.database.bigtable.bigtable_repository import BigtableRepository
+
+
+class Person(BaseModel):
+    id: Optional[str] = None
+    name: Optional[str] = None
+
+
+class TestBigtableMetricsRegistry(unittest.TestCase):
+    def test_counter_and_histogram(self):
+        registry = BigtableMetricsRegistry(buckets=(0.01, 0.1))
+        labels = {"table": "product", "method": "read_model"}
+        registry.increment("bigtable_rows_read_total", 2, {"table": "product"})
+        registry.increment("bigtable_rows_read_total", 3, {"table": "product"})
+        for value in (0.005, 0.01, 0.05, 1):
+            registry.observe("bigtable_method_seconds", value, labels)
+
+        self.assertEqual(registry.get_counter("bigtable_rows_read_total", {"table": "product"}), 5)
+        self.assertEqual(registry.get_counter("bigtable_rows_read_total", {"table": "other"}), 0)
+        histogram = registry.get_histogram("bigtable_method_seconds", {"method": "read_model", "table": "product"})
+        # 分桶上界包含在内
+        self.assertEqual(histogram.bucket_counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 1.065)
+
+    def test_prometheus_text(self):
+        registry = BigtableMetricsRegistry(buckets=(0.1,))
+        registry.increment("bigtable_rows_read_total", 1, {"table": 'a"b'})
+        registry.observe("bigtable_method_seconds", 0.05, {"method": "scan_models"})
+        registry.register_collector(lambda: [("bigtable_cache_hits", 7, {"table": "product"})])
+
+        text = registry.to_prometheus_text()
+        self.assertIn("# TYPE bigtable_rows_read_total counter", text)
+        self.assertIn('bigtable_rows_read_total{table="a\\"b"} 1', text)
+        self.assertIn("# TYPE bigtable_cache_hits gauge", text)
+        self.assertIn('bigtable_cache_hits{table="product"} 7', text)
+        self.assertIn("# TYPE bigtable_method_seconds histogram", text)
+        self.assertIn('bigtable_method_seconds_bucket{method="scan_models",le="0.1"} 1', text)
+        self.assertIn('bigtable_method_seconds_bucket{method="scan_models",le="+Inf"} 1', text)
+        self.assertIn('bigtable_method_seconds_count{method="scan_models"} 1', text)
+        self.assertEqual(BigtableMetricsRegistry().to_prometheus_text(), "")
+
+
+class TestBigtableMetricsHooks(unittest.TestCase):
+    def test_hooks_and_fanout(self):
+        observed = []
+        incremented = []
+        gauges = []
+        hooks = BigtableMetricsHooks(
+            on_observe=lambda name, value, labels: observed.append((name, value, labels)),
+            on_increment=lambda name, value, labels: incremented.append((name, value, labels)),
+            on_gauge=lambda name, value, labels: gauges.append((name, value, labels)),
+        )
+        registry = BigtableMetricsRegistry()
+        fanout = BigtableMetricsFanout([registry, hooks])
+        fanout.observe("bigtable_method_seconds", 0.2, {"method": "read_model"})
+        fanout.increment("bigtable_rows_read_total")
+        fanout.register_collector(lambda: [("bigtable_read_batches", 3, {})])
+        hooks.collect()
+
+        self.assertEqual(observed, [("bigtable_method_seconds", 0.2, {"method": "read_model"})])
+        self.assertEqual(incremented, [("bigtable_rows_read_total", 1, {})])
+        self.assertEqual(gauges, [("bigtable_read_batches", 3, {})])
+        self.assertEqual(registry.get_counter("bigtable_rows_read_total"), 1)
+        registry.collect()
+        self.assertEqual(registry.get_gauge("bigtable_read_batches"), 3)
+
+
+class TestBigtableRepositoryMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = BigtableMetricsRegistry()
+        self.repository = BigtableRepository(
+            bigtable_project_id="local",
+            bigtable_instance_id="local",
+            bigtable_table_id="person",
+            model_class=Person,
+            gen_rowkey=lambda person: person.id,
+            default_cf="main_cf",
+            table=InMemoryBigtableTable("person", column_families=["main_cf"]),
+            metrics=self.registry,
+        )
+
+    def tearDown(self):
+        self.repository.close()
+
+    def assert_mutated(self, rows: int):
+        labels = {"table": "person"}
+        self.assertEqual(self.registry.get_counter("bigtable_rows_mutated_total", labels), rows)
+        mutation_bytes = self.registry.get_counter("bigtable_mutation_bytes_total", labels)
+        self.assertGreater(mutation_bytes, self.last_bytes)
+        self.last_bytes = mutation_bytes
+
+    def test_single_row_writes(self):
+        # 单行写入、条件写入、删除列与删除行同样记录写入的行数与字节数
+        self.last_bytes = 0
+        self.repository.save_model(model=Person(id="P1", name="a"))
+        self.assert_mutated(1)
+        self.assertTrue(self.repository.upsert_model(model=Person(id="P1", name="b"), version=100))
+        self.assert_mutated(2)
+        self.assertTrue(
+            self.repository.upsert_model(model=Person(id="P2", name="c"), version=200, condition_field="name")
+        )
+        self.assert_mutated(3)
+        self.repository.delete_fields_sync(model=Person(id="P1"), deleted_fields=[("main_cf", "name")])
+        self.assert_mutated(4)
+        self.repository.delete_model(model=Person(id="P1"))
+        self.assert_mutated(5)
+        self.repository.save_models(models=[Person(id="P3", name="a"), Person(id="P4", name="b")])
+        self.assert_mutated(7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import unittest
+from typing import List, Optional
+
+from google.cloud.bigtable.data.row import Cell as DataCell
+from google.cloud.bigtable.data.row import Row as DataRow
+from google.cloud.bigtable.row_data import Cell, PartialRowData
+from pydantic import BaseModel
+
+from favie_data_common.database.bigtable.bigtable_model_codec import BigtableModelCodec
+
+
+class Color(BaseModel):
+    red: Optional[int] = None
+    green: Optional[int] = None
+    blue: Optional[int] = None
+
+
+class Product(BaseModel):
+    id: Optional[str] = None
+    price: Optional[float] = None
+    stock: Optional[int] = None
+    on_sale: Optional[bool] = None
+    colors: Optional[List[Color]] = None
+    main_color: Optional[Color] = None
+    city: Optional[str] = None
+    favorite: Optional[str] = None
+
+
+class UpperDeserializer:
+    def deserialize(self, value: str):
+        return value.upper()
+
+
+def build_row(cells: dict[str, dict[str, bytes]]) -> PartialRowData:
+    row = PartialRowData(b"row1")
+    row._cells = {
+        column_family: {qualifier.encode(): [Cell(value, 0)] for qualifier, value in columns.items()}
+        for column_family, columns in cells.items()
+    }
+    return row
+
+
+class TestBigtableModelCodec(unittest.TestCase):
+    def test_convert_row_to_dict(self):
+        codec = BigtableModelCodec(model_class=Product)
+        row = build_row(
+            {
+                "main_cf": {
+                    "id": b"p1",
+                    "price": b"9.5",
+                    "stock": b"3",
+                    "on_sale": b"True",
+                    "colors": b'[{"red":1,"green":2,"blue":3}]',
+                    "unknown": b"ignored",
+                }
+            }
+        )
+        model_dict, migration_status = codec.convert_row_to_dict(row)
+        self.assertEqual(
+            model_dict,
+            {"id": "p1", "price": 9.5, "stock": 3, "on_sale": True, "colors": [Color(red=1, green=2, blue=3)]},
+        )
+        self.assertEqual(migration_status, set())
+
+    def test_convert_row_to_dict_with_cf_migration(self):
+        codec = BigtableModelCodec(
+            model_class=Product,
+            cf_migration={"city": ("main_cf", "new_cf"), "favorite": ("main_cf", BigtableModelCodec.NULL_CF)},
+        )
+        row = build_row(
+            {
+                "main_cf": {"id": b"p1", "city": b"beijing", "favorite": b"tea"},
+                "new_cf": {"city": b"hangzhou"},
+            }
+        )
+        model_dict, migration_status = codec.convert_row_to_dict(row)
+        self.assertEqual(model_dict, {"id": "p1", "city": "hangzhou"})
+        self.assertEqual(migration_status, {"city", "favorite"})
+
+        # 只有旧列族数据时读取旧列族，不需要清理
+        model_dict, migration_status = codec.convert_row_to_dict(build_row({"main_cf": {"city": b"beijing"}}))
+        self.assertEqual(model_dict, {"city": "beijing"})
+        self.assertEqual(migration_status, set())
+
+    def test_convert_data_api_row_to_dict(self):
+        # data API 返回的 Row 为 cell 列表，同一列的 cell 按时间倒序
+        codec = BigtableModelCodec(model_class=Product, cf_migration={"city": ("main_cf", "new_cf")})
+        row = DataRow(
+            b"p1",
+            [
+                DataCell(b"beijing", b"p1", "main_cf", b"city", 1000),
+                DataCell(b"p1", b"p1", "main_cf", b"id", 2000),
+                DataCell(b"3", b"p1", "main_cf", b"stock", 2000),
+                DataCell(b"2", b"p1", "main_cf", b"stock", 1000),
+                DataCell(b"hangzhou", b"p1", "new_cf", b"city", 2000),
+            ],
+        )
+        model_dict, migration_status = codec.convert_row_to_dict(row)
+        self.assertEqual(model_dict, {"id": "p1", "stock": 3, "city": "hangzhou"})
+        self.assertEqual(migration_status, {"city"})
+
+    def test_deserializer_config(self):
+        codec = BigtableModelCodec(model_class=Product, derializer_config={"city": UpperDeserializer()})
+        model_dict, _ = codec.convert_row_to_dict(build_row({"main_cf": {"city": b"beijing", "stock": b"1"}}))
+        self.assertEqual(model_dict, {"city": "BEIJING", "stock": 1})
+
+        codec = BigtableModelCodec(model_class=Product, model_define_deserializer=True)
+        model_dict, _ = codec.convert_row_to_dict(build_row({"main_cf": {"stock": b"1"}}))
+        self.assertEqual(model_dict, {"stock": "1"})
+
+    def test_convert_model_to_cells(self):
+        codec = BigtableModelCodec(
+            model_class=Product,
+            default_cf="main_cf",
+            cf_config={"city": "new_cf"},
+            cf_migration={"favorite": ("main_cf", BigtableModelCodec.NULL_CF)},
+        )
+        product = Product(
+            id="p1",
+            price=9.5,
+            on_sale=False,
+            colors=[Color(red=1)],
+            main_color=Color(red=1, blue=2),
+            city="beijing",
+            favorite="tea",
+        )
+        self.assertEqual(
+            codec.convert_model_to_cells(product),
+            [
+                ("main_cf", b"id", b"p1"),
+                ("main_cf", b"price", b"9.5"),
+                ("main_cf", b"on_sale", b"False"),
+                ("main_cf", b"colors", b'[{"red":1}]'),
+                ("main_cf", b"main_color", b'{"red":1,"blue":2}'),
+                ("new_cf", b"city", b"beijing"),
+            ],
+        )
+        self.assertEqual(
+            codec.convert_model_to_cells(product, save_cfs={"new_cf"}),
+            [("new_cf", b"city", b"beijing")],
+        )
+        self.assertEqual(
+            codec.convert_model_to_cells(product, exclude_fields=["price", "colors", "main_color", "on_sale", "city"]),
+            [("main_cf", b"id", b"p1")],
+        )
+
+        # 写入计划按参数组合缓存
+        plan = codec.get_encode_plan(Product, {"new_cf"}, None)
+        self.assertIs(codec.get_encode_plan(Product, ["new_cf"], None), plan)
+
+        # 编码结果可以被解码计划还原
+        row = PartialRowData(b"p1")
+        row._cells = {}
+        for column_family, qualifier, value in codec.convert_model_to_cells(product):
+            row._cells.setdefault(column_family, {})[qualifier] = [Cell(value, 0)]
+        model_dict, _ = codec.convert_row_to_dict(row)
+        self.assertEqual(Product(**model_dict), product.model_copy(update={"favorite": None}))
+
+    def test_convert_row_to_versions(self):
+        codec = BigtableModelCodec(
+            model_class=Product,
+            default_cf="main_cf",
+            cf_config={"city": "new_cf"},
+            cf_migration={"city": ("main_cf", "new_cf"), "favorite": ("main_cf", BigtableModelCodec.NULL_CF)},
+        )
+        row = PartialRowData(b"row1")
+        row._cells = {
+            "main_cf": {
+                b"stock": [Cell(b"2", 2000000), Cell(b"1", 1000000)],
+                b"city": [Cell(b"old", 2000000), Cell(b"hangzhou", 1000000)],
+                b"favorite": [Cell(b"tea", 1000000)],
+            },
+            "new_cf": {b"city": [Cell(b"beijing", 2000000)]},
+        }
+        # 同一时间戳新列族优先，已迁移到 NULL_CF 的字段忽略
+        self.assertEqual(
+            codec.convert_row_to_versions(row),
+            {2000000: {"stock": 2, "city": "beijing"}, 1000000: {"stock": 1, "city": "hangzhou"}},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from favie_data_common.database.bigtable.bigtable_read_coalescer import ReadBatcher, SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        single_flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_read():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return "model"
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            leader = executor.submit(single_flight.do, "row1", slow_read)
+            started.wait()
+            followers = [executor.submit(single_flight.do, "row1", slow_read) for _ in range(7)]
+            # 等待所有跟随者加入后再完成读取
+            deadline = time.monotonic() + 5
+            while single_flight.shared_count < 7 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            release.set()
+            results = [leader.result()] + [follower.result() for follower in followers]
+
+        self.assertEqual(results, ["model"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(single_flight.shared_count, 7)
+        # 请求结束后再次调用会重新执行
+        self.assertEqual(single_flight.do("row1", lambda: "new_model"), "new_model")
+
+    def test_exception_is_shared(self):
+        single_flight = SingleFlight()
+
+        def failed_read():
+            raise RuntimeError("read failed")
+
+        with self.assertRaises(RuntimeError):
+            single_flight.do("row1", failed_read)
+        self.assertEqual(single_flight.do("row1", lambda: "model"), "model")
+
+
+class TestReadBatcher(unittest.TestCase):
+    def test_requests_in_window_are_batched(self):
+        fetched = []
+
+        def fetch(row_keys, fields, version):
+            fetched.append(sorted(row_keys))
+            return {row_key: f"model_{row_key}" for row_key in row_keys if row_key != "missing"}
+
+        batcher = ReadBatcher(fetch=fetch, window_seconds=0.05, max_batch_size=100)
+        row_keys = ["row1", "row2", "row3", "missing"]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda row_key: batcher.load(row_key, None, None), row_keys))
+
+        self.assertEqual(results, ["model_row1", "model_row2", "model_row3", None])
+        self.assertEqual(fetched, [["missing", "row1", "row2", "row3"]])
+
+    def test_max_batch_size(self):
+        fetched = []
+
+        def fetch(row_keys, fields, version):
+            fetched.append(len(row_keys))
+            return {row_key: row_key for row_key in row_keys}
+
+        batcher = ReadBatcher(fetch=fetch, window_seconds=0.2, max_batch_size=2)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda row_key: batcher.load(row_key, None, None), ["a", "b", "c", "d"]))
+
+        self.assertEqual(results, ["a", "b", "c", "d"])
+        self.assertEqual(sum(fetched), 4)
+        self.assertTrue(all(size <= 2 for size in fetched))
+
+    def test_different_fields_are_not_batched(self):
+        fetched = []
+
+        def fetch(row_keys, fields, version):
+            fetched.append(fields)
+            return {row_key: fields for row_key in row_keys}
+
+        batcher = ReadBatcher(fetch=fetch, window_seconds=0.05)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(batcher.load, "row1", ("name",), None)
+            second = executor.submit(batcher.load, "row1", None, None)
+            self.assertEqual(first.result(), ("name",))
+            self.assertIsNone(second.result())
+        self.assertEqual(len(fetched), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
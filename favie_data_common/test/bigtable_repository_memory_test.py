@@ -0,0 +1,812 @@
+import threading
+import unittest
+from datetime import datetime, timezone
+from typing import Optional
+
+from google.cloud.bigtable.batcher import MutationsBatchError
+from google.rpc.status_pb2 import Status
+from pydantic import BaseModel
+
+from favie_data_common.database.bigtable.bigtable_bloom_filter import BigtableBloomFilter
+from favie_data_common.database.bigtable.bigtable_cache import LruTtlBigtableCache
+from favie_data_common.database.bigtable.bigtable_memory_table import InMemoryBigtableTable
+from favie_data_common.database.bigtable.bigtable_repository import (
+    BigtableIndex,
+    BigtableIndexRepository,
+    BigtableModelPage,
+    BigtableRepository,
+    BigtableSingleMapIndexRepository,
+)
+from favie_data_common.database.bigtable.bigtable_utils import BigtableUtils
+from favie_data_common.database.bigtable.bigtable_write_pipeline import BigtableWriteError, BigtableWritePipelineConfig
+
+
+class Person(BaseModel):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    age: Optional[int] = None
+    city: Optional[str] = None
+
+
+def gen_city_index(person: Person) -> Optional[BigtableIndex]:
+    return BigtableIndex(rowkey=person.id, index_key=person.city) if person.city else None
+
+
+class RecordingTable(InMemoryBigtableTable):
+    """
+    记录每次 read_rows 的 rowkey 范围与 rowkey 数量及写入的 rowkey，fail_start_key 对应的分片读取时抛出异常
+    """
+
+    def __init__(self, *args, fail_start_key: bytes = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_start_key = fail_start_key
+        self.scanned_ranges = []
+        self.read_key_counts = []
+        self.mutated_row_keys = []
+        self.lock = threading.Lock()
+
+    def read_rows(self, *args, row_set=None, **kwargs):
+        if row_set is not None and row_set.row_keys:
+            with self.lock:
+                self.read_key_counts.append(len(row_set.row_keys))
+        if row_set is not None and row_set.row_ranges:
+            row_range = row_set.row_ranges[0]
+            with self.lock:
+                self.scanned_ranges.append((row_range.start_key, row_range.end_key))
+            if self.fail_start_key is not None and row_range.start_key == self.fail_start_key:
+                raise RuntimeError("shard failed")
+        return super().read_rows(*args, row_set=row_set, **kwargs)
+
+    def mutate_rows(self, rows, *args, **kwargs):
+        with self.lock:
+            self.mutated_row_keys.extend(row.row_key.decode() for row in rows)
+        return super().mutate_rows(rows, *args, **kwargs)
+
+
+def build_repository(table: InMemoryBigtableTable = None, **kwargs) -> BigtableRepository:
+    kwargs.setdefault("default_cf", "main_cf")
+    return BigtableRepository(
+        bigtable_project_id="local",
+        bigtable_instance_id="local",
+        bigtable_table_id="person",
+        model_class=Person,
+        gen_rowkey=lambda person: person.id,
+        table=table if table is not None else InMemoryBigtableTable("person", column_families=["main_cf"]),
+        **kwargs,
+    )
+
+
+def build_index_repository(
+    table_id: str = "person_city", table: InMemoryBigtableTable = None, **kwargs
+) -> BigtableIndexRepository:
+    kwargs.setdefault("gen_index", gen_city_index)
+    return BigtableIndexRepository(
+        bigtable_project_id="local",
+        bigtable_instance_id="local",
+        bigtable_index_table_id=table_id,
+        index_cf="index_cf",
+        table=table if table is not None else InMemoryBigtableTable(table_id, column_families=["index_cf"]),
+        **kwargs,
+    )
+
+
+def index_row_keys(index_repository: BigtableIndexRepository) -> list[str]:
+    return list(index_repository.index_table.iter_row_keys())
+
+
+class TestBigtableRepositoryScan(unittest.TestCase):
+    def setUp(self):
+        self.repository = build_repository()
+        self.persons = [Person(id=f"P{i:03d}", name=f"name{i}") for i in range(5)]
+        self.repository.save_models(models=self.persons + [Person(id="Q000", name="other")])
+
+    def tearDown(self):
+        self.repository.close()
+
+    def test_iter_scan_pages(self):
+        pages = list(self.repository.iter_scan_pages(rowkey_prefix="P", page_size=2))
+        self.assertEqual([page.models for page in pages], [self.persons[0:2], self.persons[2:4], self.persons[4:]])
+        self.assertEqual([page.continuation_token for page in pages], ["P001", "P003", None])
+
+        # 行数正好是 page_size 的整数倍时最后一页的 continuation_token 为空
+        pages = list(self.repository.iter_scan_pages(rowkey_prefix="P", page_size=5))
+        self.assertEqual(len(pages), 1)
+        self.assertIsNone(pages[0].continuation_token)
+
+        pages = list(self.repository.iter_scan_pages(rowkey_prefix="P", page_size=2, limit=3))
+        self.assertEqual([page.models for page in pages], [self.persons[0:2], self.persons[2:3]])
+        self.assertEqual(list(self.repository.iter_scan_pages(rowkey_prefix="", page_size=2)), [])
+        with self.assertRaises(ValueError):
+            list(self.repository.iter_scan_pages(rowkey_prefix="P", page_size=0))
+
+    def test_scan_page(self):
+        page = self.repository.scan_page(rowkey_prefix="P", page_size=3)
+        self.assertEqual(page.continuation_token, "P002")
+        next_page = self.repository.scan_page(
+            rowkey_prefix="P", page_size=3, continuation_token=page.continuation_token
+        )
+        self.assertEqual(
+            (page.models, next_page.models, next_page.continuation_token), (self.persons[:3], self.persons[3:], None)
+        )
+        # 行数正好是 page_size 时没有下一页
+        self.assertIsNone(self.repository.scan_page(rowkey_prefix="P", page_size=5).continuation_token)
+        # 空前缀与 scan_models、iter_scan_pages 一致，不扫描整个表
+        self.assertEqual(self.repository.scan_page(rowkey_prefix="", page_size=10), BigtableModelPage())
+        self.assertIsNone(self.repository.scan_models(rowkey_prefix=""))
+        with self.assertRaises(ValueError):
+            self.repository.scan_page(rowkey_prefix="", page_size=0)
+
+    def test_iter_scan_pages_stop_and_resume(self):
+        pages = self.repository.iter_scan_pages(rowkey_prefix="P", page_size=2)
+        first_page = next(pages)
+        pages.close()
+        self.assertEqual(first_page.models, self.persons[0:2])
+
+        # 从提前结束时的 continuation_token 继续扫描
+        resumed = list(
+            self.repository.iter_scan_pages(
+                rowkey_prefix="P", page_size=2, continuation_token=first_page.continuation_token
+            )
+        )
+        self.assertEqual([page.models for page in resumed], [self.persons[2:4], self.persons[4:]])
+
+
+class TestBigtableRepositoryParallelScan(unittest.TestCase):
+    def test_hashed_shards(self):
+        table = RecordingTable("person", column_families=["main_cf"])
+        repository = build_repository(table)
+        persons = [Person(id=BigtableUtils.gen_hash_rowkey(f"p{i}"), name=f"name{i}") for i in range(50)]
+        repository.save_models(models=persons)
+
+        scanned = list(repository.parallel_scan(shards=4, hashed_rowkey=True))
+        self.assertEqual(sorted(scanned, key=lambda person: person.id), sorted(persons, key=lambda person: person.id))
+        shard_keys = [key.encode() for key in BigtableUtils.gen_hash_shard_keys(4)]
+        self.assertEqual(
+            sorted(table.scanned_ranges, key=lambda row_range: row_range[0] or b""),
+            list(zip([None, *shard_keys], [*shard_keys, None])),
+        )
+
+    def test_sample_key_shards_and_prefix(self):
+        table = RecordingTable("person", column_families=["main_cf"])
+        repository = build_repository(table)
+        persons = [Person(id=f"A{i:04d}", name=f"name{i}") for i in range(350)]
+        repository.save_models(models=persons + [Person(id="B0000", name="other")])
+
+        scanned = list(repository.parallel_scan(shards=3))
+        self.assertEqual(len(scanned), 351)
+        # 内存表每 100 行一个 sample，350 行均匀抽取 2 个分界点
+        self.assertEqual(len(table.scanned_ranges), 3)
+
+        table.scanned_ranges.clear()
+        scanned = list(repository.parallel_scan(rowkey_prefix="A01", shards=4))
+        self.assertEqual(sorted(person.id for person in scanned), [f"A{i:04d}" for i in range(100, 200)])
+        self.assertTrue(all(start >= b"A01" and end <= b"A02" for start, end in table.scanned_ranges if start and end))
+
+    def test_limit(self):
+        repository = build_repository()
+        repository.save_models(models=[Person(id=BigtableUtils.gen_hash_rowkey(f"p{i}")) for i in range(50)])
+        self.assertEqual(len(list(repository.parallel_scan(shards=4, hashed_rowkey=True, limit=7))), 7)
+        self.assertEqual(len(list(repository.parallel_scan(shards=4, hashed_rowkey=True, buffer_size=1, limit=3))), 3)
+        with self.assertRaises(ValueError):
+            list(repository.parallel_scan(shards=0))
+
+    def test_worker_exception_stops_scan(self):
+        shard_keys = BigtableUtils.gen_hash_shard_keys(4)
+        table = RecordingTable("person", column_families=["main_cf"], fail_start_key=shard_keys[1].encode())
+        repository = build_repository(table)
+        repository.save_models(models=[Person(id=BigtableUtils.gen_hash_rowkey(f"p{i}")) for i in range(50)])
+
+        with self.assertRaisesRegex(RuntimeError, "shard failed"):
+            list(repository.parallel_scan(shards=4, hashed_rowkey=True))
+
+
+class TestBigtableRepositoryReadModels(unittest.TestCase):
+    def setUp(self):
+        self.table = RecordingTable("person", column_families=["main_cf"])
+        self.repository = build_repository(self.table)
+        self.persons = {f"P{i}": Person(id=f"P{i}", name=f"name{i}", age=i) for i in range(5)}
+        self.repository.save_models(models=list(self.persons.values()))
+
+    def tearDown(self):
+        self.repository.close()
+
+    def test_read_models_order(self):
+        row_keys = ["P3", "P0", "P4", "P1"]
+        # 不分批时按 Bigtable rowkey 顺序返回
+        self.assertEqual(
+            self.repository.read_models(row_keys=row_keys), [self.persons[key] for key in sorted(row_keys)]
+        )
+        self.assertEqual(self.table.read_key_counts, [4])
+
+        # 分批时按 row_keys 的顺序返回
+        self.table.read_key_counts.clear()
+        models = self.repository.read_models(row_keys=row_keys, chunk_size=3)
+        self.assertEqual(models, [self.persons[key] for key in row_keys])
+        self.assertEqual(sorted(self.table.read_key_counts), [1, 3])
+
+        models = self.repository.read_models(row_keys=row_keys, chunk_size=1, fields=["name"])
+        self.assertEqual([model.name for model in models], [self.persons[key].name for key in row_keys])
+        self.assertTrue(all(model.age is None for model in models))
+        with self.assertRaises(ValueError):
+            self.repository.read_models(row_keys=row_keys, chunk_size=0)
+
+    def test_read_models_aligned_with_missing_and_duplicate_keys(self):
+        row_keys = ["P2", "X1", "P0", "P2", "X2"]
+        for chunk_size in [None, 1, 2]:
+            models = self.repository.read_models(row_keys=row_keys, chunk_size=chunk_size, aligned=True)
+            self.assertEqual(models, [self.persons["P2"], None, self.persons["P0"], self.persons["P2"], None])
+
+        # 非对齐时去重并跳过不存在的 rowkey
+        self.table.read_key_counts.clear()
+        self.assertEqual(
+            self.repository.read_models(row_keys=row_keys, chunk_size=2), [self.persons["P2"], self.persons["P0"]]
+        )
+        self.assertEqual(sum(self.table.read_key_counts), 4)
+        self.assertIsNone(self.repository.read_models(row_keys=["X1", "X2"], chunk_size=1))
+        self.assertEqual(self.repository.read_models(row_keys=["X1"], aligned=True), [None])
+
+    def test_read_models_map(self):
+        models = self.repository.read_models_map(row_keys=["P1", "X1", "P3", "P1"], chunk_size=2)
+        self.assertEqual(models, {"P1": self.persons["P1"], "P3": self.persons["P3"]})
+        self.assertEqual(self.repository.read_models_map(row_keys=[]), {})
+        self.assertEqual(self.repository.read_models_map(row_keys=["X1"]), {})
+        with self.assertRaises(ValueError):
+            self.repository.read_models_map(row_keys=["P1"], chunk_size=-1)
+
+
+class FailingTable(InMemoryBigtableTable):
+    """
+    rowkey 以 fail 开头的行返回错误状态且不写入
+    """
+
+    def mutate_rows(self, rows, *args, **kwargs):
+        ok_rows = [row for row in rows if not row.row_key.startswith(b"fail")]
+        ok_statuses = iter(super().mutate_rows(ok_rows, *args, **kwargs))
+        return [
+            Status(code=13, message="internal") if row.row_key.startswith(b"fail") else next(ok_statuses)
+            for row in rows
+        ]
+
+
+class TestBigtableRepositoryWriteErrors(unittest.TestCase):
+    def test_failed_rows_raise(self):
+        cache = LruTtlBigtableCache(max_size=100, ttl_seconds=60)
+        repository = build_repository(FailingTable("person", column_families=["main_cf"]), cache=cache)
+        repository.save_models(models=[Person(id="P1", name="old")])
+        self.assertEqual(repository.read_model(row_key="P1").name, "old")
+
+        with self.assertRaises(MutationsBatchError) as context:
+            repository.save_models(models=[Person(id="P1", name="new"), Person(id="fail1", name="x")])
+        self.assertEqual(len(context.exception.exc), 1)
+        # 其余行已写入，缓存同样失效
+        self.assertEqual(repository.read_model(row_key="P1").name, "new")
+        self.assertIsNone(repository.read_model(row_key="fail1"))
+
+        with self.assertRaises(MutationsBatchError):
+            repository.delete_models(models=[Person(id="P1"), Person(id="fail2")])
+        self.assertIsNone(repository.read_model(row_key="P1"))
+        repository.close()
+
+    def test_index_written_after_data(self):
+        index_repository = build_index_repository()
+        repository = build_repository(
+            FailingTable("person", column_families=["main_cf"]), bigtable_index=index_repository
+        )
+        # 数据写入失败时不写入索引行
+        with self.assertRaises(BigtableWriteError):
+            repository.save_model(model=Person(id="fail1", city="hz"))
+        with self.assertRaises(MutationsBatchError):
+            repository.save_models(models=[Person(id="P1", city="hz"), Person(id="fail2", city="hz")])
+        self.assertEqual(index_row_keys(index_repository), [])
+        repository.save_models(models=[Person(id="P1", city="hz")])
+        self.assertEqual(index_row_keys(index_repository), ["hz#P1"])
+        with self.assertRaises(BigtableWriteError):
+            repository.delete_model(model=Person(id="fail1", city="hz"))
+        repository.close()
+
+        # 写入管道只写入成功的行的索引，返回的 Future 在索引写入后完成
+        repository = build_repository(
+            FailingTable("person", column_families=["main_cf"]),
+            bigtable_index=index_repository,
+            write_pipeline_config=BigtableWritePipelineConfig(flush_count=10, flush_interval=60),
+        )
+        futures = repository.save_models(models=[Person(id="P2", city="sh"), Person(id="fail3", city="sh")])
+        self.assertEqual(index_row_keys(index_repository), ["hz#P1"])
+        repository.flush()
+        self.assertEqual(futures[0].result(timeout=5).code, 0)
+        self.assertIsInstance(futures[1].exception(timeout=5), BigtableWriteError)
+        self.assertEqual(index_row_keys(index_repository), ["hz#P1", "sh#P2"])
+        repository.close()
+        index_repository.close()
+
+
+class TestBigtableRepositoryWritePipeline(unittest.TestCase):
+    def test_save_and_delete_through_pipeline(self):
+        repository = build_repository(
+            write_pipeline_config=BigtableWritePipelineConfig(flush_count=3, flush_interval=60)
+        )
+        persons = [Person(id=f"P{i}", name=f"name{i}") for i in range(5)]
+        futures = repository.save_models(models=persons)
+        self.assertEqual(len(futures), 5)
+        # 满一批的行已发送，剩余的行在 flush 时发送
+        self.assertEqual([future.result(timeout=5).code for future in futures[:3]], [0, 0, 0])
+        repository.flush()
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(repository.read_models(row_keys=[person.id for person in persons]), persons)
+
+        futures = repository.delete_models(models=persons[:2])
+        repository.flush()
+        self.assertEqual([future.result().code for future in futures], [0, 0])
+        self.assertEqual(repository.read_models(row_keys=[person.id for person in persons]), persons[2:])
+
+        # close 发送剩余缓冲后不再接受写入
+        futures = repository.save_models(models=[Person(id="P9", name="name9")])
+        repository.close()
+        self.assertEqual(futures[0].result(timeout=5).code, 0)
+        self.assertEqual(repository.read_model(row_key="P9").name, "name9")
+        with self.assertRaises(RuntimeError):
+            repository.save_models(models=[Person(id="P10")])
+
+
+class TestBigtableRepositoryUpsert(unittest.TestCase):
+    def setUp(self):
+        self.index_repository = build_index_repository(index_fields=["city"])
+        self.repository = build_repository(bigtable_index=self.index_repository, diff_index=True)
+        self.repository.save_models(
+            models=[Person(id="P1", name="a", age=1, city="hz"), Person(id="P2", name="b", age=2, city="hz")]
+        )
+
+    def tearDown(self):
+        self.repository.close()
+        self.index_repository.close()
+
+    def test_upsert_models_unconditional(self):
+        self.assertEqual(
+            self.repository.upsert_models(
+                models=[Person(id="P1", name="a2", age=10), Person(id="P3", name="c", age=None)], save_fields=["name"]
+            ),
+            [True, True],
+        )
+        # 只写入 save_fields 中的字段，其他列保持不变
+        self.assertEqual(
+            self.repository.read_models(row_keys=["P1", "P3"]),
+            [Person(id="P1", name="a2", age=1, city="hz"), Person(name="c")],
+        )
+        # 值为 None 的字段不写入
+        self.repository.upsert_model(model=Person(id="P2", name=None, age=20))
+        self.assertEqual(self.repository.read_model(row_key="P2"), Person(id="P2", name="b", age=20, city="hz"))
+        # 写入的字段不影响索引时索引行不变
+        self.assertEqual(index_row_keys(self.index_repository), ["hz#P1", "hz#P2"])
+
+    def test_upsert_moves_index(self):
+        self.repository.upsert_model(model=Person(id="P1", city="sh"), save_fields=["city"])
+        self.assertEqual(index_row_keys(self.index_repository), ["hz#P2", "sh#P1"])
+        self.assertEqual(self.repository.query_models(index_key="sh"), [Person(id="P1", name="a", age=1, city="sh")])
+        self.assertEqual(self.repository.query_models(index_key="hz"), [Person(id="P2", name="b", age=2, city="hz")])
+
+        self.repository.upsert_models(
+            models=[Person(id="P2", city="bj"), Person(id="P4", name="d", city="bj")], save_fields=["id", "city"]
+        )
+        self.assertEqual(index_row_keys(self.index_repository), ["bj#P2", "bj#P4", "sh#P1"])
+        self.assertEqual(self.repository.read_model(row_key="P4"), Person(id="P4", city="bj"))
+
+    def test_conditional_upsert_index(self):
+        self.repository.save_model(model=Person(id="P5", name="e", city="hz"), version=100)
+        self.assertFalse(
+            self.repository.upsert_model(
+                model=Person(id="P5", city="sh"), save_fields=["city"], version=50, condition_field="city"
+            )
+        )
+        # 条件不满足未写入时索引不变
+        self.assertIn("hz#P5", index_row_keys(self.index_repository))
+        self.assertEqual(
+            self.repository.upsert_models(
+                models=[Person(id="P5", city="sh")], save_fields=["city"], version=200, condition_field="city"
+            ),
+            [True],
+        )
+        self.assertEqual(index_row_keys(self.index_repository), ["hz#P1", "hz#P2", "sh#P5"])
+
+    def test_conditional_upsert_filter(self):
+        # 列族名可以包含 .，未转义时会匹配其他列族
+        table = InMemoryBigtableTable("person", column_families=["main.cf", "mainxcf"])
+        repository = build_repository(table, default_cf="main.cf", cf_config={"age": "mainxcf"})
+        row = table.direct_row(b"P9")
+        row.set_cell("mainxcf", b"name", b"newer", timestamp=datetime.fromtimestamp(300, tz=timezone.utc))
+        row.commit()
+        self.assertTrue(
+            repository.upsert_model(
+                model=Person(id="P9", name="v2"), save_fields=["name"], version=200, condition_field="name"
+            )
+        )
+        self.assertEqual(repository.read_model(row_key="P9", fields=["name"]).name, "v2")
+
+        # 条件字段为 None 时不会写入条件列，之后的版本检查失效，直接拒绝
+        with self.assertRaises(ValueError):
+            repository.upsert_model(model=Person(id="P9", age=1), version=400, condition_field="name")
+        self.assertIsNone(repository.read_model(row_key="P9").age)
+        repository.close()
+
+
+class TestBigtableRepositoryDiffIndex(unittest.TestCase):
+    def setUp(self):
+        self.index_table = RecordingTable("person_city", column_families=["index_cf"])
+        # index_fields 只列出 city，gen_index 依赖的 id 取自写入的模型
+        self.index_repository = build_index_repository(table=self.index_table, index_fields=["city"])
+        self.repository = build_repository(bigtable_index=self.index_repository, diff_index=True)
+        self.repository.save_models(models=[Person(id="P1", name="a", city="hz"), Person(id="P2", name="b", city="hz")])
+        self.index_table.mutated_row_keys.clear()
+
+    def tearDown(self):
+        self.repository.close()
+        self.index_repository.close()
+
+    def test_move(self):
+        self.repository.save_model(model=Person(id="P1", name="a", city="sh"))
+        self.assertEqual(index_row_keys(self.index_repository), ["hz#P2", "sh#P1"])
+        self.assertEqual(sorted(self.index_table.mutated_row_keys), ["hz#P1", "sh#P1"])
+
+        self.repository.save_models(models=[Person(id="P1", city="bj"), Person(id="P2", city="bj")])
+        self.assertEqual(index_row_keys(self.index_repository), ["bj#P1", "bj#P2"])
+        self.assertEqual(self.repository.query_models(index_key="bj", fields=["city"]), [Person(city="bj")] * 2)
+
+    def test_delete(self):
+        # 传入的模型只有 id 时按已存储的 city 删除索引行
+        self.repository.delete_model(model=Person(id="P1"))
+        self.assertEqual(index_row_keys(self.index_repository), ["hz#P2"])
+        self.repository.delete_models(models=[Person(id="P2")])
+        self.assertEqual(index_row_keys(self.index_repository), [])
+        self.assertIsNone(self.repository.query_models(index_key="hz"))
+
+    def test_unchanged_save(self):
+        self.repository.save_models(models=[Person(id="P1", name="a2", city="hz"), Person(id="P2", city="hz")])
+        # 索引行不变时不写入也不删除
+        self.assertEqual(self.index_table.mutated_row_keys, [])
+        self.assertEqual(index_row_keys(self.index_repository), ["hz#P1", "hz#P2"])
+        self.assertEqual(self.repository.read_model(row_key="P1").name, "a2")
+
+    def test_partial_save(self):
+        # city 为 None 时不写入，行中保留 hz，索引行也应保留
+        self.repository.save_model(model=Person(id="P1", name="b"))
+        self.repository.save_models(models=[Person(id="P2", age=3)])
+        self.repository.save_model(model=Person(id="P1", city="sh"), exclude_fields=["city"])
+        self.assertEqual(self.index_table.mutated_row_keys, [])
+        self.assertEqual(index_row_keys(self.index_repository), ["hz#P1", "hz#P2"])
+        self.assertEqual(self.repository.read_model(row_key="P1").city, "hz")
+        self.assertEqual([person.id for person in self.repository.query_models(index_key="hz")], ["P1", "P2"])
+
+
+class TestBigtableRepositoryNamedIndexes(unittest.TestCase):
+    def setUp(self):
+        self.city_index = build_index_repository("person_city")
+        self.name_index = build_index_repository(
+            "person_name", gen_index=lambda person: BigtableIndex(rowkey=person.id, index_key=person.name)
+        )
+        self.repository = build_repository(
+            bigtable_index=self.city_index, bigtable_indexes={"name": self.name_index}, diff_index=True
+        )
+        self.persons = [
+            Person(id="P1", name="alice", city="hz"),
+            Person(id="P2", name="bob", city="hz"),
+            Person(id="P3", name="alice", city="sh"),
+        ]
+        self.repository.save_models(models=self.persons)
+
+    def tearDown(self):
+        self.repository.close()
+        self.city_index.close()
+        self.name_index.close()
+
+    def test_write_fan_out(self):
+        self.assertEqual(index_row_keys(self.city_index), ["hz#P1", "hz#P2", "sh#P3"])
+        self.assertEqual(index_row_keys(self.name_index), ["alice#P1", "alice#P3", "bob#P2"])
+
+        self.repository.save_model(model=Person(id="P2", name="carol", city="hz"))
+        self.assertEqual(index_row_keys(self.city_index), ["hz#P1", "hz#P2", "sh#P3"])
+        self.assertEqual(index_row_keys(self.name_index), ["alice#P1", "alice#P3", "carol#P2"])
+
+        self.repository.delete_model(model=self.persons[0])
+        self.assertEqual(index_row_keys(self.city_index), ["hz#P2", "sh#P3"])
+        self.assertEqual(index_row_keys(self.name_index), ["alice#P3", "carol#P2"])
+
+    def test_query_by_index_name(self):
+        self.assertEqual(self.repository.query_models(index_key="hz"), self.persons[:2])
+        self.assertEqual(
+            self.repository.query_models(index_key="alice", index="name"), [self.persons[0], self.persons[2]]
+        )
+        self.assertEqual(
+            self.repository.query_models(index_key="bob", index="name", fields=["city"]), [Person(city="hz")]
+        )
+        # 索引 key 只在对应的索引中查询
+        self.assertIsNone(self.repository.query_models(index_key="alice"))
+        self.assertIsNone(self.repository.query_models(index_key="hz", index="name"))
+        # 未配置的索引名返回空
+        self.assertIsNone(self.repository.query_models(index_key="hz", index="missing"))
+        self.assertEqual(
+            self.repository.query_models_batch(index_keys=["alice", "bob"], index="name"),
+            {"alice": [self.persons[0], self.persons[2]], "bob": [self.persons[1]]},
+        )
+
+
+class TestBigtableRepositoryCoveringIndex(unittest.TestCase):
+    def setUp(self):
+        self.table = RecordingTable("person", column_families=["main_cf"])
+        self.index_table = RecordingTable("person_city", column_families=["index_cf"])
+        self.index_repository = build_index_repository(
+            table=self.index_table, index_fields=["city"], model_class=Person, covering_fields=["name"]
+        )
+        self.repository = build_repository(self.table, bigtable_index=self.index_repository, diff_index=True)
+        self.repository.save_models(
+            models=[Person(id="P1", name="a", age=1, city="hz"), Person(id="P2", name="b", age=2, city="hz")]
+        )
+        self.table.read_key_counts.clear()
+        self.table.scanned_ranges.clear()
+
+    def tearDown(self):
+        self.repository.close()
+        self.index_repository.close()
+
+    def test_covered_fields_read_from_index(self):
+        self.assertTrue(self.index_repository.covers(["name"]))
+        self.assertEqual(
+            self.repository.query_models(index_key="hz", fields=["name"]), [Person(name="a"), Person(name="b")]
+        )
+        self.assertEqual(
+            self.repository.query_models_batch(index_keys=["hz", "sh"], fields=["name"]),
+            {"hz": [Person(name="a"), Person(name="b")], "sh": []},
+        )
+        # 覆盖的字段直接由索引行返回，不读取主表
+        self.assertEqual(self.table.read_key_counts, [])
+
+    def test_uncovered_fields_fall_back(self):
+        self.assertFalse(self.index_repository.covers(["name", "age"]))
+        self.assertFalse(self.index_repository.covers(None))
+        self.assertEqual(
+            self.repository.query_models(index_key="hz", fields=["name", "age"]),
+            [Person(name="a", age=1), Person(name="b", age=2)],
+        )
+        self.assertEqual(
+            self.repository.query_models(index_key="hz"),
+            [Person(id="P1", name="a", age=1, city="hz"), Person(id="P2", name="b", age=2, city="hz")],
+        )
+        # 指定 version 时索引行不能代表该版本的数据，同样读取主表
+        self.repository.query_models(index_key="hz", fields=["name"], version=2**31)
+        self.assertEqual(self.table.read_key_counts, [2, 2, 2])
+
+    def test_covered_value_change_rewrites_index(self):
+        self.index_table.mutated_row_keys.clear()
+        self.repository.save_model(model=Person(id="P1", name="a2", age=1, city="hz"))
+        # index_key 不变，覆盖字段变化时重写同一索引行
+        self.assertEqual(self.index_table.mutated_row_keys, ["hz#P1"])
+        self.assertEqual(index_row_keys(self.index_repository), ["hz#P1", "hz#P2"])
+        self.assertEqual(
+            self.repository.query_models(index_key="hz", fields=["name"]), [Person(name="a2"), Person(name="b")]
+        )
+
+        # 非覆盖字段变化时不重写索引行
+        self.index_table.mutated_row_keys.clear()
+        self.repository.save_model(model=Person(id="P2", name="b", age=20, city="hz"))
+        self.assertEqual(self.index_table.mutated_row_keys, [])
+
+
+class TestBigtableRepositoryQueryBatch(unittest.TestCase):
+    def setUp(self):
+        self.table = RecordingTable("person", column_families=["main_cf"])
+        self.index_repository = build_index_repository(
+            "person_name",
+            gen_index=lambda person: BigtableIndex(rowkey=person.id, index_key=person.name),
+            model_class=Person,
+            covering_fields=["city"],
+        )
+        self.repository = build_repository(self.table, bigtable_index=self.index_repository)
+        self.persons = [
+            Person(id="P1", name="a", city="hz"),
+            Person(id="P2", name="a", city="sh"),
+            Person(id="P3", name="b", city="hz"),
+        ]
+        self.repository.save_models(models=self.persons)
+        # 同一行同时出现在 a 与 c 两个 index_key 下
+        self.index_repository.index_table.save_model(
+            model=BigtableIndex(rowkey="P1", index_key="c"), exclude_fields=["index_key"]
+        )
+        self.table.read_key_counts.clear()
+
+    def tearDown(self):
+        self.repository.close()
+        self.index_repository.close()
+
+    def test_group_by_index_key(self):
+        models = self.repository.query_models_batch(index_keys=["a", "b", "c", "a"])
+        self.assertEqual(models, {"a": self.persons[:2], "b": [self.persons[2]], "c": [self.persons[0]]})
+        # 多个 index_key 指向的 rowkey 去重后一次批量读取主表
+        self.assertEqual(self.table.read_key_counts, [3])
+        self.assertEqual(self.repository.query_models_batch(index_keys=["a"], limit=1), {"a": [self.persons[0]]})
+
+    def test_empty_and_missing_keys(self):
+        self.assertEqual(self.repository.query_models_batch(index_keys=[]), {})
+        self.assertEqual(self.repository.query_models_batch(index_keys=["x", "b"]), {"x": [], "b": [self.persons[2]]})
+        self.assertEqual(self.repository.query_models_batch(index_keys=["x"]), {"x": []})
+        self.assertEqual(self.repository.query_models_batch(index_keys=["a"], index="missing"), {})
+        # 索引行存在但主表数据已删除时不返回
+        self.repository.delete_models(models=[Person(id="P2")])
+        self.assertEqual(self.repository.query_models_batch(index_keys=["a"]), {"a": [self.persons[0]]})
+
+    def test_covered_path(self):
+        models = self.repository.query_models_batch(index_keys=["a", "x"], fields=["city"])
+        self.assertEqual(models, {"a": [Person(city="hz"), Person(city="sh")], "x": []})
+        self.assertEqual(self.table.read_key_counts, [])
+
+
+class TestBigtableRepositoryBloomFilter(unittest.TestCase):
+    def setUp(self):
+        # 两个进程共享同一主表与索引表，writer 未配置布隆过滤器
+        self.table = InMemoryBigtableTable("person", column_families=["main_cf"])
+        self.index_table = RecordingTable("person_city", column_families=["index_cf"])
+        self.writer_index = build_index_repository(table=self.index_table)
+        self.writer = build_repository(self.table, bigtable_index=self.writer_index)
+        self.writer.save_models(models=[Person(id="P1", city="hz"), Person(id="P2", city="sh")])
+
+        self.reader_index = build_index_repository(
+            table=self.index_table, bloom_filter=BigtableBloomFilter(expected_items=100)
+        )
+        self.reader = build_repository(self.table, bigtable_index=self.reader_index)
+
+    def tearDown(self):
+        self.writer.close()
+        self.reader.close()
+
+    def test_not_built_filter_does_not_skip_reads(self):
+        # 新的过滤器不包含已有的 index_key，重建前不能据此跳过读取
+        self.assertEqual(self.reader.query_models(index_key="hz"), [Person(id="P1", city="hz")])
+        self.assertEqual(
+            self.reader.query_models_batch(index_keys=["hz", "sh"]),
+            {"hz": [Person(id="P1", city="hz")], "sh": [Person(id="P2", city="sh")]},
+        )
+        self.assertEqual(self.reader_index.bloom_filter.stats().lookups, 0)
+
+    def test_rebuild_then_skip_and_refresh(self):
+        self.reader_index.rebuild_bloom_filter()
+        self.index_table.scanned_ranges.clear()
+        self.assertEqual(self.reader.query_models(index_key="hz"), [Person(id="P1", city="hz")])
+        self.assertIsNone(self.reader.query_models(index_key="bj"))
+        self.assertEqual(self.reader.query_models_batch(index_keys=["bj", "gz"]), {"bj": [], "gz": []})
+        # 只有 hz 请求了索引表
+        self.assertEqual(len(self.index_table.scanned_ranges), 1)
+
+        # 其他进程写入的 index_key 在下一次重建之前被判定为不存在
+        self.writer.save_model(model=Person(id="P3", city="bj"))
+        self.assertIsNone(self.reader.query_models(index_key="bj"))
+        self.reader_index.rebuild_bloom_filter()
+        self.assertEqual(self.reader.query_models(index_key="bj"), [Person(id="P3", city="bj")])
+
+        # 本进程写入的 index_key 立即加入过滤器
+        self.reader.save_model(model=Person(id="P4", city="gz"))
+        self.assertEqual(self.reader.query_models(index_key="gz"), [Person(id="P4", city="gz")])
+
+    def test_built_filter(self):
+        bloom_filter = BigtableBloomFilter(expected_items=100)
+        bloom_filter.add_all(["hz", "sh"])
+        index_repository = build_index_repository(
+            table=self.index_table, bloom_filter=bloom_filter, bloom_filter_built=True
+        )
+        self.assertTrue(index_repository.might_contain("hz"))
+        self.assertFalse(index_repository.might_contain("bj"))
+        # 未构建的过滤器总是判定可能存在
+        self.assertTrue(self.reader_index.might_contain("bj"))
+
+    def test_rebuild_size(self):
+        for _ in range(50):
+            self.reader.save_model(model=Person(id="P1", city="hz"))
+        self.assertGreaterEqual(self.reader_index.bloom_filter.items, 50)
+        # 重建时按索引表中 index_key 的数量计算大小，不随重复写入增长
+        bloom_filter = self.reader_index.rebuild_bloom_filter()
+        self.assertEqual(bloom_filter.size_bits, BigtableBloomFilter(expected_items=2).size_bits)
+        bloom_filter = self.reader_index.rebuild_bloom_filter(expected_items=1000)
+        self.assertEqual(bloom_filter.size_bits, BigtableBloomFilter(expected_items=1000).size_bits)
+
+    def test_write_during_rebuild(self):
+        reader_index = self.reader_index
+        lock = reader_index._BigtableIndexRepository__bloom_filter_lock
+        written = []
+
+        class WriteAfterRelease:
+            """
+            重建过程中每次释放锁后立即写入一个新的 index_key，覆盖各步骤之间的写入
+            """
+
+            def __init__(self):
+                self.writing = False
+
+            def __enter__(self):
+                return lock.__enter__()
+
+            def __exit__(self, *args):
+                lock.__exit__(*args)
+                if self.writing:
+                    return
+                self.writing = True
+                written.append(f"city{len(written)}")
+                reader_index.save_index(model=Person(id="P9", city=written[-1]))
+                self.writing = False
+
+        reader_index._BigtableIndexRepository__bloom_filter_lock = WriteAfterRelease()
+        reader_index.rebuild_bloom_filter()
+        reader_index._BigtableIndexRepository__bloom_filter_lock = lock
+        self.assertGreaterEqual(len(written), 2)
+        for index_key in written + ["hz", "sh"]:
+            self.assertTrue(reader_index.might_contain(index_key), index_key)
+
+    def test_single_map_read_indexes(self):
+        index_table = InMemoryBigtableTable("person_city_map", column_families=["index_cf"])
+
+        def build_single_map_index(**kwargs) -> BigtableSingleMapIndexRepository:
+            return BigtableSingleMapIndexRepository(
+                bigtable_project_id="local",
+                bigtable_instance_id="local",
+                bigtable_index_table_id="person_city_map",
+                index_cf="index_cf",
+                gen_index=gen_city_index,
+                table=index_table,
+                **kwargs,
+            )
+
+        build_single_map_index().save_indexes(models=[Person(id="P1", city="hz"), Person(id="P2", city="sh")])
+        index_repository = build_single_map_index(bloom_filter=BigtableBloomFilter(expected_items=100))
+        # index_key 即 rowkey，不单独存储
+        expected = [BigtableIndex(rowkey="P1"), BigtableIndex(rowkey="P2")]
+        self.assertEqual(index_repository.read_indexes(index_keys=["hz", "sh"]), expected)
+        self.assertEqual(index_repository.scan_index(index_key="hz"), expected[:1])
+
+        index_repository.rebuild_bloom_filter()
+        self.assertEqual(index_repository.read_indexes(index_keys=["hz", "sh", "bj"]), expected)
+        self.assertIsNone(index_repository.read_indexes(index_keys=["bj"]))
+        self.assertFalse(index_repository.might_contain("bj"))
+
+
+class PausedReadTable(InMemoryBigtableTable):
+    """
+    read_row 读取数据后等待 resume，用于在读取与写入缓存之间插入写入
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pause = False
+        self.read_done = threading.Event()
+        self.resume = threading.Event()
+
+    def read_row(self, *args, **kwargs):
+        row = super().read_row(*args, **kwargs)
+        if self.pause:
+            self.pause = False
+            self.read_done.set()
+            self.resume.wait(timeout=5)
+        return row
+
+
+class TestBigtableRepositoryCache(unittest.TestCase):
+    def test_write_during_read_is_not_cached(self):
+        table = PausedReadTable("person", column_families=["main_cf"])
+        cache = LruTtlBigtableCache(max_size=100, ttl_seconds=60)
+        repository = build_repository(table, cache=cache)
+        repository.save_model(model=Person(id="P1", name="old"))
+
+        table.pause = True
+        results = []
+        reader = threading.Thread(target=lambda: results.append(repository.read_model(row_key="P1")))
+        reader.start()
+        self.assertTrue(table.read_done.wait(timeout=5))
+        # 读取已拿到旧数据，此时写入并失效缓存
+        repository.save_model(model=Person(id="P1", name="new"))
+        table.resume.set()
+        reader.join(timeout=5)
+
+        self.assertEqual(results, [Person(id="P1", name="old")])
+        # 读取期间被写入失效，旧数据不写入缓存
+        self.assertEqual(cache.stats().size, 0)
+        self.assertEqual(repository.read_model(row_key="P1"), Person(id="P1", name="new"))
+        self.assertEqual(cache.get(("P1", None, None)), (True, Person(id="P1", name="new")))
+        repository.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,6 +22,24 @@ class TestNestedModel(BaseModel):
 
 
 class TestBigtableRepository(unittest.TestCase):
+    def test_gen_hash_shard_keys(self):
+        self.assertEqual(BigtableUtils.gen_hash_shard_keys(1), [])
+        self.assertEqual(BigtableUtils.gen_hash_shard_keys(2), ["800000"])
+        self.assertEqual(BigtableUtils.gen_hash_shard_keys(4), ["400000", "800000", "c00000"])
+        shard_keys = BigtableUtils.gen_hash_shard_keys(10)
+        self.assertEqual(len(shard_keys), 9)
+        self.assertEqual(shard_keys, sorted(shard_keys))
+        # gen_hash_rowkey 生成的 rowkey 落在分界点划分的区间内
+        self.assertTrue(all(len(shard_key) == 6 for shard_key in shard_keys))
+
+    def test_gen_prefix_end_key(self):
+        self.assertEqual(BigtableUtils.gen_prefix_end_key(b"abc"), b"abd")
+        self.assertEqual(BigtableUtils.gen_prefix_end_key(b"a#"), b"a$")
+        self.assertEqual(BigtableUtils.gen_prefix_end_key(b"ab\xff\xff"), b"ac")
+        self.assertIsNone(BigtableUtils.gen_prefix_end_key(b"\xff\xff"))
+        # 正则元字符在 rowkey 范围中没有特殊含义
+        self.assertEqual(BigtableUtils.gen_prefix_end_key("a.b".encode()), b"a.c")
+
     def test_pydantic_field_convert_str(self):
         # 测试原生类型
         self.assertEqual(BigtableUtils.pydantic_field_convert_str(10), "10")
@@ -190,6 +208,74 @@ class TestBigtableRepository(unittest.TestCase):
         with self.assertRaises(TypeError):
             BigtableUtils.str_convert_pydantic_field("test", frozenset)
 
+    def test_compile_pydantic_field_convert_str(self):
+        # 预编译的序列化函数结果需与 pydantic_field_convert_str 一致
+        model = TestModel(name="John", age=30, is_active=True, scores=[9.5, 8.0])
+        cases = [
+            (10, int),
+            (10.5, float),
+            ("test", str),
+            (True, bool),
+            (model, TestModel),
+            (TestNestedModel(id=1, test_model=model), TestNestedModel),
+            ([1, 2, 3], List[int]),
+            ({1, 2, 3}, Set[int]),
+            ((10, "value", 30.5), Tuple[int, str, float]),
+            ({"key1": 123, "key2": [11, 22]}, Dict[str, Any]),
+            ([[model], [model]], List[List[TestModel]]),
+            ({"group1": [model], "group2": []}, Dict[str, List[TestModel]]),
+            # 实际值类型与声明不一致时回退到通用逻辑
+            ("not a list", List[int]),
+            ([model, 1, "a"], List[TestModel]),
+        ]
+        for param, data_type in cases:
+            with self.subTest(data_type=data_type):
+                convert = BigtableUtils.compile_pydantic_field_convert_str(data_type)
+                self.assertEqual(convert(param), BigtableUtils.pydantic_field_convert_str(param))
+
+        with self.assertRaises(TypeError):
+            BigtableUtils.compile_pydantic_field_convert_str(List[int])([frozenset([1])])
+
+    def test_compile_str_convert_pydantic_field(self):
+        # 预编译的反序列化函数结果需与 str_convert_pydantic_field 一致
+        cases = [
+            ("10", int),
+            ("10.5", float),
+            ("test", str),
+            ("True", bool),
+            ("false", bool),
+            ("[9.5, 8.0]", List[float]),
+            ("[1, 2, 3]", Set[int]),
+            ('[10, "value", 30.5]', Tuple[int, str, float]),
+            ('{"name": "John", "age": 30, "is_active": true, "scores": [9.5, 8.0]}', TestModel),
+            ('{"key1": 123, "key2": 11}', Dict[str, int]),
+            ('{"key": "value", "list_data": [1, 2, 3], "obj_data": {"name": "test"}}', Dict[str, Any]),
+            ('{"a": 1, "b": [1, 2]}', Any),
+            (
+                '[ [{"name": "Inner1", "age": 20, "is_active": true, "scores": [89.0]}], '
+                '[{"name": "Inner2", "age": 25, "is_active": false, "scores": [92.5]}] ]',
+                List[List[TestModel]],
+            ),
+            (
+                '[{"group1": [{"name": "AA", "age": 30, "is_active": true, "scores": [100.0]}]}, '
+                '{"group3": [{"name": "CC", "age": 50, "is_active": true, "scores": [70.0]}]}]',
+                List[Dict[str, List[TestModel]]],
+            ),
+        ]
+        for string_data, data_type in cases:
+            with self.subTest(data_type=data_type):
+                convert = BigtableUtils.compile_str_convert_pydantic_field(data_type)
+                self.assertEqual(convert(string_data), BigtableUtils.str_convert_pydantic_field(string_data, data_type))
+
+        # 不支持的类型在调用时抛出 TypeError
+        convert = BigtableUtils.compile_str_convert_pydantic_field(frozenset)
+        with self.assertRaises(TypeError):
+            convert("test")
+
+        # 元素类型与预期不一致时与通用逻辑保持一致
+        with self.assertRaises(TypeError):
+            BigtableUtils.compile_str_convert_pydantic_field(List[int])("[[1], [2]]")
+
 
 if __name__ == "__main__":
     unittest.main()
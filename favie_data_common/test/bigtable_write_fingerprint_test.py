@@ -0,0 +1,72 @@
+import sys
+import threading
+import unittest
+
+from favie_data_common.database.bigtable.bigtable_write_fingerprint import BigtableWriteFingerprint
+
+
+class TestBigtableWriteFingerprint(unittest.TestCase):
+    def test_filter_changed_cells(self):
+        fingerprint = BigtableWriteFingerprint()
+        cells = [("main_cf", b"title", b"dress"), ("main_cf", b"price", b"19.9")]
+        # 没有指纹时全部写入
+        self.assertEqual(fingerprint.filter_changed_cells("row1", cells), cells)
+        fingerprint.record("row1", cells)
+
+        self.assertEqual(fingerprint.filter_changed_cells("row1", cells), [])
+        changed_cells = [("main_cf", b"title", b"dress"), ("main_cf", b"price", b"29.9")]
+        self.assertEqual(fingerprint.filter_changed_cells("row1", changed_cells), [("main_cf", b"price", b"29.9")])
+        # 同名列在不同列族中视为不同的列
+        self.assertEqual(
+            fingerprint.filter_changed_cells("row1", [("new_cf", b"title", b"dress")]), [("new_cf", b"title", b"dress")]
+        )
+
+        stats = fingerprint.stats()
+        self.assertEqual((stats.rows_skipped, stats.cells_skipped, stats.cells_written), (1, 3, 4))
+
+    def test_record_merges_cells(self):
+        fingerprint = BigtableWriteFingerprint()
+        fingerprint.record("row1", [("main_cf", b"title", b"dress")])
+        fingerprint.record("row1", [("main_cf", b"price", b"19.9")])
+        cells = [("main_cf", b"title", b"dress"), ("main_cf", b"price", b"19.9")]
+        self.assertEqual(fingerprint.filter_changed_cells("row1", cells), [])
+
+    def test_invalidate(self):
+        fingerprint = BigtableWriteFingerprint()
+        cells = [("main_cf", b"title", b"dress")]
+        fingerprint.record("row1", cells)
+        fingerprint.invalidate("row1")
+        self.assertEqual(fingerprint.filter_changed_cells("row1", cells), cells)
+
+    def test_ttl_expiration(self):
+        fingerprint = BigtableWriteFingerprint(ttl_seconds=0)
+        cells = [("main_cf", b"title", b"dress")]
+        fingerprint.record("row1", cells)
+        self.assertEqual(fingerprint.filter_changed_cells("row1", cells), cells)
+
+    def test_concurrent_record_same_row(self):
+        fingerprint = BigtableWriteFingerprint()
+        start = threading.Barrier(8)
+        # 缩短线程切换间隔，提高读取-合并-写回之间发生切换的概率
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+
+        def record(worker: int):
+            start.wait()
+            for i in range(200):
+                fingerprint.record("row1", [("main_cf", f"field{worker}-{i}".encode(), b"value")])
+
+        threads = [threading.Thread(target=record, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 并发写入同一行的不同列时，每一列的指纹都被保留
+        cells = [("main_cf", f"field{worker}-{i}".encode(), b"value") for worker in range(8) for i in range(200)]
+        self.assertEqual(fingerprint.filter_changed_cells("row1", cells), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import threading
+import time
+import unittest
+
+from google.cloud.bigtable.row import DirectRow
+from google.rpc.status_pb2 import Status
+
+from favie_data_common.database.bigtable.bigtable_write_pipeline import (
+    BigtableWriteError,
+    BigtableWritePipeline,
+    BigtableWritePipelineConfig,
+)
+
+
+class RecordingTable:
+    """
+    记录 mutate_rows 调用的表，rowkey 以 fail 开头的行返回错误状态
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def mutate_rows(self, rows):
+        time.sleep(self.delay)
+        with self.lock:
+            self.batches.append([row.row_key for row in rows])
+        return [Status(code=13, message="internal") if row.row_key.startswith(b"fail") else Status() for row in rows]
+
+
+def build_row(row_key: str, value: bytes = b"value") -> DirectRow:
+    row = DirectRow(row_key.encode())
+    row.set_cell("cf", b"field", value)
+    return row
+
+
+class TestBigtableWritePipeline(unittest.TestCase):
+    def test_flush_by_count(self):
+        table = RecordingTable()
+        pipeline = BigtableWritePipeline(
+            table=table, config=BigtableWritePipelineConfig(flush_count=3, flush_interval=60)
+        )
+        futures = pipeline.mutate_rows([build_row(f"row{i}") for i in range(7)])
+        for future in futures[:6]:
+            self.assertEqual(future.result(timeout=5).code, 0)
+        # 不足一批的行在 flush 时发送
+        self.assertFalse(futures[6].done())
+        pipeline.flush()
+        self.assertTrue(futures[6].done())
+        self.assertEqual([len(batch) for batch in table.batches], [3, 3, 1])
+        pipeline.close()
+
+    def test_flush_by_interval(self):
+        table = RecordingTable()
+        pipeline = BigtableWritePipeline(
+            table=table, config=BigtableWritePipelineConfig(flush_count=100, flush_interval=0.05)
+        )
+        future = pipeline.mutate(build_row("row1"))
+        self.assertEqual(future.result(timeout=5).code, 0)
+        self.assertEqual(table.batches, [[b"row1"]])
+        pipeline.close()
+
+    def test_failure_callback(self):
+        failures = []
+        pipeline = BigtableWritePipeline(
+            table=RecordingTable(),
+            config=BigtableWritePipelineConfig(flush_count=2),
+            on_failure=lambda row, error: failures.append(row.row_key),
+        )
+        ok_future, failed_future = pipeline.mutate_rows([build_row("row1"), build_row("fail1")])
+        self.assertEqual(ok_future.result(timeout=5).code, 0)
+        with self.assertRaises(BigtableWriteError) as context:
+            failed_future.result(timeout=5)
+        self.assertEqual(context.exception.row_key, b"fail1")
+        self.assertEqual(failures, [b"fail1"])
+
+        stats = pipeline.stats()
+        self.assertEqual((stats.rows_written, stats.rows_failed, stats.batches), (1, 1, 1))
+        pipeline.close()
+
+    def test_backpressure(self):
+        row_bytes = build_row("row0").get_mutations_size()
+        pipeline = BigtableWritePipeline(
+            table=RecordingTable(delay=0.05),
+            config=BigtableWritePipelineConfig(flush_count=1, max_inflight_bytes=row_bytes * 2),
+        )
+        max_inflight_bytes = 0
+        for i in range(6):
+            pipeline.mutate(build_row(f"row{i}"))
+            max_inflight_bytes = max(max_inflight_bytes, pipeline.stats().inflight_bytes)
+        pipeline.close()
+
+        self.assertLessEqual(max_inflight_bytes, row_bytes * 2)
+        self.assertEqual(pipeline.stats().rows_written, 6)
+        with self.assertRaises(RuntimeError):
+            pipeline.mutate(build_row("row7"))
+
+    def test_close_racing_mutate(self):
+        for _ in range(20):
+            table = RecordingTable()
+            pipeline = BigtableWritePipeline(
+                table=table, config=BigtableWritePipelineConfig(flush_count=7, flush_interval=60)
+            )
+            futures = []
+            rejected = []
+            lock = threading.Lock()
+            start = threading.Barrier(5)
+
+            def write(worker: int):
+                start.wait()
+                for i in range(50):
+                    try:
+                        future = pipeline.mutate(build_row(f"row{worker}-{i}"))
+                    except RuntimeError:
+                        with lock:
+                            rejected.append(worker)
+                        return
+                    with lock:
+                        futures.append(future)
+
+            threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+            for thread in threads:
+                thread.start()
+            start.wait()
+            pipeline.close()
+            for thread in threads:
+                thread.join()
+
+            # close 返回后，所有被接受的写入都已发送并完成，之后的写入被拒绝
+            self.assertTrue(all(future.done() for future in futures))
+            self.assertEqual(sum(len(batch) for batch in table.batches), len(futures))
+            self.assertEqual(pipeline.stats().rows_written, len(futures))
+            # 没有被拒绝的线程写完了全部 50 行
+            self.assertGreaterEqual(len(futures), 50 * (4 - len(rejected)))
+
+    def test_mutate_during_close_flush(self):
+        entered = threading.Event()
+        release = threading.Event()
+
+        class BlockingTable(RecordingTable):
+            def mutate_rows(self, rows):
+                entered.set()
+                release.wait(timeout=5)
+                return super().mutate_rows(rows)
+
+        table = BlockingTable()
+        pipeline = BigtableWritePipeline(
+            table=table, config=BigtableWritePipelineConfig(flush_count=100, flush_interval=60)
+        )
+        first = pipeline.mutate(build_row("row0"))
+        closer = threading.Thread(target=pipeline.close, daemon=True)
+        closer.start()
+        self.assertTrue(entered.wait(timeout=5))
+        # close 发送剩余缓冲期间的写入被拒绝，不会留在不再发送的缓冲中
+        with self.assertRaises(RuntimeError):
+            pipeline.mutate(build_row("row1"))
+        release.set()
+        closer.join(timeout=5)
+        self.assertFalse(closer.is_alive())
+        self.assertEqual(first.result(timeout=5).code, 0)
+        self.assertEqual(table.batches, [[b"row0"]])
+
+    def test_close_wakes_blocked_mutate(self):
+        row_bytes = build_row("row0").get_mutations_size()
+        release = threading.Event()
+
+        class BlockingTable(RecordingTable):
+            def mutate_rows(self, rows):
+                release.wait(timeout=5)
+                return super().mutate_rows(rows)
+
+        pipeline = BigtableWritePipeline(
+            table=BlockingTable(),
+            config=BigtableWritePipelineConfig(flush_count=1, max_inflight_bytes=row_bytes),
+        )
+        first = pipeline.mutate(build_row("row0"))
+        errors = []
+
+        def write():
+            try:
+                pipeline.mutate(build_row("row1"))
+            except RuntimeError as e:
+                errors.append(e)
+
+        blocked = threading.Thread(target=write)
+        blocked.start()
+        time.sleep(0.05)
+        closer = threading.Thread(target=pipeline.close)
+        closer.start()
+        blocked.join(timeout=5)
+        # 因反压阻塞的写入在关闭时被拒绝，而不是写入不会再发送的缓冲
+        self.assertEqual(len(errors), 1)
+        release.set()
+        closer.join(timeout=5)
+        self.assertEqual(first.result(timeout=5).code, 0)
+        self.assertEqual(pipeline.stats().rows_written, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()